@@ -5,10 +5,11 @@ import string
 import time
 import uuid
 from contextlib import contextmanager
+from contextvars import ContextVar
 from threading import Lock
 from time import monotonic
 
-from celery import Celery, Task, current_task
+from celery import Celery, Task
 from flask import (
     current_app,
     g,
@@ -20,6 +21,8 @@ from flask import (
 from flask.ctx import has_app_context
 from flask_migrate import Migrate
 from flask_sqlalchemy import SQLAlchemy as _SQLAlchemy
+from flask_sqlalchemy.session import Session as _Session
+from kombu.serialization import register as register_serializer
 from sqlalchemy import event
 from werkzeug.exceptions import HTTPException as WerkzeugHTTPException
 from werkzeug.local import LocalProxy
@@ -31,7 +34,14 @@ from app.clients.document_download import DocumentDownloadClient
 from app.clients.email.aws_ses import AwsSesClient
 from app.clients.email.aws_ses_stub import AwsSesStubClient
 from app.clients.sms.aws_sns import AwsSnsClient
-from notifications_utils import logging, request_helper
+from app.sql_metrics import (
+    TimedQueuePool,
+    fingerprint_statement,
+    get_request_data,
+    metrics_source,
+    sql_metrics,
+)
+from notifications_utils import fast_json, logging, request_helper
 from notifications_utils.clients.encryption.encryption_client import Encryption
 from notifications_utils.clients.redis.redis_client import RedisClient
 from notifications_utils.clients.zendesk.zendesk_client import ZendeskClient
@@ -44,6 +54,16 @@ class NotifyCelery(Celery):
     def init_app(self, app):
         self.task_cls = make_task(app)
 
+        # encodes task messages with orjson when it's installed. Workers accept it whichever
+        # task_serializer is set, so it can be turned on once they all do.
+        register_serializer(
+            "notify-json",
+            fast_json.dumps,
+            fast_json.loads,
+            content_type="application/x-notify-json",
+            content_encoding="utf-8",
+        )
+
         # Configure Celery app with options from the main app config.
         self.config_from_object(app.config["CELERY"])
         self.conf.worker_hijack_root_logger = False
@@ -77,17 +97,35 @@ class SQLAlchemy(_SQLAlchemy):
         return (sa_url, options)
 
 
+# Set by app.dao.dao_utils.read_replica while reads should go to the replica bind
+use_read_replica = ContextVar("use_read_replica", default=False)
+
+
+class RoutingSession(_Session):
+    """Sends queries to the "replica" bind, when there is one, while use_read_replica is set.
+    Flushes always go to the primary."""
+
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        if bind is None and use_read_replica.get() and not self._flushing:
+            replica = self._db.engines.get("replica")
+            if replica is not None:
+                return replica
+        return super().get_bind(mapper=mapper, clause=clause, bind=bind, **kwargs)
+
+
 # no monkey patching issue here.  All the real work to set the db up
 # is done in db.init_app() which is called in create_app.  But we need
 # to instantiate the db object here, because it's used in models.py
 db = SQLAlchemy(
+    session_options={"class_": RoutingSession},
     engine_options={
         "pool_size": config.Config.SQLALCHEMY_POOL_SIZE,
         "max_overflow": 10,
         "pool_timeout": config.Config.SQLALCHEMY_POOL_TIMEOUT,
         "pool_recycle": config.Config.SQLALCHEMY_POOL_RECYCLE,
         "pool_pre_ping": True,
-    }
+        "poolclass": TimedQueuePool,
+    },
 )
 migrate = None
 
@@ -195,6 +233,7 @@ def create_app(application):
     application.config.from_object(configs[notify_environment])
 
     application.config["NOTIFY_APP_NAME"] = application.name
+    application.json = fast_json.FastJSONProvider(application)
     init_app(application)
 
     request_helper.init_app(application)
@@ -279,6 +318,7 @@ def register_blueprint(application):
     from app.service.rest import service_blueprint
     from app.service_invite.rest import service_invite as service_invite_blueprint
     from app.status.healthcheck import status as status_blueprint
+    from app.status.healthcheck import status_metrics as status_metrics_blueprint
     from app.template.rest import template_blueprint
     from app.template_folder.rest import template_folder_blueprint
     from app.template_statistics.rest import (
@@ -303,6 +343,9 @@ def register_blueprint(application):
     status_blueprint.before_request(requires_no_auth)
     application.register_blueprint(status_blueprint)
 
+    status_metrics_blueprint.before_request(requires_admin_auth)
+    application.register_blueprint(status_metrics_blueprint)
+
     docs_blueprint.before_request(requires_no_auth)
     application.register_blueprint(docs_blueprint)
 
@@ -465,10 +508,9 @@ def create_random_identifier():
 
 # TODO maintainability what is the purpose of this?  Debugging?
 def setup_sqlalchemy_events(app):
-    # need this or db.engine isn't accessible
+    # need this or db.engines isn't accessible
     with app.app_context():
 
-        @event.listens_for(db.engine, "connect")
         def connect(dbapi_connection, connection_record):
             if dbapi_connection is None or connection_record is None:
                 current_app.logger.warning(
@@ -477,7 +519,6 @@ def setup_sqlalchemy_events(app):
                 )
             pass
 
-        @event.listens_for(db.engine, "close")
         def close(dbapi_connection, connection_record):
 
             if dbapi_connection is None or connection_record is None:
@@ -487,7 +528,6 @@ def setup_sqlalchemy_events(app):
                 )
             pass
 
-        @event.listens_for(db.engine, "checkout")
         def checkout(dbapi_connection, connection_record, connection_proxy):
 
             if dbapi_connection is None or connection_proxy is None:
@@ -503,39 +543,23 @@ def setup_sqlalchemy_events(app):
                 # checkin runs after the request is already torn down, therefore we add the request_data onto the
                 # connection_record as otherwise it won't have that information when checkin actually runs.
                 # Note: this is not a problem for checkouts as the checkout always happens within a web request or task
-
-                # web requests
-                if has_request_context():
-                    connection_record.info["request_data"] = {
-                        "method": request.method,
-                        "host": request.host,
-                        "url_rule": (
-                            request.url_rule.rule if request.url_rule else "No endpoint"
-                        ),
-                    }
-                # celery apps
-                elif current_task:
-                    connection_record.info["request_data"] = {
-                        "method": "celery",
-                        "host": current_app.config["NOTIFY_APP_NAME"],  # worker name
-                        "url_rule": current_task.name,  # task name
-                    }
+                request_data = get_request_data()
                 # anything else. migrations possibly, or flask cli commands.
-                else:
+                if request_data is None:
                     current_app.logger.warning(
                         "Checked out sqlalchemy connection from outside of request/task"
                     )
-                    connection_record.info["request_data"] = {
+                    request_data = {
                         "method": "unknown",
                         "host": "unknown",
                         "url_rule": "unknown",
                     }
+                connection_record.info["request_data"] = request_data
             except Exception:
                 current_app.logger.exception(
                     "Exception caught for checkout event.",
                 )
 
-        @event.listens_for(db.engine, "checkin")
         def checkin(dbapi_connection, connection_record):
 
             if dbapi_connection is None or connection_record is None:
@@ -543,7 +567,47 @@ def setup_sqlalchemy_events(app):
                     f"Something wrong with sqalalchemy \
                         dbapi_connection {dbapi_connection} connection_record {connection_record}"
                 )
-            pass
+                return
+
+            checkout_at = connection_record.info.pop("checkout_at", None)
+            if checkout_at is not None:
+                sql_metrics.record(
+                    metrics_source(connection_record.info.get("request_data")),
+                    "connection_hold",
+                    time.monotonic() - checkout_at,
+                )
+
+        def before_cursor_execute(
+            conn, cursor, statement, parameters, context, executemany
+        ):
+            conn.info["statement_start"] = time.monotonic()
+
+        def after_cursor_execute(
+            conn, cursor, statement, parameters, context, executemany
+        ):
+            statement_start = conn.info.pop("statement_start", None)
+            if statement_start is None:
+                return
+            elapsed = time.monotonic() - statement_start
+            source = metrics_source(conn.info.get("request_data"))
+            sql_metrics.record(source, "statement", elapsed)
+
+            if elapsed >= app.config["SQLALCHEMY_SLOW_QUERY_THRESHOLD_SECONDS"]:
+                sql_metrics.record(source, "slow_statement", elapsed)
+                normalised, fingerprint = fingerprint_statement(statement)
+                current_app.logger.warning(
+                    f"Slow query {fingerprint} took {elapsed:.3f} seconds in {source}: "
+                    f"{normalised[:1000]}"
+                )
+
+        # every bind, so reads sent to the replica are instrumented too
+        for engine in db.engines.values():
+            event.listen(engine, "connect", connect)
+            event.listen(engine, "close", close)
+            event.listen(engine, "checkout", checkout)
+            event.listen(engine, "checkin", checkin)
+            event.listen(engine, "before_cursor_execute", before_cursor_execute)
+            event.listen(engine, "after_cursor_execute", after_cursor_execute)
 
 
 def make_task(app):
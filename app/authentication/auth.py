@@ -1,12 +1,19 @@
+import hashlib
 import os
 import uuid
+from threading import Lock
 
+import cachetools
+import jwt
 from flask import current_app, g, request
 from sqlalchemy.orm.exc import NoResultFound
 
 from app.serialised_models import SerialisedService
 from notifications_python_client.authentication import (
+    __bound__,
     decode_jwt_token,
+    decode_token,
+    epoch_seconds,
     get_token_issuer,
 )
 from notifications_python_client.errors import (
@@ -27,6 +34,20 @@ TOKEN_MESSAGE_TWO = "at https://docs.notifications.service.gov.uk/rest-api.html#
 GENERAL_TOKEN_ERROR_MESSAGE = TOKEN_MESSAGE_ONE + TOKEN_MESSAGE_TWO
 
 
+def _verified_token_expires_at(token_digest, verified, now):
+    # `now` is on the cache's monotonic clock, so convert the token's expiry into that
+    api_key_id, secret, iat = verified
+    return now + (iat + __bound__ - epoch_seconds())
+
+
+# Tokens whose signature has already been checked, mapped to the key that signed them. Entries
+# expire when the token itself would, so a cache hit never accepts a token that has timed out.
+_verified_tokens = cachetools.TLRUCache(maxsize=10000, ttu=_verified_token_expires_at)
+# The id of the API key that last signed a valid token for each service, tried first next time
+_last_used_api_key_ids = cachetools.LRUCache(maxsize=10000)
+_verification_cache_lock = Lock()
+
+
 class AuthError(Exception):
     def __init__(self, message, code, service_id=None, api_key_id=None):
         super().__init__(message, code, service_id, api_key_id)
@@ -142,7 +163,17 @@ def _decode_jwt_token(auth_token, api_keys, service_id=None):
         for api_key in api_keys:
             return api_key
 
-    for api_key in api_keys:
+    token_digest = hashlib.sha256(auth_token.encode()).hexdigest()
+    with _verification_cache_lock:
+        verified = _verified_tokens.get(token_digest)
+    if verified:
+        api_key_id, secret, _ = verified
+        for api_key in api_keys:
+            # the key might have been deleted or had its secret changed since
+            if api_key.id == api_key_id and api_key.secret == secret:
+                return _check_api_key_not_revoked(api_key, service_id)
+
+    for api_key in _order_api_keys_by_hint(auth_token, api_keys, service_id):
         try:
             decode_jwt_token(auth_token, api_key.secret)
         except TypeError:
@@ -173,7 +204,7 @@ def _decode_jwt_token(auth_token, api_keys, service_id=None):
             # TODO: Change this so it doesn't also catch `TokenIssuerError` or `TokenIssuedAtError` exceptions (which
             # are children of `TokenDecodeError`) as these should cause an auth error immediately rather than
             # continue on to check the next API key
-            current_app.logger.exception(
+            current_app.logger.debug(
                 "TokenDecodeError. Couldn't decode auth token for given api key"
             )
             continue
@@ -186,18 +217,10 @@ def _decode_jwt_token(auth_token, api_keys, service_id=None):
                 service_id=service_id,
                 api_key_id=api_key.id,
             )
+        else:
+            _remember_verified_token(token_digest, auth_token, api_key, service_id)
 
-        if api_key.expiry_date:
-            err_msg = "Invalid token: API key revoked"
-            current_app.logger.error(err_msg, exc_info=True)
-            raise AuthError(
-                err_msg,
-                403,
-                service_id=service_id,
-                api_key_id=api_key.id,
-            )
-
-        return api_key
+        return _check_api_key_not_revoked(api_key, service_id)
     else:
         # service has API keys, but none matching the one the user provided
         # if we get here, we probably hit TokenDecodeErrors earlier
@@ -206,6 +229,47 @@ def _decode_jwt_token(auth_token, api_keys, service_id=None):
         raise AuthError(err_msg, 403, service_id=service_id)
 
 
+def _check_api_key_not_revoked(api_key, service_id):
+    if api_key.expiry_date:
+        err_msg = "Invalid token: API key revoked"
+        current_app.logger.error(err_msg, exc_info=True)
+        raise AuthError(
+            err_msg,
+            403,
+            service_id=service_id,
+            api_key_id=api_key.id,
+        )
+    return api_key
+
+
+def _order_api_keys_by_hint(auth_token, api_keys, service_id):
+    """
+    Put the key most likely to have signed the token first, so that usually only one signature
+    needs checking: the key named by the token's `kid` header if it has one, otherwise the key
+    this service last used.
+    """
+    try:
+        hint = jwt.get_unverified_header(auth_token).get("kid")
+    except jwt.DecodeError:
+        hint = None
+    if hint is None:
+        with _verification_cache_lock:
+            hint = _last_used_api_key_ids.get(str(service_id))
+    if hint is None:
+        return api_keys
+    return sorted(api_keys, key=lambda api_key: str(api_key.id) != str(hint))
+
+
+def _remember_verified_token(token_digest, auth_token, api_key, service_id):
+    # tokens only let through by ALLOW_EXPIRED_API_TOKEN have already expired, so aren't cached
+    iat = int(decode_token(auth_token)["iat"])
+    with _verification_cache_lock:
+        if service_id is not None:
+            _last_used_api_key_ids[str(service_id)] = api_key.id
+        if epoch_seconds() < iat + __bound__:
+            _verified_tokens[token_digest] = (api_key.id, api_key.secret, iat)
+
+
 def _get_auth_token(req):
     auth_header = req.headers.get("Authorization", None)
     if not auth_header:
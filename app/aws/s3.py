@@ -1,5 +1,6 @@
 import csv
 import datetime
+import io
 import re
 import time
 import urllib
@@ -678,3 +679,91 @@ def s3upload(
             f"Unable to upload {key}to S3 bucket because of {e}"
         )
         raise e
+
+
+class S3MultipartUpload(io.RawIOBase):
+    """
+    A writable binary stream that uploads to S3 as it goes, a part at a time, so the whole file
+    never has to be held in memory. Files smaller than one part are sent with a single put.
+
+    Used as a context manager, the upload is completed on a clean exit and aborted if an exception
+    is raised, so a half-written file never replaces the existing object.
+    """
+
+    # S3's minimum size for every part except the last
+    PART_SIZE = 5 * 1024 * 1024
+
+    def __init__(self, bucket_name, file_location, content_type="binary/octet-stream"):
+        super().__init__()
+        self._client = get_s3_client()
+        self._upload_args = {"Bucket": bucket_name, "Key": file_location}
+        self._content_type = content_type
+        self._upload_id = None
+        self._parts = []
+        self._buffer = bytearray()
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        self._buffer += data
+        if len(self._buffer) >= self.PART_SIZE:
+            self._upload_part()
+        return len(data)
+
+    def _upload_part(self):
+        if self._upload_id is None:
+            self._upload_id = self._client.create_multipart_upload(
+                **self._upload_args,
+                ServerSideEncryption="AES256",
+                ContentType=self._content_type,
+            )["UploadId"]
+        part_number = len(self._parts) + 1
+        response = self._client.upload_part(
+            **self._upload_args,
+            UploadId=self._upload_id,
+            PartNumber=part_number,
+            Body=bytes(self._buffer),
+        )
+        self._parts.append({"ETag": response["ETag"], "PartNumber": part_number})
+        self._buffer.clear()
+
+    def close(self):
+        if self.closed:
+            return
+        try:
+            if self._upload_id is None:
+                self._client.put_object(
+                    **self._upload_args,
+                    Body=bytes(self._buffer),
+                    ServerSideEncryption="AES256",
+                    ContentType=self._content_type,
+                )
+            else:
+                if self._buffer:
+                    self._upload_part()
+                self._client.complete_multipart_upload(
+                    **self._upload_args,
+                    UploadId=self._upload_id,
+                    MultipartUpload={"Parts": self._parts},
+                )
+        finally:
+            super().close()
+
+    def abort(self):
+        if self.closed:
+            return
+        try:
+            if self._upload_id is not None:
+                self._client.abort_multipart_upload(
+                    **self._upload_args, UploadId=self._upload_id
+                )
+        finally:
+            self._buffer.clear()
+            super().close()
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if exc_type is None:
+            self.close()
+        else:
+            self.abort()
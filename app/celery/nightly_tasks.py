@@ -1,3 +1,4 @@
+from collections import defaultdict
 from datetime import datetime, timedelta
 
 from flask import current_app
@@ -6,7 +7,7 @@ from sqlalchemy.exc import SQLAlchemyError
 from app import notify_celery
 from app.aws import s3
 from app.aws.s3 import remove_csv_object
-from app.celery.process_ses_receipts_tasks import check_and_queue_callback_task
+from app.celery.process_ses_receipts_tasks import queue_callback_task
 from app.config import QueueNames
 from app.dao.fact_processing_time_dao import insert_update_processing_time
 from app.dao.inbound_sms_dao import delete_inbound_sms_older_than_retention
@@ -16,16 +17,22 @@ from app.dao.jobs_dao import (
     dao_get_unfinished_jobs,
 )
 from app.dao.notifications_dao import (
+    dao_archive_notification_partitions_before,
+    dao_create_notification_partitions,
     dao_get_notifications_processing_time_stats,
+    dao_notifications_table_is_partitioned,
+    dao_stream_notifications_by_ids,
     dao_timeout_notifications,
     get_service_ids_with_notifications_before,
     move_notifications_to_notification_history,
 )
 from app.dao.service_data_retention_dao import (
+    fetch_longest_days_of_retention,
     fetch_service_data_retention_for_all_services_by_notification_type,
 )
-from app.enums import NotificationType
+from app.enums import CallbackType, NotificationType
 from app.models import FactProcessingTime
+from app.serialised_models import SerialisedServiceCallbackApi
 from app.utils import get_midnight_in_utc, utc_now
 
 
@@ -157,23 +164,57 @@ def delete_notifications_for_service_and_type(
         )
 
 
+@notify_celery.task(name="maintain-notification-partitions")
+def maintain_notification_partitions():
+    """
+    Creates daily partitions of notifications ahead of time, and archives partitions that are
+    older than the longest data retention of any service. Whatever is left past retention in the
+    remaining partitions is still removed per service by delete-notifications-older-than-retention.
+    """
+    if not dao_notifications_table_is_partitioned():
+        return
+
+    today = get_midnight_in_utc(utc_now())
+    created = dao_create_notification_partitions(
+        until=today
+        + timedelta(days=current_app.config["NOTIFICATIONS_PARTITION_PRECREATE_DAYS"])
+    )
+
+    longest_retention = max(fetch_longest_days_of_retention() or 0, 7)
+    archived = dao_archive_notification_partitions_before(
+        today - timedelta(days=longest_retention)
+    )
+
+    current_app.logger.info(
+        f"maintain-notification-partitions: created partitions {created}, "
+        f"rows moved to notification_history per archived partition {archived}"
+    )
+
+
 @notify_celery.task(name="timeout-sending-notifications")
 def timeout_notifications():
-    notifications = ["dummy value so len() > 0"]
-
     cutoff_time = utc_now() - timedelta(
         seconds=current_app.config.get("SENDING_NOTIFICATIONS_TIMEOUT_PERIOD")
     )
 
-    while len(notifications) > 0:
-        notifications = dao_timeout_notifications(cutoff_time)
+    while timed_out := dao_timeout_notifications(cutoff_time):
+        notification_ids_by_service = defaultdict(list)
+        for notification_id, service_id in timed_out:
+            notification_ids_by_service[service_id].append(notification_id)
 
-        for notification in notifications:
-            check_and_queue_callback_task(notification)
+        # look up each service's callback once, and only load notifications that need one
+        for service_id, notification_ids in notification_ids_by_service.items():
+            service_callback_api = SerialisedServiceCallbackApi.from_service_id(
+                service_id, CallbackType.DELIVERY_STATUS
+            )
+            if not service_callback_api:
+                continue
+            for notification in dao_stream_notifications_by_ids(notification_ids):
+                queue_callback_task(notification, service_callback_api)
 
         current_app.logger.info(
             "Timeout period reached for {} notifications, status has been updated.".format(
-                len(notifications)
+                len(timed_out)
             )
         )
 
@@ -1,3 +1,4 @@
+from collections import defaultdict
 from datetime import timedelta
 
 import iso8601
@@ -5,8 +6,10 @@ from celery.exceptions import Retry
 from flask import current_app, json
 from sqlalchemy.orm.exc import NoResultFound
 
-from app import notify_celery
+from app import notify_celery, redis_store
 from app.celery.service_callback_tasks import (
+    add_delivery_status_to_callback_batch,
+    batches_delivery_status_callbacks,
     create_complaint_callback_data,
     create_delivery_status_callback_data,
     send_complaint_to_service,
@@ -16,14 +19,14 @@ from app.config import Config, QueueNames
 from app.dao import notifications_dao
 from app.dao.complaint_dao import save_complaint
 from app.dao.notifications_dao import dao_get_notification_history_by_reference
-from app.dao.service_callback_api_dao import (
-    get_service_complaint_callback_api_for_service,
-    get_service_delivery_status_callback_api_for_service,
-)
 from app.enums import CallbackType, NotificationStatus
 from app.models import Complaint
+from app.serialised_models import SerialisedServiceCallbackApi
 from app.utils import utc_now
 
+# email_ses_callback_handler queues SES receipts here, for process_queued_ses_results
+SES_RESULTS_QUEUE = "ses_results_queue"
+
 
 @notify_celery.task(
     bind=True, name="process-ses-result", max_retries=5, default_retry_delay=300
@@ -120,6 +123,177 @@ def process_ses_results(self, response):
         self.retry(queue=QueueNames.RETRY, expires=Config.DEFAULT_REDIS_EXPIRE_TIME)
 
 
+@notify_celery.task(name="process-queued-ses-results")
+def process_queued_ses_results():
+    """
+    Hand the SES receipts queued since the last run to process_ses_results_batch, in batches of
+    SES_RESULTS_BATCH_SIZE.
+    """
+    batch_size = current_app.config["SES_RESULTS_BATCH_SIZE"]
+    # since this list is being fed by other processes, just take what's there now
+    remaining = redis_store.llen(SES_RESULTS_QUEUE) or 0
+    while remaining > 0:
+        responses = redis_store.lpop(SES_RESULTS_QUEUE, min(remaining, batch_size))
+        if not responses:
+            break
+        remaining -= len(responses)
+        try:
+            process_ses_results_batch.apply_async(
+                [[json.loads(response) for response in responses]],
+                queue=QueueNames.NOTIFY,
+            )
+        except Exception:
+            # put them back for the next run, rather than losing them
+            redis_store.rpush(SES_RESULTS_QUEUE, *responses)
+            raise
+
+
+@notify_celery.task(
+    bind=True, name="process-ses-results-batch", max_retries=5, default_retry_delay=300
+)
+def process_ses_results_batch(self, responses):
+    """
+    Does what process_ses_results does for each of a list of SES receipts, but looks up their
+    notifications with one query, updates them with one query for each status, and looks up
+    each service's callback api once.
+
+    Only the receipts that couldn't be processed are retried: those whose notification might not
+    be in the db yet, and those that failed. Complaints are saved as they're read, so they're
+    never retried once handled, even if the update of the delivery receipts fails.
+    """
+    to_retry = []
+    receipts = {}
+    for response in responses:
+        try:
+            ses_message = json.loads(response["Message"])
+            notification_type = ses_message["notificationType"]
+            if notification_type == "Complaint":
+                _check_and_queue_complaint_callback_task(*handle_complaint(ses_message))
+                continue
+
+            if notification_type == "Bounce":
+                bounce_message = determine_notification_bounce_type(ses_message)
+            else:
+                bounce_message = None
+            reference = ses_message["mail"]["messageId"]
+            if reference in receipts:
+                current_app.logger.info(
+                    f"Duplicate SES receipt in batch for reference: {reference}"
+                )
+                continue
+            receipts[reference] = (
+                response,
+                ses_message,
+                get_aws_responses(ses_message),
+                bounce_message,
+            )
+        except Exception:
+            current_app.logger.exception("Error processing SES results")
+            to_retry.append(response)
+
+    try:
+        notifications = {
+            notification.reference: notification
+            for notification in notifications_dao.dao_get_notifications_by_references(
+                list(receipts)
+            )
+        }
+        notifications_by_status = defaultdict(list)
+        updated_references_by_service = defaultdict(list)
+        for reference, (
+            response,
+            ses_message,
+            aws_response_dict,
+            bounce_message,
+        ) in receipts.items():
+            notification_status = aws_response_dict["notification_status"]
+            notification = notifications.get(reference)
+            if notification is None:
+                message_time = iso8601.parse_date(
+                    ses_message["mail"]["timestamp"]
+                ).replace(tzinfo=None)
+                if utc_now() - message_time < timedelta(minutes=5):
+                    current_app.logger.info(
+                        f"Notification not found for reference: {reference} "
+                        f"(while attempting update to {notification_status}). "
+                        f"Callback may have arrived before notification was "
+                        f"persisted to the DB. Adding to retry batch"
+                    )
+                    to_retry.append(response)
+                else:
+                    current_app.logger.warning(
+                        f"Notification not found for reference: {reference} "
+                        f"(while attempting update to {notification_status})"
+                    )
+                continue
+
+            if bounce_message:
+                current_app.logger.info(
+                    f"SES bounce for notification ID {notification.id}: {bounce_message}"
+                )
+
+            if notification.status not in {
+                NotificationStatus.SENDING,
+                NotificationStatus.PENDING,
+            }:
+                notifications_dao._duplicate_update_warning(
+                    notification, notification_status
+                )
+                continue
+
+            notification_status = notifications_dao._decide_permanent_temporary_failure(
+                current_status=notification.status, status=notification_status
+            )
+            notifications_by_status[
+                notification_status, aws_response_dict["provider_response"]
+            ].append(notification)
+            updated_references_by_service[notification.service_id].append(reference)
+
+        notifications_dao.dao_update_notification_statuses(notifications_by_status)
+    except Exception:
+        current_app.logger.exception("Error processing SES results")
+        self.retry(
+            args=[to_retry + [response for response, *_ in receipts.values()]],
+            queue=QueueNames.RETRY,
+            expires=Config.DEFAULT_REDIS_EXPIRE_TIME,
+        )
+        return
+
+    service_callback_apis = {
+        service_id: SerialisedServiceCallbackApi.from_service_id(
+            service_id, CallbackType.DELIVERY_STATUS
+        )
+        for service_id in updated_references_by_service
+    }
+    # committing the update expired the notifications, so load the ones that need a callback
+    # again at once, rather than one at a time
+    callback_references = [
+        reference
+        for service_id, references in updated_references_by_service.items()
+        if service_callback_apis[service_id]
+        for reference in references
+    ]
+    if callback_references:
+        for notification in notifications_dao.dao_get_notifications_by_references(
+            callback_references
+        ):
+            queue_callback_task(
+                notification, service_callback_apis[notification.service_id]
+            )
+
+    current_app.logger.info(
+        f"Processed {len(responses)} SES receipts, "
+        f"updated {sum(map(len, updated_references_by_service.values()))} notifications, "
+        f"retrying {len(to_retry)}"
+    )
+    if to_retry:
+        self.retry(
+            args=[to_retry],
+            queue=QueueNames.RETRY,
+            expires=Config.DEFAULT_REDIS_EXPIRE_TIME,
+        )
+
+
 def determine_notification_bounce_type(ses_message):
     notification_type = ses_message["notificationType"]
     if notification_type in ["Delivery", "Complaint"]:
@@ -250,22 +424,29 @@ def remove_emails_from_complaint(complaint_dict):
 
 def check_and_queue_callback_task(notification):
     # queue callback task only if the service_callback_api exists
-    service_callback_api = get_service_delivery_status_callback_api_for_service(
-        service_id=notification.service_id
+    service_callback_api = SerialisedServiceCallbackApi.from_service_id(
+        notification.service_id, CallbackType.DELIVERY_STATUS
     )
     if service_callback_api:
-        notification_data = create_delivery_status_callback_data(
-            notification, service_callback_api
-        )
-        send_delivery_status_to_service.apply_async(
-            [str(notification.id), notification_data], queue=QueueNames.CALLBACKS
-        )
+        queue_callback_task(notification, service_callback_api)
+
+
+def queue_callback_task(notification, service_callback_api):
+    if batches_delivery_status_callbacks(notification.service_id):
+        add_delivery_status_to_callback_batch(notification)
+        return
+    notification_data = create_delivery_status_callback_data(
+        notification, service_callback_api
+    )
+    send_delivery_status_to_service.apply_async(
+        [str(notification.id), notification_data], queue=QueueNames.CALLBACKS
+    )
 
 
 def _check_and_queue_complaint_callback_task(complaint, notification, recipient):
     # queue callback task only if the service_callback_api exists
-    service_callback_api = get_service_complaint_callback_api_for_service(
-        service_id=notification.service_id
+    service_callback_api = SerialisedServiceCallbackApi.from_service_id(
+        notification.service_id, CallbackType.COMPLAINT
     )
     if service_callback_api:
         complaint_data = create_complaint_callback_data(
@@ -12,7 +12,7 @@ from app.celery.tasks import (
     process_job,
     process_row,
 )
-from app.clients.cloudwatch.aws_cloudwatch import AwsCloudwatchClient
+from app.clients.cloudwatch.aws_cloudwatch import MAX_CATCH_UP, AwsCloudwatchClient
 from app.config import QueueNames
 from app.dao.invited_org_user_dao import (
     delete_org_invitations_created_more_than_two_days_ago,
@@ -39,10 +39,11 @@ from app.enums import JobStatus, NotificationType
 from app.models import Job, Notification
 from app.notifications.process_notifications import send_notification_to_queue
 from app.utils import utc_now
-from notifications_utils import aware_utcnow
+from notifications_utils import aware_utcnow, fast_json
 from notifications_utils.clients.zendesk.zendesk_client import NotifySupportTicket
 
 MAX_NOTIFICATION_FAILS = 10000
+DELIVERY_RECEIPTS_WATERMARKS_KEY = "delivery-receipts-watermarks"
 
 zendesk_client = get_zendesk_client()
 
@@ -255,9 +256,12 @@ def process_delivery_receipts(self):
     # If we need to check db settings do it here for convenience
     # current_app.logger.info(f"POOL SIZE {app.db.engine.pool.size()}")
     """
-    Every eight minutes or so (see config.py) we run this task, which searches the last ten
-    minutes of logs for delivery receipts and batch updates the db with the results.  The overlap
-    is intentional.  We don't mind re-updating things, it is better than losing data.
+    Every two minutes or so (see config.py) we run this task, which reads the delivery receipts
+    logged since the last run and batch updates the db with the results.
+
+    How far each log group has been read is checkpointed in redis, but only once the db has been
+    updated, so if this fails, or doesn't run for a while, the next run carries on from the same
+    place. Without a checkpoint, eg the first time, the last three minutes are read.
 
     We also set this to retry with exponential backoff in the case of failure.  The only way this would
     fail is if, for example the db went down, or redis filled causing the app to stop processing.  But if
@@ -270,8 +274,11 @@ def process_delivery_receipts(self):
         cloudwatch.init_app(current_app)
         start_time = aware_utcnow() - timedelta(minutes=3)
         end_time = aware_utcnow()
+        watermarks = json.loads(
+            redis_store.get(DELIVERY_RECEIPTS_WATERMARKS_KEY) or "{}"
+        )
         delivered_receipts, failed_receipts = cloudwatch.check_delivery_receipts(
-            start_time, end_time
+            start_time, end_time, watermarks
         )
         delivered_receipts = list(delivered_receipts)
         for i in range(0, len(delivered_receipts), batch_size):
@@ -281,6 +288,11 @@ def process_delivery_receipts(self):
         for i in range(0, len(failed_receipts), batch_size):
             batch = failed_receipts[i : i + batch_size]
             dao_update_delivery_receipts(batch, False)
+        redis_store.set(
+            DELIVERY_RECEIPTS_WATERMARKS_KEY,
+            json.dumps(watermarks),
+            ex=int(MAX_CATCH_UP.total_seconds()),
+        )
     except Exception as ex:
         retry_count = self.request.retries
         wait_time = 3600 * 2**retry_count
@@ -313,7 +325,7 @@ def batch_insert_notifications(self):
         while count < current_len:
             count = count + 1
             notification_bytes = redis_store.lpop("message_queue")
-            notification_dict = json.loads(notification_bytes.decode("utf-8"))
+            notification_dict = fast_json.loads(notification_bytes)
             notification_dict["status"] = notification_dict.pop("notification_status")
             if not notification_dict.get("created_at"):
                 notification_dict["created_at"] = utc_now()
@@ -344,4 +356,6 @@ def batch_insert_notifications(self):
                 )
                 continue
             else:
-                redis_store.rpush("message_queue", json.dumps(n.serialize_for_redis(n)))
+                redis_store.rpush(
+                    "message_queue", fast_json.dumps(n.serialize_for_redis(n))
+                )
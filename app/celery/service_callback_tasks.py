@@ -1,40 +1,161 @@
-import json
+from flask import current_app, json
+from requests import HTTPError, RequestException
 
-from flask import current_app
-from requests import HTTPError, RequestException, request
-
-from app import get_encryption, notify_celery
+from app import get_encryption, notify_celery, redis_store
+from app.clients.callback_dispatcher import callback_dispatcher
 from app.config import QueueNames
+from app.enums import CallbackType
+from app.serialised_models import SerialisedServiceCallbackApi
 from app.utils import DATETIME_FORMAT
 
 encryption = get_encryption()
 
 
+DELIVERY_STATUS_CALLBACK_BATCH_KEY_PREFIX = "delivery-status-callbacks-"
+
+
+def delivery_status_callback_batch_key(service_id):
+    return f"{DELIVERY_STATUS_CALLBACK_BATCH_KEY_PREFIX}{service_id}"
+
+
 @notify_celery.task(
     bind=True, name="send-delivery-status", max_retries=5, default_retry_delay=300
 )
 def send_delivery_status_to_service(self, notification_id, encrypted_status_update):
     status_update = encryption.decrypt(encrypted_status_update)
 
-    data = {
-        "id": str(notification_id),
-        "reference": status_update["notification_client_reference"],
-        "to": status_update["notification_to"],
-        "status": status_update["notification_status"],
-        "created_at": status_update["notification_created_at"],
-        "completed_at": status_update["notification_updated_at"],
-        "sent_at": status_update["notification_sent_at"],
-        "notification_type": status_update["notification_type"],
-        "template_id": status_update["template_id"],
-        "template_version": status_update["template_version"],
-    }
-
     _send_data_to_service_callback_api(
         self,
-        data,
+        _delivery_status_payload(status_update),
         status_update["service_callback_api_url"],
         status_update["service_callback_api_bearer_token"],
         "send_delivery_status_to_service",
+        status_update.get("service_id"),
+    )
+
+
+@notify_celery.task(
+    bind=True, name="send-delivery-status-batch", max_retries=5, default_retry_delay=300
+)
+def send_delivery_status_batch_to_service(self, encrypted_batch):
+    """
+    Sends a service a list of delivery statuses in one callback, which is retried as a whole.
+    """
+    batch = encryption.decrypt(encrypted_batch)
+
+    _send_data_to_service_callback_api(
+        self,
+        [
+            _delivery_status_payload(status_update)
+            for status_update in batch["status_updates"]
+        ],
+        batch["service_callback_api_url"],
+        batch["service_callback_api_bearer_token"],
+        "send_delivery_status_batch_to_service",
+        batch["service_id"],
+    )
+
+
+@notify_celery.task(name="flush-delivery-status-callbacks")
+def flush_delivery_status_callbacks(service_id):
+    """
+    Sends whatever delivery statuses are waiting in a service's batch, CALLBACK_BATCH_MAX_WAIT_MS
+    after the first of them was added.
+    """
+    batch_size = current_app.config["CALLBACK_BATCH_SIZE"]
+    while status_updates := redis_store.lpop(
+        delivery_status_callback_batch_key(service_id), batch_size
+    ):
+        _queue_delivery_status_batch(service_id, status_updates)
+
+
+@notify_celery.task(name="sweep-delivery-status-callbacks")
+def sweep_delivery_status_callbacks():
+    """
+    Flushes every service's batch that still has statuses waiting in it, in case the flush
+    scheduled when its first status was added never ran, or couldn't queue the batch.
+    """
+    for key in redis_store.scan_iter(f"{DELIVERY_STATUS_CALLBACK_BATCH_KEY_PREFIX}*"):
+        key = key.decode("utf-8") if isinstance(key, bytes) else key
+        flush_delivery_status_callbacks.apply_async(
+            [key.removeprefix(DELIVERY_STATUS_CALLBACK_BATCH_KEY_PREFIX)],
+            queue=QueueNames.CALLBACKS,
+        )
+
+
+def add_delivery_status_to_callback_batch(notification):
+    """
+    Adds a notification's status to its service's batch of delivery status callbacks. The batch
+    is sent once it has CALLBACK_BATCH_SIZE statuses in it, or CALLBACK_BATCH_MAX_WAIT_MS after
+    the first was added, whichever comes first. If either of those can't be queued, the statuses
+    wait for sweep_delivery_status_callbacks.
+    """
+    config = current_app.config
+    service_id = str(notification.service_id)
+    key = delivery_status_callback_batch_key(service_id)
+    # the url and token aren't kept with each status, they're looked up when the batch is sent
+    length = redis_store.rpush(
+        key, json.dumps(_delivery_status_callback_fields(notification))
+    )
+    try:
+        if length == 1:
+            flush_delivery_status_callbacks.apply_async(
+                [service_id],
+                queue=QueueNames.CALLBACKS,
+                countdown=config["CALLBACK_BATCH_MAX_WAIT_MS"] / 1000,
+            )
+        elif length >= config["CALLBACK_BATCH_SIZE"]:
+            status_updates = redis_store.lpop(key, config["CALLBACK_BATCH_SIZE"])
+            if status_updates:
+                _queue_delivery_status_batch(service_id, status_updates)
+    except Exception:
+        current_app.logger.exception(
+            f"Couldn't queue delivery status callbacks for service {service_id}, "
+            "leaving them for the next sweep"
+        )
+
+
+def batches_delivery_status_callbacks(service_id):
+    return (
+        str(service_id) in current_app.config["BATCHED_CALLBACK_SERVICES"]
+        and redis_store.active
+    )
+
+
+def _queue_delivery_status_batch(service_id, status_updates):
+    try:
+        _encrypt_and_queue_delivery_status_batch(service_id, status_updates)
+    except Exception:
+        # put them back to go in a later batch, rather than losing them
+        redis_store.rpush(
+            delivery_status_callback_batch_key(service_id), *status_updates
+        )
+        raise
+
+
+def _encrypt_and_queue_delivery_status_batch(service_id, status_updates):
+    service_callback_api = SerialisedServiceCallbackApi.from_service_id(
+        service_id, CallbackType.DELIVERY_STATUS
+    )
+    if not service_callback_api:
+        current_app.logger.info(
+            f"Dropping {len(status_updates)} delivery status callbacks for service "
+            f"{service_id}, which no longer has a callback api"
+        )
+        return
+    # encrypted once for the whole batch, rather than for each status
+    encrypted_batch = encryption.encrypt(
+        {
+            "service_id": service_id,
+            "service_callback_api_url": service_callback_api.url,
+            "service_callback_api_bearer_token": service_callback_api.bearer_token,
+            "status_updates": [
+                json.loads(status_update) for status_update in status_updates
+            ],
+        }
+    )
+    send_delivery_status_batch_to_service.apply_async(
+        [encrypted_batch], queue=QueueNames.CALLBACKS
     )
 
 
@@ -58,25 +179,22 @@ def send_complaint_to_service(self, complaint_data):
         complaint["service_callback_api_url"],
         complaint["service_callback_api_bearer_token"],
         "send_complaint_to_service",
+        complaint.get("service_id"),
     )
 
 
 def _send_data_to_service_callback_api(
-    self, data, service_callback_url, token, function_name
+    self, data, service_callback_url, token, function_name, service_id=None
 ):
-    notification_id = (
-        data["notification_id"] if "notification_id" in data else data["id"]
-    )
+    if isinstance(data, list):
+        notification_id = f"batch of {len(data)}"
+    else:
+        notification_id = (
+            data["notification_id"] if "notification_id" in data else data["id"]
+        )
     try:
-        response = request(
-            method="POST",
-            url=service_callback_url,
-            data=json.dumps(data),
-            headers={
-                "Content-Type": "application/json",
-                "Authorization": "Bearer {}".format(token),
-            },
-            timeout=5,
+        response = callback_dispatcher.post(
+            service_callback_url, data, token, service_id=service_id, timeout=5
         )
         current_app.logger.info(
             "{} sending {} to {}, response {}".format(
@@ -114,8 +232,23 @@ def _send_data_to_service_callback_api(
             )
 
 
-def create_delivery_status_callback_data(notification, service_callback_api):
-    data = {
+def _delivery_status_payload(status_update):
+    return {
+        "id": status_update["notification_id"],
+        "reference": status_update["notification_client_reference"],
+        "to": status_update["notification_to"],
+        "status": status_update["notification_status"],
+        "created_at": status_update["notification_created_at"],
+        "completed_at": status_update["notification_updated_at"],
+        "sent_at": status_update["notification_sent_at"],
+        "notification_type": status_update["notification_type"],
+        "template_id": status_update["template_id"],
+        "template_version": status_update["template_version"],
+    }
+
+
+def _delivery_status_callback_fields(notification):
+    return {
         "notification_id": str(notification.id),
         "notification_client_reference": notification.client_reference,
         "notification_to": notification.to,
@@ -133,11 +266,18 @@ def create_delivery_status_callback_data(notification, service_callback_api):
             else None
         ),
         "notification_type": notification.notification_type,
-        "service_callback_api_url": service_callback_api.url,
-        "service_callback_api_bearer_token": service_callback_api.bearer_token,
         "template_id": str(notification.template_id),
         "template_version": notification.template_version,
     }
+
+
+def create_delivery_status_callback_data(notification, service_callback_api):
+    data = {
+        **_delivery_status_callback_fields(notification),
+        "service_id": str(notification.service_id),
+        "service_callback_api_url": service_callback_api.url,
+        "service_callback_api_bearer_token": service_callback_api.bearer_token,
+    }
     return encryption.encrypt(data)
 
 
@@ -150,6 +290,7 @@ def create_complaint_callback_data(
         "reference": notification.client_reference,
         "to": recipient,
         "complaint_date": complaint.complaint_date.strftime(DATETIME_FORMAT),
+        "service_id": str(notification.service_id),
         "service_callback_api_url": service_callback_api.url,
         "service_callback_api_bearer_token": service_callback_api.bearer_token,
     }
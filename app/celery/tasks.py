@@ -1,20 +1,22 @@
 import csv
 import io
-import json
 import os
 import time
+from contextlib import ExitStack, contextmanager
 
 import gevent
 from celery.signals import task_postrun
 from flask import current_app
-from requests import HTTPError, RequestException, request
+from requests import HTTPError, RequestException
 from sqlalchemy.exc import IntegrityError, SQLAlchemyError
 
 from app import create_uuid, get_encryption, notify_celery
 from app.aws import s3
 from app.celery import provider_tasks
+from app.clients.callback_dispatcher import callback_dispatcher
 from app.config import Config, QueueNames
 from app.dao import notifications_dao
+from app.dao.dao_utils import read_replica
 from app.dao.inbound_sms_dao import dao_get_inbound_sms_by_id
 from app.dao.jobs_dao import dao_get_job_by_id, dao_update_job
 from app.dao.notifications_dao import (
@@ -35,7 +37,7 @@ from app.notifications.process_notifications import (
 from app.notifications.validators import check_service_over_total_message_limit
 from app.serialised_models import SerialisedService, SerialisedTemplate
 from app.service.utils import service_allowed_to_send_to
-from app.utils import DATETIME_FORMAT, hilite, utc_now
+from app.utils import DATETIME_FORMAT, hilite, midnight_n_days_ago, utc_now
 from notifications_utils.recipients import RecipientCSV
 
 encryption = get_encryption()
@@ -167,20 +169,12 @@ def process_row(row, template, job, service, sender_id=None):
     return notification_id
 
 
-# TODO
-# Originally this was checking a daily limit
-# It is now checking an overall limit (annual?) for the free tier
-# Is there any limit for the paid tier?
-# Assuming the limit is annual, is it calendar year, fiscal year, MOU year?
-# Do we need a command to run to clear the redis value, or should it happen automatically?
 def __total_sending_limits_for_job_exceeded(service, job, job_id):
-
     try:
-        total_sent = check_service_over_total_message_limit(KeyType.NORMAL, service)
-        if total_sent + job.notification_count > service.total_message_limit:
-            raise TotalRequestsError(service.total_message_limit)
-        else:
-            return False
+        check_service_over_total_message_limit(
+            KeyType.NORMAL, service, job.notification_count
+        )
+        return False
     except TotalRequestsError:
         job.job_status = "sending limits exceeded"
         job.processing_finished = utc_now()
@@ -455,14 +449,11 @@ def send_inbound_sms_to_service(self, inbound_sms_id, service_id):
     }
 
     try:
-        response = request(
-            method="POST",
-            url=inbound_api.url,
-            data=json.dumps(data),
-            headers={
-                "Content-Type": "application/json",
-                "Authorization": "Bearer {}".format(inbound_api.bearer_token),
-            },
+        response = callback_dispatcher.post(
+            inbound_api.url,
+            data,
+            inbound_api.bearer_token,
+            service_id=service_id,
             timeout=60,
         )
         current_app.logger.debug(
@@ -555,128 +546,43 @@ def process_incomplete_job(job_id):
     job_complete(job, resumed=True)
 
 
-def _generate_notifications_report(service_id, report_id, limit_days):
-
-    # Hard code these values for now
-    page = 1
-    page_size = 20000
-    include_jobs = True
-    include_from_test_key = False
-    include_one_off = True
-
-    data = {
-        "limit_days": limit_days,
-        "include_jobs": True,
-        "include_from_test_key": False,
-        "include_one_off": True,
-    }
-    pagination = notifications_dao.get_notifications_for_service(
-        service_id,
-        filter_dict=data,
-        page=page,
-        page_size=page_size,
-        count_pages=False,
-        limit_days=limit_days,
-        include_jobs=include_jobs,
-        include_from_test_key=include_from_test_key,
-        include_one_off=include_one_off,
-    )
-    count = 0
-    if len(pagination.items) == 0:
-        current_app.logger.info(f"SKIP {service_id}")
-
-        # Delete stale report when there's no new data
-        _, file_location, _, _, _ = get_csv_location(service_id, report_id)
-        s3.delete_s3_object(file_location)
-        current_app.logger.info(f"Deleted stale report {file_location} - no new data")
-
-        return
-    start_time = time.time()
-    for notification in pagination.items:
-        count = count + 1
-        if notification.job_id is not None:
-
-            notification.personalisation = s3.get_personalisation_from_s3(
-                notification.service_id,
-                notification.job_id,
-                notification.job_row_number,
-            )
-
-            recipient = s3.get_phone_number_from_s3(
-                notification.service_id,
-                notification.job_id,
-                notification.job_row_number,
-            )
-
-            notification.to = recipient
-            notification.normalised_to = recipient
-
-        else:
-            notification.to = ""
-            notification.normalised_to = ""
-
-        current_app.logger.debug(
-            hilite(
-                f"Processing  row {count} for service {service_id} and days {limit_days}"
-            )
+REPORT_LIMIT_DAYS = [1, 3, 5, 7]
+# the most rows in any one report
+REPORT_ROW_LIMIT = 20000
+
+# cleanup for report presentation. The other columns from serialize_for_csv aren't shown.
+REPORT_HEADER_RENAMES = {
+    "recipient": "Phone Number",
+    "template_name": "Template",
+    "created_by_name": "Sent By",
+    "carrier": "Carrier",
+    "status": "Status",
+    "created_at": "Time",
+    "job_name": "Batch File",
+    "provider_response": "Carrier Response",
+}
+
+
+def _get_report_row(notification):
+    row = notification.serialize_for_csv()
+    if notification.job_id is not None:
+        row["recipient"] = s3.get_phone_number_from_s3(
+            notification.service_id,
+            notification.job_id,
+            notification.job_row_number,
         )
-
-    notifications = [
-        notification.serialize_for_csv() for notification in pagination.items
-    ]
-
-    current_app.logger.debug(hilite(f"RAW: {notifications}"))
-
-    # We try and get the next page of results to work out if we need provide a pagination link to the next page
-    # in our response if it exists. Note, this could be done instead by changing `count_pages` in the previous
-    # call to be True which will enable us to use Flask-Sqlalchemy to tell if there is a next page of results but
-    # this way is much more performant for services with many results (unlike Flask SqlAlchemy, this approach
-    # doesn't do an additional query to count all the results of which there could be millions but instead only
-    # asks for a single extra page of results).
-
-    # These columns are in the raw data but we don't show them in the report
-    columns_to_remove = {
-        "created_by_email_address",
-        "row_number",
-        "client_reference",
-        "template_type",
+    else:
+        row["recipient"] = ""
+    return {
+        new_key: row[old_key]
+        for old_key, new_key in REPORT_HEADER_RENAMES.items()
+        if old_key in row
     }
 
-    # cleanup for report presentation
-    header_renames = {
-        "recipient": "Phone Number",
-        "template_name": "Template",
-        "created_by_name": "Sent By",
-        "carrier": "Carrier",
-        "status": "Status",
-        "created_at": "Time",
-        "job_name": "Batch File",
-        "provider_response": "Carrier Response",
-    }
 
-    processed_notifications = []
-    for notification in notifications:
-        new_notification = {}
-        for old_key, new_key in header_renames.items():
-            if old_key not in columns_to_remove and old_key in notification:
-                new_notification[new_key] = notification[old_key]
-        processed_notifications.append(new_notification)
-
-    csv_bytes = io.BytesIO()
-    text_stream = io.TextIOWrapper(csv_bytes, encoding="utf-8", newline="")
-    writer = csv.DictWriter(text_stream, fieldnames=header_renames.values())
-    writer.writeheader()
-    writer.writerows(processed_notifications)
-    text_stream.flush()
-    csv_bytes.seek(0)
-
-    bucket_name, file_location, access_key, secret_key, region = get_csv_location(
-        service_id, report_id
-    )
-
-    current_app.logger.debug(
-        hilite(f"REPORT {file_location} {csv_bytes.getvalue().decode('utf-8')}")
-    )
+@contextmanager
+def _report_writer(service_id, report_id):
+    bucket_name, file_location, _, _, _ = get_csv_location(service_id, report_id)
     if bucket_name == "":
         exp_bucket = current_app.config["CSV_UPLOAD_BUCKET"]["bucket"]
         exp_region = current_app.config["CSV_UPLOAD_BUCKET"]["region"]
@@ -685,21 +591,65 @@ def _generate_notifications_report(service_id, report_id, limit_days):
             f"No bucket name should be: {exp_bucket} with region {exp_region} and tier {tier}"
         )
 
-    # Delete yesterday's version of this report
-    s3.delete_s3_object(file_location)
+    # the upload replaces yesterday's version of the report when it completes
+    with s3.S3MultipartUpload(bucket_name, file_location) as upload:
+        text_stream = io.TextIOWrapper(upload, encoding="utf-8", newline="")
+        writer = csv.DictWriter(text_stream, fieldnames=REPORT_HEADER_RENAMES.values())
+        writer.writeheader()
+        yield writer
+        text_stream.flush()
+        # leave closing the upload to the with block, which aborts it on error
+        text_stream.detach()
+
+
+def _generate_notifications_reports(service_id):
+    """
+    Write the 1, 3, 5 and 7 day reports for a service in one pass over its last 7 days of
+    notifications. Rows are streamed from the database newest first and each one is written to
+    every report whose window it falls in, so nothing is held in memory and each report is
+    uploaded to S3 as it is written. Reports with no rows are deleted instead.
+    """
+    start_time = time.time()
+    cutoffs = {
+        limit_days: midnight_n_days_ago(limit_days) for limit_days in REPORT_LIMIT_DAYS
+    }
+    row_counts = dict.fromkeys(REPORT_LIMIT_DAYS, 0)
+
+    with ExitStack() as reports, read_replica():
+        writers = {}
+        # the 7 day report holds every row of the shorter ones, so it sets the limit
+        for notification in notifications_dao.dao_stream_notifications_for_report(
+            service_id, max(REPORT_LIMIT_DAYS), REPORT_ROW_LIMIT
+        ):
+            row = _get_report_row(notification)
+            for limit_days, cutoff in cutoffs.items():
+                if notification.created_at < cutoff:
+                    continue
+                if limit_days not in writers:
+                    writers[limit_days] = reports.enter_context(
+                        _report_writer(service_id, f"{limit_days}-day-report")
+                    )
+                writers[limit_days].writerow(row)
+                row_counts[limit_days] += 1
+
+    for limit_days, row_count in row_counts.items():
+        _, file_location, _, _, _ = get_csv_location(
+            service_id, f"{limit_days}-day-report"
+        )
+        if row_count:
+            current_app.logger.info(
+                f"generate-notifications-report uploaded {file_location} with {row_count} rows"
+            )
+        else:
+            # Delete stale report when there's no new data
+            s3.delete_s3_object(file_location)
+            current_app.logger.info(
+                f"Deleted stale report {file_location} - no new data"
+            )
 
-    s3.s3upload(
-        filedata=csv_bytes,
-        region=region,
-        bucket_name=bucket_name,
-        file_location=file_location,
-    )
-    elapsed_time = str(time.time() - start_time)
-    elapsed_time = elapsed_time.split(".")
+    elapsed_time = str(time.time() - start_time).split(".")
     current_app.logger.info(
-        hilite(
-            f"generate-notifications-report uploaded {file_location} elapsed_time = {elapsed_time[0]} seconds"
-        )
+        f"generate-notifications-report for service {service_id} elapsed_time = {elapsed_time[0]} seconds"
     )
 
 
@@ -707,12 +657,7 @@ def _generate_notifications_report(service_id, report_id, limit_days):
 def generate_notification_reports_task():
     services = dao_fetch_all_services(only_active=True)
     for service in services:
-
-        limit_days = [1, 3, 5, 7]
-        for limit_day in limit_days:
-
-            report_id = f"{limit_day}-day-report"
-            _generate_notifications_report(service.id, report_id, limit_day)
+        _generate_notifications_reports(service.id)
     current_app.logger.info("Notifications report generation complete")
 
 
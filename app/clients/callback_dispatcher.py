@@ -0,0 +1,221 @@
+import json
+from collections import defaultdict
+from threading import BoundedSemaphore, Lock
+from time import monotonic
+from urllib.parse import urlsplit
+
+from flask import current_app
+from requests import RequestException, Session
+from requests.adapters import HTTPAdapter
+
+# how often each process logs its callback metrics
+METRICS_LOG_INTERVAL_SECONDS = 60
+
+
+class CircuitOpenError(RequestException):
+    """
+    The host has failed too many times in a row, so it isn't being sent anything for a while.
+    """
+
+
+class HostBusyError(RequestException):
+    """
+    All of this process's connections to the host were in use for too long.
+    """
+
+
+class CircuitBreaker:
+    """
+    Opens after CALLBACK_CIRCUIT_BREAKER_FAILURES failures in a row, and stays open for
+    CALLBACK_CIRCUIT_BREAKER_RESET_SECONDS. Then one request is let through to test the host,
+    which closes the circuit if it succeeds and opens it again if it fails.
+    """
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half-open"
+
+    def __init__(self):
+        self.state = self.CLOSED
+        self.consecutive_failures = 0
+        self.opened_at = None
+        self._lock = Lock()
+
+    def allow_request(self, reset_seconds):
+        with self._lock:
+            if self.state == self.CLOSED:
+                return True
+            if (
+                self.state == self.OPEN
+                and monotonic() - self.opened_at >= reset_seconds
+            ):
+                self.state = self.HALF_OPEN
+                return True
+            # only the one test request is let through while half open
+            return False
+
+    def record_success(self):
+        with self._lock:
+            self.state = self.CLOSED
+            self.consecutive_failures = 0
+
+    def record_failure(self, max_failures):
+        with self._lock:
+            self.consecutive_failures += 1
+            if (
+                self.state == self.HALF_OPEN
+                or self.consecutive_failures >= max_failures
+            ):
+                opened = self.state != self.OPEN
+                self.state = self.OPEN
+                self.opened_at = monotonic()
+                return opened
+            return False
+
+
+class Host:
+    def __init__(self, max_connections):
+        self.session = Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=max_connections)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+        self.slots = BoundedSemaphore(max_connections)
+        self.circuit_breaker = CircuitBreaker()
+
+
+class CallbackDispatcher:
+    """
+    Sends callbacks to services' APIs, keeping connections to each host open between them.
+
+    Each process makes at most CALLBACK_MAX_CONNECTIONS_PER_HOST requests to a host at once,
+    waiting up to CALLBACK_HOST_BUSY_TIMEOUT for one to finish before giving up. A host that
+    keeps failing (connection errors, timeouts, 5xx and 429 responses) trips its circuit breaker,
+    and callbacks to it fail straight away with CircuitOpenError, rather than each tying up a
+    worker until it times out. Both errors are RequestExceptions, so callers retry them later.
+    """
+
+    def __init__(self):
+        self.hosts = {}
+        self._lock = Lock()
+        self._metrics_lock = Lock()
+        self.reset_metrics()
+
+    def reset(self):
+        with self._lock:
+            self.hosts = {}
+        self.reset_metrics()
+
+    def reset_metrics(self):
+        with self._metrics_lock:
+            self.metrics = defaultdict(
+                lambda: {
+                    "requests": 0,
+                    "errors": 0,
+                    "rejected": 0,
+                    "latency_seconds_total": 0.0,
+                    "latency_seconds_max": 0.0,
+                }
+            )
+            self._metrics_logged_at = monotonic()
+
+    def get_metrics(self):
+        with self._metrics_lock:
+            services = {
+                service_id: dict(metrics)
+                for service_id, metrics in self.metrics.items()
+            }
+        with self._lock:
+            hosts = {
+                host_name: {
+                    "state": host.circuit_breaker.state,
+                    "consecutive_failures": host.circuit_breaker.consecutive_failures,
+                }
+                for host_name, host in self.hosts.items()
+            }
+        return {"services": services, "hosts": hosts}
+
+    def post(self, url, data, bearer_token, service_id=None, timeout=5):
+        config = current_app.config
+        host_name = self._host_name(url)
+        host = self._get_host(host_name)
+
+        if not host.circuit_breaker.allow_request(
+            config["CALLBACK_CIRCUIT_BREAKER_RESET_SECONDS"]
+        ):
+            self._record(service_id, rejected=True)
+            raise CircuitOpenError(f"Circuit breaker open for {host_name}")
+        if not host.slots.acquire(timeout=config["CALLBACK_HOST_BUSY_TIMEOUT"]):
+            # a host that's too slow to keep up is failing too
+            self._record(service_id, rejected=True)
+            self._trip(host_name, host)
+            raise HostBusyError(f"Too many callbacks in progress to {host_name}")
+
+        start = monotonic()
+        try:
+            response = host.session.post(
+                url,
+                data=json.dumps(data),
+                headers={
+                    "Content-Type": "application/json",
+                    "Authorization": "Bearer {}".format(bearer_token),
+                },
+                timeout=timeout,
+            )
+        except Exception:
+            self._record_failure(host_name, host, service_id, start)
+            raise
+        finally:
+            host.slots.release()
+
+        if response.status_code >= 500 or response.status_code == 429:
+            self._record_failure(host_name, host, service_id, start)
+        else:
+            host.circuit_breaker.record_success()
+            self._record(service_id, latency=monotonic() - start)
+        return response
+
+    @staticmethod
+    def _host_name(url):
+        parts = urlsplit(url)
+        return f"{parts.scheme}://{parts.netloc}"
+
+    def _get_host(self, host_name):
+        with self._lock:
+            if host_name not in self.hosts:
+                self.hosts[host_name] = Host(
+                    current_app.config["CALLBACK_MAX_CONNECTIONS_PER_HOST"]
+                )
+            return self.hosts[host_name]
+
+    def _record_failure(self, host_name, host, service_id, start):
+        self._record(service_id, latency=monotonic() - start, error=True)
+        self._trip(host_name, host)
+
+    def _trip(self, host_name, host):
+        if host.circuit_breaker.record_failure(
+            current_app.config["CALLBACK_CIRCUIT_BREAKER_FAILURES"]
+        ):
+            current_app.logger.warning(f"Circuit breaker opened for {host_name}")
+
+    def _record(self, service_id, latency=None, error=False, rejected=False):
+        with self._metrics_lock:
+            metrics = self.metrics[str(service_id)]
+            if rejected:
+                metrics["rejected"] += 1
+            else:
+                metrics["requests"] += 1
+                metrics["errors"] += error
+                metrics["latency_seconds_total"] += latency
+                metrics["latency_seconds_max"] = max(
+                    metrics["latency_seconds_max"], latency
+                )
+            log_metrics = (
+                monotonic() - self._metrics_logged_at >= METRICS_LOG_INTERVAL_SECONDS
+            )
+            if log_metrics:
+                self._metrics_logged_at = monotonic()
+        if log_metrics:
+            current_app.logger.info(f"Callback metrics: {self.get_metrics()}")
+
+
+callback_dispatcher = CallbackDispatcher()
@@ -1,13 +1,28 @@
-import json
 import os
 import re
+from datetime import UTC, datetime, timedelta
 
+import gevent
 from boto3 import client
 from flask import current_app
+from gevent.pool import Pool
 
 from app.clients import AWS_CLIENT_CONFIG, Client
 from app.cloudfoundry_config import cloud_config
 from app.utils import hilite
+from notifications_utils import fast_json
+
+# CloudWatch can take a while to make an event searchable, so each read starts this long before the
+# newest event already read, skipping events it has already seen
+WATERMARK_OVERLAP = timedelta(minutes=1)
+# after an outage, receipts are read back at most this far
+MAX_CATCH_UP = timedelta(days=1)
+# logs are read in up to LOG_SLICES slices of at least LOG_SLICE_MIN_MS each, LOG_READ_CONCURRENCY at
+# a time, and a slice that fails is read again up to LOG_SLICE_ATTEMPTS times
+LOG_SLICES = 16
+LOG_SLICE_MIN_MS = 15_000
+LOG_READ_CONCURRENCY = 8
+LOG_SLICE_ATTEMPTS = 3
 
 
 class AwsCloudwatchClient(Client):
@@ -48,7 +63,44 @@ class AwsCloudwatchClient(Client):
         return self._is_localstack
 
     def _get_log(self, log_group_name, start, end):
-        # Check all cloudwatch logs from the time the notification was sent (currently 5 minutes previously) until now
+        """
+        Return the events logged to log_group_name from start to end, in the order of the slices
+        of the window they were read in.
+        """
+        start_ms = int(start.timestamp() * 1000)
+        end_ms = int(end.timestamp() * 1000)
+        # startTime and endTime are both inclusive, so slices end a millisecond before the next
+        window_ms = end_ms - start_ms + 1
+        slice_count = min(LOG_SLICES, max(window_ms // LOG_SLICE_MIN_MS, 1))
+        slice_ms = -(-window_ms // slice_count)
+        slices = [
+            (slice_start, min(slice_start + slice_ms - 1, end_ms))
+            for slice_start in range(start_ms, end_ms + 1, slice_ms)
+        ]
+        app = current_app._get_current_object()
+
+        def get_log_slice(log_slice):
+            # greenlets don't inherit the app context
+            with app.app_context():
+                return self._get_log_slice(log_group_name, *log_slice)
+
+        events_by_slice = Pool(LOG_READ_CONCURRENCY).map(get_log_slice, slices)
+        return [event for events in events_by_slice for event in events]
+
+    def _get_log_slice(self, log_group_name, start_ms, end_ms):
+        for attempt in range(1, LOG_SLICE_ATTEMPTS + 1):
+            try:
+                return self._filter_log_events(log_group_name, start_ms, end_ms)
+            except Exception:
+                if attempt == LOG_SLICE_ATTEMPTS:
+                    raise
+                current_app.logger.warning(
+                    f"Retrying {log_group_name} from {start_ms} to {end_ms}, attempt {attempt} failed",
+                    exc_info=True,
+                )
+                gevent.sleep(attempt)
+
+    def _filter_log_events(self, log_group_name, start_ms, end_ms):
         next_token = None
         all_log_events = []
 
@@ -57,14 +109,14 @@ class AwsCloudwatchClient(Client):
                 response = self._client.filter_log_events(
                     logGroupName=log_group_name,
                     nextToken=next_token,
-                    startTime=int(start.timestamp() * 1000),
-                    endTime=int(end.timestamp() * 1000),
+                    startTime=start_ms,
+                    endTime=end_ms,
                 )
             else:
                 response = self._client.filter_log_events(
                     logGroupName=log_group_name,
-                    startTime=int(start.timestamp() * 1000),
-                    endTime=int(end.timestamp() * 1000),
+                    startTime=start_ms,
+                    endTime=end_ms,
                 )
             log_events = response.get("events", [])
             all_log_events.extend(log_events)
@@ -99,7 +151,7 @@ class AwsCloudwatchClient(Client):
         # massage the data into the form the db expects.  When we switch
         # from filter_log_events to log insights this will be convenient
         if isinstance(event, str):
-            event = json.loads(event)
+            event = fast_json.loads(event)
 
         # Don't trust AWS to always send the same JSON structure back
         # However, if we don't get message_id and status we might as well blow up
@@ -166,23 +218,29 @@ class AwsCloudwatchClient(Client):
     # that filter_log_events.  But we are blocked by a permissions issue in the broker.
     # So for now, use filter_log_events and grab all log_events over a 10 minute interval,
     # and run this on a schedule.
-    def check_delivery_receipts(self, start, end):
+    def check_delivery_receipts(self, start, end, watermarks=None):
+        """
+        Return the delivered and failed SMS receipts logged up to end, as lists of dicts.
+
+        watermarks records how far each log group has been read, and is updated in place. Reading
+        carries on from there, however long ago that was (up to MAX_CATCH_UP), so receipts aren't
+        missed or read twice. Without a watermark for a log group, it's read from start.
+        """
+        if watermarks is None:
+            watermarks = {}
         region = cloud_config.sns_region
         account_number = self._extract_account_number(cloud_config.ses_domain_arn)
         log_group_name = f"sns/{region}/{account_number[4]}/DirectPublishToPhoneNumber"
-        delivered_event_set = self._get_receipts(log_group_name, start, end)
-        current_app.logger.info(
-            (f"Delivered message count: {len(delivered_event_set)}")
-        )
+        delivered_events = self._get_receipts(log_group_name, start, end, watermarks)
+        current_app.logger.info((f"Delivered message count: {len(delivered_events)}"))
         log_group_name = (
             f"sns/{region}/{account_number[4]}/DirectPublishToPhoneNumber/Failure"
         )
-        failed_event_set = self._get_receipts(log_group_name, start, end)
-        current_app.logger.info((f"Failed message count: {len(failed_event_set)}"))
+        failed_events = self._get_receipts(log_group_name, start, end, watermarks)
+        current_app.logger.info((f"Failed message count: {len(failed_events)}"))
         raise_exception = False
-        for failure in failed_event_set:
+        for failure in failed_events:
             try:
-                failure = json.loads(failure)
                 if "No quota left for account" == failure["delivery.providerResponse"]:
                     current_app.logger.warning(
                         hilite("**********NO QUOTA LEFT TO SEND MESSAGES!!!**********")
@@ -193,16 +251,35 @@ class AwsCloudwatchClient(Client):
         if raise_exception:
             raise Exception("No Quota Left")
 
-        return delivered_event_set, failed_event_set
+        return delivered_events, failed_events
 
-    def _get_receipts(self, log_group_name, start, end):
-        event_set = set()
+    def _get_receipts(self, log_group_name, start, end, watermarks=None):
+        if watermarks is None:
+            watermarks = {}
+        watermark = watermarks.get(log_group_name)
+        seen_event_ids = watermark["event_ids"] if watermark else {}
+        newest_timestamp = watermark["timestamp"] if watermark else None
+        if newest_timestamp is not None:
+            start = datetime.fromtimestamp(
+                max(
+                    newest_timestamp / 1000 - WATERMARK_OVERLAP.total_seconds(),
+                    end.timestamp() - MAX_CATCH_UP.total_seconds(),
+                ),
+                UTC,
+            )
+
+        receipts = {}
+        event_timestamps = dict(seen_event_ids)
         try:
             all_events = self._get_log(log_group_name, start, end)
             for event in all_events:
+                event_id = event.get("eventId") or event["message"]
+                if event_id in event_timestamps:
+                    continue
+                if "timestamp" in event:
+                    event_timestamps[event_id] = event["timestamp"]
                 try:
-                    actual_event = self.event_to_db_format(event["message"])
-                    event_set.add(json.dumps(actual_event))
+                    receipts[event_id] = self.event_to_db_format(event["message"])
                 except Exception:
                     current_app.logger.exception(
                         f"Could not format delivery receipt {event} for db insert"
@@ -210,7 +287,20 @@ class AwsCloudwatchClient(Client):
         except Exception as e:
             current_app.logger.error(f"Could not find log group {log_group_name}")
             raise e
-        return event_set
+
+        if event_timestamps:
+            newest_timestamp = max(event_timestamps.values())
+            overlap_starts = newest_timestamp - WATERMARK_OVERLAP.total_seconds() * 1000
+            watermarks[log_group_name] = {
+                "timestamp": newest_timestamp,
+                # only events in the overlap can be read again
+                "event_ids": {
+                    event_id: timestamp
+                    for event_id, timestamp in event_timestamps.items()
+                    if timestamp >= overlap_starts
+                },
+            }
+        return list(receipts.values())
 
     def _aws_value_or_default(self, event, top_level, second_level):
         if event.get(top_level) is None or event[top_level].get(second_level) is None:
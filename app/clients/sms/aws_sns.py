@@ -1,16 +1,40 @@
 import os
 import re
+from contextlib import suppress
+from functools import lru_cache
 from time import monotonic
 
 import botocore
 import phonenumbers
 from boto3 import client
 from flask import current_app
+from phonenumbers.phonenumberutil import NumberParseException
 
 from app.clients import AWS_CLIENT_CONFIG
 from app.clients.sms import SmsClient
 from app.cloudfoundry_config import cloud_config
 from app.utils import hilite
+from notifications_utils.recipients import RECIPIENT_CACHE_SIZE
+
+_E164_PHONE_NUMBER = re.compile(r"^\+[1-9]\d{7,14}$")
+
+
+@lru_cache(maxsize=RECIPIENT_CACHE_SIZE)
+def _find_phone_number(to):
+    """The first valid phone number in `to`, formatted as E.164, or None if there isn't one."""
+    # numbers have normally been validated already, so only search the string if it isn't one
+    if _E164_PHONE_NUMBER.match(to):
+        with suppress(NumberParseException):
+            parsed = phonenumbers.parse(to, None)
+            if phonenumbers.is_valid_number(parsed):
+                return phonenumbers.format_number(
+                    parsed, phonenumbers.PhoneNumberFormat.E164
+                )
+    for match in phonenumbers.PhoneNumberMatcher(to, None):
+        return phonenumbers.format_number(
+            match.number, phonenumbers.PhoneNumberFormat.E164
+        )
+    return None
 
 
 class AwsSnsClient(SmsClient):
@@ -49,56 +73,50 @@ class AwsSnsClient(SmsClient):
         return sender and re.match(self._valid_sender_regex, sender)
 
     def send_sms(self, to, content, reference, sender=None, international=False):
-        matched = False
         if "+" not in to:
             to = f"+{to}"
 
-        for match in phonenumbers.PhoneNumberMatcher(to, None):
-            matched = True
-            to = phonenumbers.format_number(
-                match.number, phonenumbers.PhoneNumberFormat.E164
-            )
+        phone_number = _find_phone_number(to)
+        if phone_number is None:
+            self.current_app.logger.error("No valid numbers found in {}".format(to))
+            raise ValueError("No valid numbers found for SMS delivery")
 
-            # See documentation
-            # https://docs.aws.amazon.com/sns/latest/dg/sms_publish-to-phone.html#sms_publish_sdk
-            attributes = {
-                "AWS.SNS.SMS.SMSType": {
-                    "DataType": "String",
-                    "StringValue": "Transactional",
-                }
+        # See documentation
+        # https://docs.aws.amazon.com/sns/latest/dg/sms_publish-to-phone.html#sms_publish_sdk
+        attributes = {
+            "AWS.SNS.SMS.SMSType": {
+                "DataType": "String",
+                "StringValue": "Transactional",
             }
+        }
 
-            if self._valid_sender_number(sender):
-
-                attributes["AWS.MM.SMS.OriginationNumber"] = {
-                    "DataType": "String",
-                    "StringValue": sender,
-                }
-            else:
-                attributes["AWS.MM.SMS.OriginationNumber"] = {
-                    "DataType": "String",
-                    "StringValue": self.current_app.config["AWS_US_TOLL_FREE_NUMBER"],
-                }
-
-            try:
-                start_time = monotonic()
-                response = self._client.publish(
-                    PhoneNumber=to, Message=content, MessageAttributes=attributes
-                )
-                current_app.logger.info(hilite(f"send response = {response}"))
-            except botocore.exceptions.ClientError as e:
-                self.current_app.logger.exception("An error occurred sending sms")
-                raise str(e)
-            except Exception as e:
-                self.current_app.logger.exception("An error occurred sending sms")
-                raise str(e)
-            finally:
-                elapsed_time = monotonic() - start_time
-                self.current_app.logger.info(
-                    "AWS SNS request finished in {}".format(elapsed_time)
-                )
-            return response["MessageId"]
+        if self._valid_sender_number(sender):
 
-        if not matched:
-            self.current_app.logger.error("No valid numbers found in {}".format(to))
-            raise ValueError("No valid numbers found for SMS delivery")
+            attributes["AWS.MM.SMS.OriginationNumber"] = {
+                "DataType": "String",
+                "StringValue": sender,
+            }
+        else:
+            attributes["AWS.MM.SMS.OriginationNumber"] = {
+                "DataType": "String",
+                "StringValue": self.current_app.config["AWS_US_TOLL_FREE_NUMBER"],
+            }
+
+        try:
+            start_time = monotonic()
+            response = self._client.publish(
+                PhoneNumber=phone_number, Message=content, MessageAttributes=attributes
+            )
+            current_app.logger.info(hilite(f"send response = {response}"))
+        except botocore.exceptions.ClientError as e:
+            self.current_app.logger.exception("An error occurred sending sms")
+            raise str(e)
+        except Exception as e:
+            self.current_app.logger.exception("An error occurred sending sms")
+            raise str(e)
+        finally:
+            elapsed_time = monotonic() - start_time
+            self.current_app.logger.info(
+                "AWS SNS request finished in {}".format(elapsed_time)
+            )
+        return response["MessageId"]
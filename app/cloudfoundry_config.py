@@ -18,6 +18,12 @@ class CloudfoundryConfig:
     def database_url(self):
         return getenv("DATABASE_URL", "").replace("postgres://", "postgresql://")
 
+    @property
+    def replica_database_url(self):
+        return getenv("REPLICA_DATABASE_URL", "").replace(
+            "postgres://", "postgresql://"
+        )
+
     @property
     def redis_url(self):
         try:
@@ -83,6 +83,8 @@ class Config(object):
     # encyption secret/salt
     SECRET_KEY = getenv("SECRET_KEY")
     DANGEROUS_SALT = getenv("DANGEROUS_SALT")
+    # "fernet" or "aes-gcm". Either can always be decrypted, so switch once every app is deployed
+    ENCRYPTION_SCHEME = getenv("ENCRYPTION_SCHEME", "fernet")
     ROUTE_SECRET_KEY_1 = getenv("ROUTE_SECRET_KEY_1", "dev-route-secret-key-1")
     ROUTE_SECRET_KEY_2 = getenv("ROUTE_SECRET_KEY_2", "dev-route-secret-key-2")
 
@@ -94,11 +96,31 @@ class Config(object):
     SQLALCHEMY_POOL_TIMEOUT = 30
     SQLALCHEMY_POOL_RECYCLE = 300
     SQLALCHEMY_STATEMENT_TIMEOUT = 1200
+    # Optional read replica for reporting queries, see app.dao.dao_utils.read_replica. Reads fall
+    # back to the primary while replication lag is over SQLALCHEMY_REPLICA_MAX_LAG_SECONDS.
+    SQLALCHEMY_BINDS = (
+        {"replica": cloud_config.replica_database_url}
+        if cloud_config.replica_database_url
+        else {}
+    )
+    SQLALCHEMY_REPLICA_MAX_LAG_SECONDS = int(
+        getenv("SQLALCHEMY_REPLICA_MAX_LAG_SECONDS", 30)
+    )
+    SQLALCHEMY_REPLICA_LAG_CHECK_SECONDS = 10
+    # statements slower than this are logged with a fingerprint, see app.sql_metrics
+    SQLALCHEMY_SLOW_QUERY_THRESHOLD_SECONDS = float(
+        getenv("SQLALCHEMY_SLOW_QUERY_THRESHOLD_SECONDS", 1)
+    )
+    # notifications is partitioned by day, see maintain-notification-partitions
+    NOTIFICATIONS_PARTITION_PRECREATE_DAYS = 14
     PAGE_SIZE = 20
     API_PAGE_SIZE = 250
     REDIS_URL = cloud_config.redis_url
     REDIS_ENABLED = getenv("REDIS_ENABLED", "1") == "1"
     EXPIRE_CACHE_TEN_MINUTES = 600
+    # the longest a process keeps a serialised service, template or API keys, in case an
+    # invalidation is lost. See app.serialised_models.CacheInvalidationListener
+    SERIALISED_MODEL_CACHE_TTL = 300
     EXPIRE_CACHE_EIGHT_DAYS = 8 * 24 * 60 * 60
 
     # AWS Settings
@@ -134,6 +156,23 @@ class Config(object):
     MAX_VERIFY_CODE_COUNT = 5
     MAX_FAILED_LOGIN_COUNT = 10
     API_RATE_LIMIT_ENABLED = True
+    # each process takes this much of a service's total message limit from redis at a time
+    MESSAGE_LIMIT_LEASE_SIZE = 100
+    MESSAGE_LIMIT_LEASE_SECONDS = 10
+    # queue SES receipts in redis and process them in batches, rather than a task for each
+    SES_RESULTS_BATCHED = getenv("SES_RESULTS_BATCHED", "0") == "1"
+    SES_RESULTS_BATCH_SIZE = 1000
+    # service callbacks, see app/clients/callback_dispatcher.py
+    CALLBACK_MAX_CONNECTIONS_PER_HOST = 10
+    CALLBACK_HOST_BUSY_TIMEOUT = 5
+    CALLBACK_CIRCUIT_BREAKER_FAILURES = 5
+    CALLBACK_CIRCUIT_BREAKER_RESET_SECONDS = 60
+    # services that get their delivery statuses in batches, rather than a callback for each
+    BATCHED_CALLBACK_SERVICES = json.loads(getenv("BATCHED_CALLBACK_SERVICES", "[]"))
+    CALLBACK_BATCH_SIZE = 100
+    CALLBACK_BATCH_MAX_WAIT_MS = 2000
+    # delivery tasks sent over each broker connection by send_notifications_to_queue_detached
+    BULK_NOTIFICATIONS_QUEUE_CHUNK_SIZE = 100
 
     # Default data
     CONFIG_FILES = path.dirname(__file__) + "/config_files/"
@@ -180,6 +219,9 @@ class Config(object):
         "task_ignore_result": True,
         "result_persistent": False,
         "broker_url": REDIS_URL,
+        # "notify-json" is "json" encoded with orjson, when it's installed
+        "accept_content": ["json", "notify-json"],
+        "task_serializer": getenv("CELERY_TASK_SERIALIZER", "json"),
         "broker_transport_options": {
             "visibility_timeout": 310,
         },
@@ -222,6 +264,16 @@ class Config(object):
                 "schedule": 10.0,
                 "options": {"queue": QueueNames.PERIODIC},
             },
+            "sweep-delivery-status-callbacks": {
+                "task": "sweep-delivery-status-callbacks",
+                "schedule": timedelta(minutes=1),
+                "options": {"queue": QueueNames.PERIODIC},
+            },
+            "process-queued-ses-results": {
+                "task": "process-queued-ses-results",
+                "schedule": 10.0,
+                "options": {"queue": QueueNames.PERIODIC},
+            },
             "expire-or-delete-invitations": {
                 "task": "expire-or-delete-invitations",
                 "schedule": timedelta(minutes=66),
@@ -260,6 +312,13 @@ class Config(object):
                 ),  # after 'timeout-sending-notifications'
                 "options": {"queue": QueueNames.REPORTING},
             },
+            "maintain-notification-partitions": {
+                "task": "maintain-notification-partitions",
+                "schedule": crontab(
+                    hour=6, minute=45
+                ),  # before 'delete-notifications-older-than-retention'
+                "options": {"queue": QueueNames.REPORTING},
+            },
             "delete-notifications-older-than-retention": {
                 "task": "delete-notifications-older-than-retention",
                 "schedule": crontab(
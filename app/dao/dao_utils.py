@@ -1,10 +1,17 @@
 import itertools
 from contextlib import contextmanager
 from functools import wraps
+from time import monotonic
 
-from app import db
+from flask import current_app
+from sqlalchemy import text
+from sqlalchemy.exc import SQLAlchemyError
+
+from app import db, use_read_replica
 from app.history_meta import create_history
 
+_replica_lag_check = {"checked_at": None, "usable": False}
+
 
 def autocommit(func):
     @wraps(func)
@@ -37,6 +44,81 @@ def transaction():
         raise
 
 
+def _replica_is_usable():
+    """
+    Whether the replica bind exists and is within SQLALCHEMY_REPLICA_MAX_LAG_SECONDS of the
+    primary. The lag is checked at most every SQLALCHEMY_REPLICA_LAG_CHECK_SECONDS.
+    """
+    replica = db.engines.get("replica")
+    if replica is None:
+        return False
+
+    checked_at = _replica_lag_check["checked_at"]
+    if (
+        checked_at is not None
+        and monotonic() - checked_at
+        < current_app.config["SQLALCHEMY_REPLICA_LAG_CHECK_SECONDS"]
+    ):
+        return _replica_lag_check["usable"]
+
+    # a replica that has replayed everything it has received is up to date, however long ago
+    # the last write was. Both are null if the bind isn't a replica at all.
+    lag_query = """
+        SELECT CASE
+            WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0
+            ELSE EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp())
+        END
+    """
+    try:
+        with replica.connect() as connection:
+            lag = connection.execute(text(lag_query)).scalar()
+        usable = (lag or 0) <= current_app.config["SQLALCHEMY_REPLICA_MAX_LAG_SECONDS"]
+        if not usable:
+            current_app.logger.warning(
+                f"Read replica is {lag} seconds behind, reading from the primary"
+            )
+    except SQLAlchemyError:
+        current_app.logger.exception(
+            "Could not check read replica lag, reading from the primary"
+        )
+        usable = False
+
+    _replica_lag_check.update(checked_at=monotonic(), usable=usable)
+    return usable
+
+
+@contextmanager
+def read_replica():
+    """
+    Send the queries made inside this (as a context manager or a decorator) to the read replica,
+    if one is configured and it isn't lagging too far behind. Only use it for reads that can be
+    slightly stale and don't need to see anything the current transaction has written.
+    """
+    if use_read_replica.get() or not _replica_is_usable():
+        yield
+        return
+
+    token = use_read_replica.set(True)
+    try:
+        yield
+    finally:
+        use_read_replica.reset(token)
+
+
+def get_pool_metrics():
+    """Connection pool usage for each database bind, keyed by bind name."""
+    return {
+        bind_key
+        or "primary": {
+            "size": engine.pool.size(),
+            "checked_out": engine.pool.checkedout(),
+            "checked_in": engine.pool.checkedin(),
+            "overflow": engine.pool.overflow(),
+        }
+        for bind_key, engine in db.engines.items()
+    }
+
+
 class VersionOptions:
     def __init__(self, model_class, history_class=None, must_write_history=True):
         self.model_class = model_class
@@ -86,6 +168,19 @@ def version_class(*version_options):
     return versioned
 
 
+def invalidate_service_cache_on_commit(service_id, template_id=None):
+    """
+    Evict a service's cached serialised models (see app.serialised_models) once the current
+    transaction commits. Writes made through the session's objects are picked up automatically;
+    bulk updates and deletes aren't, so call this alongside them.
+    """
+    template_ids = db.session.info.setdefault(
+        "service_cache_invalidations", {}
+    ).setdefault(str(service_id), set())
+    if template_id:
+        template_ids.add(str(template_id))
+
+
 def dao_rollback():
     db.session.rollback()
 
@@ -6,6 +6,7 @@ from sqlalchemy.dialects.postgresql import insert
 from sqlalchemy.sql.expression import case, literal
 
 from app import db
+from app.dao.dao_utils import read_replica
 from app.dao.date_util import get_calendar_year_dates, get_calendar_year_for_datetime
 from app.dao.organization_dao import (
     dao_get_organization_live_services,
@@ -25,6 +26,7 @@ from app.utils import get_midnight_in_utc, utc_now
 
 
 def fetch_sms_free_allowance_remainder_until_date(end_date):
+    # Only builds the statement, so callers that execute it choose where it runs.
     # ASSUMPTION: AnnualBilling has been populated for year.
     billing_year = get_calendar_year_for_datetime(end_date)
     start_of_year = date(billing_year, 4, 1)
@@ -66,6 +68,7 @@ def fetch_sms_free_allowance_remainder_until_date(end_date):
     return query
 
 
+@read_replica()
 def fetch_sms_billing_for_all_services(start_date, end_date):
     # ASSUMPTION: AnnualBilling has been populated for year.
     allowance_left_at_start_date_stmt = fetch_sms_free_allowance_remainder_until_date(
@@ -133,6 +136,7 @@ def fetch_sms_billing_for_all_services(start_date, end_date):
     return db.session.execute(query).all()
 
 
+@read_replica()
 def fetch_billing_totals_for_year(service_id, year):
     """
     Returns a row for each distinct rate and notification_type from ft_billing
@@ -175,6 +179,7 @@ def fetch_billing_totals_for_year(service_id, year):
     return db.session.execute(stmt).all()
 
 
+@read_replica()
 def fetch_monthly_billing_for_year(service_id, year):
     """
     Returns a row for each distinct rate, notification_type, and month
@@ -559,6 +564,7 @@ def create_billing_record(data, rate, process_day):
     return billing_record
 
 
+@read_replica()
 def fetch_email_usage_for_organization(organization_id, start_date, end_date):
     query = (
         select(
@@ -587,6 +593,7 @@ def fetch_email_usage_for_organization(organization_id, start_date, end_date):
     return db.session.execute(query).all()
 
 
+@read_replica()
 def fetch_sms_billing_for_organization(organization_id, financial_year):
     # ASSUMPTION: AnnualBilling has been populated for year.
     ft_billing_substmt = query_organization_sms_usage_for_year(
@@ -699,6 +706,7 @@ def query_organization_sms_usage_for_year(organization_id, year):
     )
 
 
+@read_replica()
 def fetch_usage_year_for_organization(
     organization_id, year, include_all_services=False
 ):
@@ -756,6 +764,7 @@ def fetch_usage_year_for_organization(
     return service_with_usage
 
 
+@read_replica()
 def fetch_billing_details_for_all_services():
     billing_details = (
         select(
@@ -781,6 +790,7 @@ def fetch_billing_details_for_all_services():
     return db.session.execute(billing_details).all()
 
 
+@read_replica()
 def fetch_daily_volumes_for_platform(start_date, end_date):
     # query to return the total notifications sent per day for each channel. NB start and end dates are inclusive
 
@@ -848,6 +858,7 @@ def fetch_daily_volumes_for_platform(start_date, end_date):
     return db.session.execute(aggregated_totals).all()
 
 
+@read_replica()
 def fetch_daily_sms_provider_volumes_for_platform(start_date, end_date):
     # query to return the total notifications sent per day for each channel. NB start and end dates are inclusive
 
@@ -884,6 +895,7 @@ def fetch_daily_sms_provider_volumes_for_platform(start_date, end_date):
     return db.session.execute(stmt).all()
 
 
+@read_replica()
 def fetch_volumes_by_service(start_date, end_date):
     # query to return the volume totals by service aggregated for the date range given
     # start and end dates are inclusive.
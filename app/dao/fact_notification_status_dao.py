@@ -7,7 +7,7 @@ from sqlalchemy.sql.expression import extract, literal
 from sqlalchemy.types import DateTime, Integer, Text
 
 from app import db
-from app.dao.dao_utils import autocommit
+from app.dao.dao_utils import autocommit, read_replica
 from app.enums import KeyType, NotificationStatus, NotificationType
 from app.models import (
     FactNotificationStatus,
@@ -515,6 +515,7 @@ def fetch_monthly_template_usage_for_service(start_date, end_date, service_id):
     return db.session.execute(query).all()
 
 
+@read_replica()
 def get_total_notifications_for_date_range(start_date, end_date):
     stmt = (
         select(
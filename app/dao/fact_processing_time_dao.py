@@ -3,7 +3,7 @@ from sqlalchemy.dialects.postgresql import insert
 from sqlalchemy.sql.expression import case
 
 from app import db
-from app.dao.dao_utils import autocommit
+from app.dao.dao_utils import autocommit, read_replica
 from app.models import FactProcessingTime
 from app.utils import utc_now
 
@@ -33,6 +33,7 @@ def insert_update_processing_time(processing_time):
     db.session.connection().execute(stmt)
 
 
+@read_replica()
 def get_processing_time_percentage_for_date_range(start_date, end_date):
     query = (
         select(
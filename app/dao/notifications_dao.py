@@ -1,5 +1,6 @@
 import json
 import os
+import re
 from datetime import datetime, timedelta
 from time import time
 
@@ -130,6 +131,20 @@ def dao_create_notification(notification):
                     )
 
 
+@autocommit
+def dao_create_notifications(notifications):
+    """
+    Saves new notifications with one insert, leaving out the same details as
+    dao_create_notification does.
+    """
+    for notification in notifications:
+        if "verify_code" not in str(notification.personalisation):
+            notification.personalisation = ""
+        notification.to = "1"
+        notification.normalised_to = "1"
+    db.session.bulk_save_objects(notifications)
+
+
 def country_records_delivery(phone_prefix):
     dlr = INTERNATIONAL_BILLING_RATES[phone_prefix]["attributes"]["dlr"]
     return dlr and dlr.lower() == "yes"
@@ -161,6 +176,40 @@ def _update_notification_status(
     return notification
 
 
+@autocommit
+def dao_update_notification_statuses(notifications_by_status):
+    """
+    Takes a dict of (status, provider_response) to a list of notifications, and makes the same
+    changes _update_notification_status would, with one UPDATE for each. A notification that's
+    no longer sending or pending is left alone.
+    """
+    now = utc_now()
+    for (status, provider_response), notifications in notifications_by_status.items():
+        # notify-api-742 remove phone numbers from db
+        values = {
+            "status": status,
+            "sent_at": now,
+            "updated_at": now,
+            "to": "1",
+            "normalised_to": "1",
+        }
+        if provider_response:
+            values["provider_response"] = provider_response
+        stmt = (
+            update(Notification)
+            .where(
+                Notification.id.in_(
+                    [notification.id for notification in notifications]
+                ),
+                Notification.status.in_(
+                    [NotificationStatus.SENDING, NotificationStatus.PENDING]
+                ),
+            )
+            .values(**values)
+        )
+        db.session.execute(stmt)
+
+
 def update_notification_message_id(notification_id, message_id):
     stmt = (
         update(Notification)
@@ -528,6 +577,25 @@ def get_notifications_for_service(
     return pagination
 
 
+def dao_stream_notifications_for_report(service_id, limit_days, limit, chunk_size=1000):
+    """
+    Yield up to `limit` of a service's notifications from the last `limit_days` days, newest first
+    and excluding test key notifications, fetched through a server-side cursor a chunk at a time.
+    """
+    stmt = (
+        select(Notification)
+        .where(
+            Notification.service_id == service_id,
+            Notification.created_at >= midnight_n_days_ago(limit_days),
+            Notification.key_type != KeyType.TEST,
+        )
+        .order_by(desc(Notification.created_at))
+        .limit(limit)
+        .execution_options(yield_per=chunk_size)
+    )
+    yield from db.session.execute(stmt).scalars()
+
+
 def _filter_query(stmt, filter_dict=None):
     if filter_dict is None:
         return stmt
@@ -566,50 +634,57 @@ def sanitize_successful_notification_by_id(notification_id, carrier, provider_re
     db.session.commit()
 
 
+# Columns carried over from notifications into notification_history when archiving
+NOTIFICATION_HISTORY_COLUMNS = """
+    id, job_id, job_row_number, service_id, template_id, template_version, api_key_id,
+    key_type, notification_type, created_at, sent_at, sent_by, updated_at, reference, billable_units,
+    client_reference, international, phone_prefix, rate_multiplier, notification_status,
+    created_by_id, document_download_count, message_cost
+"""
+
+
+# Archiving adapts its batch size so each statement takes roughly this long, within these bounds.
+ARCHIVE_BATCH_TARGET_SECONDS = 20
+ARCHIVE_BATCH_MIN_SIZE = 1000
+ARCHIVE_BATCH_MAX_SIZE = 100000
+
+
 @autocommit
 def insert_notification_history_delete_notifications(
     notification_type, service_id, timestamp_to_delete_backwards_from, qry_limit=50000
 ):
     """
-    Delete up to 50,000 notifications that are past retention for a notification type and service.
-
-
-    Steps are as follows:
-
-    Create a temporary notifications table
-    Populate that table with up to 50k notifications that are to be deleted. (Note: no specified order)
-    Insert everything in the temp table into notification history
-    Delete from notifications if notification id is in the temp table
-    Drop the temp table (automatically when the transaction commits)
-
-    Temporary tables are in a separate postgres schema, and only visible to the current session (db connection,
-    in a celery task there's one connection per thread.)
-    """
-    # Setting default query limit to 50,000 which take about 48 seconds on current table size
-    # 10, 000 took 11s and 100,000 took 1 min 30 seconds.
-    select_into_temp_table = """
-         CREATE TEMP TABLE NOTIFICATION_ARCHIVE ON COMMIT DROP AS
-         SELECT id, job_id, job_row_number, service_id, template_id, template_version, api_key_id,
-             key_type, notification_type, created_at, sent_at, sent_by, updated_at, reference, billable_units,
-             client_reference, international, phone_prefix, rate_multiplier, notification_status,
-              created_by_id, document_download_count, message_cost
-          FROM notifications
-        WHERE service_id = :service_id
-          AND notification_type = :notification_type
-          AND created_at < :timestamp_to_delete_backwards_from
-          AND key_type in ('normal', 'team')
-        limit :qry_limit
-        """
-    # Insert into NotificationHistory if the row already exists do nothing.
-    insert_query = """
-        insert into notification_history
-         SELECT * from NOTIFICATION_ARCHIVE
-          ON CONFLICT ON CONSTRAINT notification_history_pkey
-          DO NOTHING
-    """
-    delete_query = """
-        DELETE FROM notifications
-        where id in (select id from NOTIFICATION_ARCHIVE)
+    Move up to qry_limit notifications that are past retention for a notification type and service
+    into notification history, and return how many were moved.
+
+    This is a single statement: the DELETE ... RETURNING hands the deleted rows straight to the
+    INSERT into notification_history, so each batch scans notifications once and nothing is staged
+    in a temp table. Rows already in history are left alone (ON CONFLICT DO NOTHING) but still
+    deleted and counted.
+
+    Batches are picked by id rather than ctid, because ctid is not unique across the partitions of
+    notifications.
+    """
+    archive_query = f"""
+        WITH moved AS (
+            DELETE FROM notifications
+             WHERE id IN (
+                SELECT id
+                  FROM notifications
+                 WHERE service_id = :service_id
+                   AND notification_type = :notification_type
+                   AND created_at < :timestamp_to_delete_backwards_from
+                   AND key_type in ('normal', 'team')
+                 LIMIT :qry_limit
+             )
+            RETURNING {NOTIFICATION_HISTORY_COLUMNS}
+        ), archived AS (
+            INSERT INTO notification_history ({NOTIFICATION_HISTORY_COLUMNS})
+            SELECT {NOTIFICATION_HISTORY_COLUMNS} FROM moved
+                ON CONFLICT ON CONSTRAINT notification_history_pkey
+                DO NOTHING
+        )
+        SELECT count(*) FROM moved
     """
     input_params = {
         "service_id": service_id,
@@ -618,25 +693,33 @@ def insert_notification_history_delete_notifications(
         "qry_limit": qry_limit,
     }
 
-    db.session.execute(text(select_into_temp_table), input_params)
+    return db.session.execute(text(archive_query), input_params).scalar()
 
-    result = db.session.execute(
-        text("select count(*) from NOTIFICATION_ARCHIVE")
-    ).fetchone()[0]
 
-    db.session.execute(text(insert_query))
-
-    db.session.execute(text(delete_query))
-
-    return result
+def _next_archive_batch_size(batch_size, elapsed_seconds):
+    """
+    Scale the batch size towards ARCHIVE_BATCH_TARGET_SECONDS, by at most a factor of two either way
+    so that one unusually slow or fast batch doesn't swing it too far.
+    """
+    scale = ARCHIVE_BATCH_TARGET_SECONDS / max(elapsed_seconds, 0.001)
+    scale = min(max(scale, 0.5), 2)
+    return min(
+        max(int(batch_size * scale), ARCHIVE_BATCH_MIN_SIZE), ARCHIVE_BATCH_MAX_SIZE
+    )
 
 
 def move_notifications_to_notification_history(
     notification_type, service_id, timestamp_to_delete_backwards_from, qry_limit=50000
 ):
+    """
+    Archive notifications older than the timestamp in batches, starting with qry_limit rows and
+    adjusting the batch size after each one so that batches take about ARCHIVE_BATCH_TARGET_SECONDS
+    whatever the load on the database. Test key notifications are deleted without being archived.
+    """
     deleted = 0
     delete_count_per_call = 1
     while delete_count_per_call > 0:
+        start = time()
         delete_count_per_call = insert_notification_history_delete_notifications(
             notification_type=notification_type,
             service_id=service_id,
@@ -644,6 +727,9 @@ def move_notifications_to_notification_history(
             qry_limit=qry_limit,
         )
         deleted += delete_count_per_call
+        # a short batch ran out of rows rather than time, so says nothing about the right size
+        if delete_count_per_call == qry_limit:
+            qry_limit = _next_archive_batch_size(qry_limit, time() - start)
 
     # Deleting test Notifications, test notifications are not persisted to NotificationHistory
     stmt = delete(Notification).where(
@@ -665,37 +751,226 @@ def dao_delete_notifications_by_id(notification_id):
     )
 
 
-def dao_timeout_notifications(cutoff_time, limit=100000):
+def _notification_partition_name(range_start):
+    return f"notifications_p{range_start:%Y%m%d}"
+
+
+def _partition_bound_to_datetime(bound):
+    if bound in ("MINVALUE", "MAXVALUE"):
+        return None
+    return datetime.fromisoformat(bound.strip("'"))
+
+
+def dao_notifications_table_is_partitioned():
+    stmt = text("""
+        SELECT EXISTS (
+            SELECT 1
+              FROM pg_partitioned_table
+              JOIN pg_class ON pg_class.oid = pg_partitioned_table.partrelid
+             WHERE pg_class.relname = 'notifications'
+        )
+        """)
+    return db.session.execute(stmt).scalar()
+
+
+def dao_get_notification_partitions():
     """
-    Set email and SMS notifications (only) to "temporary-failure" status
-    if they're still sending from before the specified cutoff_time.
+    Return (name, range_start, range_end, detach_pending) for every partition of notifications,
+    oldest first.
+
+    range_start is None for notifications_legacy, which holds everything from before the table was
+    partitioned (see migration 0419). detach_pending is set if a concurrent detach was interrupted.
+    """
+    stmt = text("""
+        SELECT child.relname AS name,
+               pg_get_expr(child.relpartbound, child.oid) AS bound,
+               pg_inherits.inhdetachpending AS detach_pending
+          FROM pg_inherits
+          JOIN pg_class parent ON parent.oid = pg_inherits.inhparent
+          JOIN pg_class child ON child.oid = pg_inherits.inhrelid
+         WHERE parent.relname = 'notifications'
+        """)
+    partitions = []
+    for row in db.session.execute(stmt):
+        bounds = re.match(r"FOR VALUES FROM \((.+)\) TO \((.+)\)", row.bound)
+        partitions.append(
+            (
+                row.name,
+                _partition_bound_to_datetime(bounds.group(1)),
+                _partition_bound_to_datetime(bounds.group(2)),
+                row.detach_pending,
+            )
+        )
+    return sorted(partitions, key=lambda partition: partition[2])
+
+
+def dao_get_detached_notification_partitions():
+    """
+    Return the names of partitions that were detached from notifications but not yet dropped,
+    because dao_archive_notification_partition stopped part way through.
     """
-    updated_at = utc_now()
-    current_statuses = [NotificationStatus.SENDING, NotificationStatus.PENDING]
-    new_status = NotificationStatus.TEMPORARY_FAILURE
+    stmt = text("""
+        SELECT relname
+          FROM pg_class
+         WHERE relkind = 'r'
+           AND NOT relispartition
+           AND relnamespace = current_schema()::regnamespace
+           AND (relname ~ '^notifications_p[0-9]{8}$' OR relname = 'notifications_legacy')
+         ORDER BY relname
+        """)
+    return db.session.execute(stmt).scalars().all()
 
-    stmt = (
-        select(Notification)
-        .where(
-            Notification.created_at < cutoff_time,
-            Notification.status.in_(current_statuses),
-            Notification.notification_type.in_(
-                [NotificationType.SMS, NotificationType.EMAIL]
-            ),
+
+@autocommit
+def dao_create_notification_partitions(until):
+    """
+    Create daily partitions, starting from the end of the newest partition, until the table can
+    hold notifications created up to `until`.
+
+    There is deliberately no default partition (it would stop partitions from being detached
+    concurrently), so an insert past the newest partition fails. The nightly task keeps
+    NOTIFICATIONS_PARTITION_PRECREATE_DAYS of partitions ahead of today.
+    """
+    partitions = dao_get_notification_partitions()
+    if not partitions:
+        return []
+
+    created = []
+    range_start = partitions[-1][2]
+    while range_start < until:
+        range_end = range_start + timedelta(days=1)
+        partition_name = _notification_partition_name(range_start)
+        db.session.execute(text(f"""
+                CREATE TABLE {partition_name} PARTITION OF notifications
+                FOR VALUES FROM ('{range_start:%Y-%m-%d %H:%M:%S}')
+                TO ('{range_end:%Y-%m-%d %H:%M:%S}')
+                """))
+        created.append(partition_name)
+        range_start = range_end
+
+    return created
+
+
+def dao_archive_notification_partition(partition_name, detach_pending=False):
+    """
+    Copy a partition's non-test rows into notification_history, then detach and drop it.
+
+    Every step is its own short transaction, and the detach is done concurrently, so notifications
+    is never locked against reads or inserts while rows are copied. If the task dies part way
+    through, the next run picks up where it stopped: an interrupted detach is finalized, and a
+    partition that was detached but not dropped is found by
+    dao_get_detached_notification_partitions.
+    """
+    archived = db.session.execute(text(f"""
+            INSERT INTO notification_history ({NOTIFICATION_HISTORY_COLUMNS})
+            SELECT {NOTIFICATION_HISTORY_COLUMNS}
+              FROM {partition_name}
+             WHERE key_type in ('normal', 'team')
+            ON CONFLICT ON CONSTRAINT notification_history_pkey
+            DO NOTHING
+            """)).rowcount
+    db.session.commit()
+
+    # DETACH ... CONCURRENTLY can't run inside a transaction block
+    with db.engine.connect().execution_options(
+        isolation_level="AUTOCOMMIT"
+    ) as connection:
+        detach = "FINALIZE" if detach_pending else "CONCURRENTLY"
+        connection.execute(
+            text(
+                f"ALTER TABLE notifications DETACH PARTITION {partition_name} {detach}"
+            )
         )
-        .limit(limit)
-    )
-    notifications = db.session.execute(stmt).scalars().all()
 
+    _drop_detached_notification_partition(partition_name)
+    return archived
+
+
+def _drop_detached_notification_partition(partition_name):
+    db.session.execute(text(f"""
+            DELETE FROM notification_ids
+             WHERE id IN (SELECT id FROM {partition_name})
+            """))
+    db.session.commit()
+
+    db.session.execute(text(f"DROP TABLE {partition_name}"))
+    db.session.commit()
+
+
+def dao_archive_notification_partitions_before(timestamp):
+    """
+    Archive every partition that only holds notifications created before timestamp, after
+    finishing any that were left detached by an earlier run.
+    """
+    archived = {}
+    for partition_name in dao_get_detached_notification_partitions():
+        # its rows were copied to notification_history before it was detached
+        _drop_detached_notification_partition(partition_name)
+        archived[partition_name] = 0
+
+    for (
+        partition_name,
+        _,
+        range_end,
+        detach_pending,
+    ) in dao_get_notification_partitions():
+        if range_end > timestamp:
+            break
+        archived[partition_name] = dao_archive_notification_partition(
+            partition_name, detach_pending=detach_pending
+        )
+    return archived
+
+
+def dao_timeout_notifications(cutoff_time, limit=10000):
+    """
+    Set up to `limit` email and SMS notifications (only) to "temporary-failure" status
+    if they're still sending from before the specified cutoff_time.
+
+    Returns (id, service_id) for each notification updated, rather than the notifications
+    themselves, so callers can work through a large backlog a chunk at a time without loading
+    every row.
+    """
     stmt = (
         update(Notification)
-        .where(Notification.id.in_([n.id for n in notifications]))
-        .values({"status": new_status, "updated_at": updated_at})
+        .where(
+            Notification.id.in_(
+                select(Notification.id)
+                .where(
+                    Notification.created_at < cutoff_time,
+                    Notification.status.in_(
+                        [NotificationStatus.SENDING, NotificationStatus.PENDING]
+                    ),
+                    Notification.notification_type.in_(
+                        [NotificationType.SMS, NotificationType.EMAIL]
+                    ),
+                )
+                .limit(limit)
+            )
+        )
+        .values(
+            {"status": NotificationStatus.TEMPORARY_FAILURE, "updated_at": utc_now()}
+        )
+        .returning(Notification.id, Notification.service_id)
+        .execution_options(synchronize_session=False)
     )
-    db.session.execute(stmt)
+    timed_out = db.session.execute(stmt).all()
 
     db.session.commit()
-    return notifications
+    return timed_out
+
+
+def dao_stream_notifications_by_ids(notification_ids, chunk_size=1000):
+    """
+    Yield the notifications with the given ids, fetched through a server-side cursor a chunk at a
+    time rather than all at once.
+    """
+    stmt = (
+        select(Notification)
+        .where(Notification.id.in_(notification_ids))
+        .execution_options(yield_per=chunk_size)
+    )
+    yield from db.session.execute(stmt).scalars()
 
 
 @autocommit
@@ -787,6 +1062,11 @@ def dao_get_notification_by_reference(reference):
     return db.session.execute(stmt).scalars().one()
 
 
+def dao_get_notifications_by_references(references):
+    stmt = select(Notification).where(Notification.reference.in_(references))
+    return db.session.execute(stmt).scalars().all()
+
+
 def dao_get_notification_history_by_reference(reference):
     try:
         # This try except is necessary because in test keys and research mode does not create notification history.
@@ -1,4 +1,4 @@
-from sqlalchemy import select, update
+from sqlalchemy import func, select, update
 
 from app import db
 from app.dao.dao_utils import autocommit
@@ -69,3 +69,8 @@ def fetch_service_data_retention_for_all_services_by_notification_type(
         ServiceDataRetention.notification_type == notification_type
     )
     return db.session.execute(stmt).scalars().all()
+
+
+def fetch_longest_days_of_retention():
+    stmt = select(func.max(ServiceDataRetention.days_of_retention))
+    return db.session.execute(stmt).scalar()
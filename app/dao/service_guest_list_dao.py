@@ -1,6 +1,7 @@
 from sqlalchemy import delete, select
 
 from app import db
+from app.dao.dao_utils import invalidate_service_cache_on_commit
 from app.models import ServiceGuestList
 
 
@@ -17,4 +18,5 @@ def dao_add_and_commit_guest_list_contacts(objs):
 def dao_remove_service_guest_list(service_id):
     stmt = delete(ServiceGuestList).where(ServiceGuestList.service_id == service_id)
     result = db.session.execute(stmt)
+    invalidate_service_cache_on_commit(service_id)
     return result.rowcount
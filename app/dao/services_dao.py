@@ -7,7 +7,7 @@ from sqlalchemy.orm import joinedload
 from sqlalchemy.sql.expression import and_, asc, case, func
 
 from app import db
-from app.dao.dao_utils import VersionOptions, autocommit, version_class
+from app.dao.dao_utils import VersionOptions, autocommit, read_replica, version_class
 from app.dao.date_util import (
     generate_date_range,
     generate_hourly_range,
@@ -485,6 +485,7 @@ def dao_fetch_todays_stats_for_service(service_id):
     return db.session.execute(stmt).all()
 
 
+@read_replica()
 def dao_fetch_stats_for_service_from_days(service_id, start_date, end_date):
     start_date = get_midnight_in_utc(start_date)
     end_date = get_midnight_in_utc(end_date + timedelta(days=1))
@@ -841,6 +842,7 @@ def dao_find_services_with_high_failure_rates(start_date, end_date, threshold=10
     return db.session.execute(stmt).all()
 
 
+@read_replica()
 def get_live_services_with_organization():
 
     stmt = (
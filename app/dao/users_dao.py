@@ -8,7 +8,7 @@ from sqlalchemy import delete, func, select, text
 from sqlalchemy.orm import joinedload
 
 from app import db
-from app.dao.dao_utils import autocommit
+from app.dao.dao_utils import autocommit, invalidate_service_cache_on_commit
 from app.dao.permissions_dao import permission_dao
 from app.dao.service_user_dao import dao_get_service_users_by_user_id
 from app.enums import AuthType, PermissionType, UserState
@@ -66,7 +66,15 @@ def get_login_gov_user(login_uuid, email_address):
     return None
 
 
+def _invalidate_service_caches_if_contact_details_changed(user, update_dict):
+    # team members' email addresses and phone numbers are in their services' cached allowlists
+    if {"email_address", "mobile_number"} & set(update_dict or {}):
+        for service in user.services:
+            invalidate_service_cache_on_commit(service.id)
+
+
 def save_user_attribute(usr, update_dict=None):
+    _invalidate_service_caches_if_contact_details_changed(usr, update_dict)
     db.session.query(User).where(User.id == usr.id).update(update_dict or {})
     db.session.commit()
 
@@ -84,6 +92,7 @@ def save_model_user(
         user.email_access_validated_at = utc_now()
     if update_dict:
         _remove_values_for_keys_if_present(update_dict, ["id", "password_changed_at"])
+        _invalidate_service_caches_if_contact_details_changed(user, update_dict)
         db.session.query(User).where(User.id == user.id).update(update_dict or {})
     else:
         db.session.add(user)
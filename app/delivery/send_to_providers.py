@@ -25,7 +25,6 @@ from app.enums import BrandType, KeyType, NotificationStatus, NotificationType
 from app.exceptions import NotificationTechnicalFailureException
 from app.serialised_models import SerialisedService, SerialisedTemplate
 from app.utils import hilite, utc_now
-from notifications_utils.clients.redis import total_limit_cache_key
 from notifications_utils.template import (
     HTMLEmailTemplate,
     PlainTextEmailTemplate,
@@ -148,9 +147,6 @@ def send_sms_to_provider(notification):
                 notification.billable_units = template.fragment_count
                 update_notification_to_sending(notification, provider)
 
-                cache_key = total_limit_cache_key(service.id)
-                redis_store.incr(cache_key)
-
     return message_id
 
 
@@ -1513,7 +1513,11 @@ class Notification(db.Model):
     key_type = enum_column(KeyType, unique=False, nullable=False)
     billable_units = db.Column(db.Integer, nullable=False, default=0)
     notification_type = enum_column(NotificationType, nullable=False)
-    created_at = db.Column(db.DateTime, index=True, unique=False, nullable=False)
+    # notifications is partitioned by created_at, which therefore has to be part of the table's
+    # primary key. id is still unique on its own (see NotificationId) and is what the ORM keys on.
+    created_at = db.Column(
+        db.DateTime, index=True, unique=False, nullable=False, primary_key=True
+    )
     sent_at = db.Column(db.DateTime, index=False, unique=False, nullable=True)
     sent_by = db.Column(db.String, nullable=True)
     message_cost = db.Column(db.Float, nullable=True, default=0.0)
@@ -1559,9 +1563,6 @@ class Notification(db.Model):
             ["template_id", "template_version"],
             ["templates_history.id", "templates_history.version"],
         ),
-        UniqueConstraint(
-            "job_id", "job_row_number", name="uq_notifications_job_row_number"
-        ),
         Index(
             "ix_notifications_notification_type_composite",
             "notification_type",
@@ -1577,6 +1578,7 @@ class Notification(db.Model):
             "created_at",
         ),
     )
+    __mapper_args__ = {"primary_key": [id]}
 
     @property
     def personalisation(self):
@@ -1790,6 +1792,27 @@ class Notification(db.Model):
         return serialized
 
 
+class NotificationId(db.Model):
+    """
+    Keeps id and (job_id, job_row_number) unique across every partition of notifications, which
+    Postgres can't do with constraints on the partitioned table itself. Rows are only ever written
+    by the notification_ids_sync trigger on notifications (see migration 0419).
+    """
+
+    __tablename__ = "notification_ids"
+
+    id = db.Column(UUID(as_uuid=True), primary_key=True)
+    job_id = db.Column(UUID(as_uuid=True), nullable=True)
+    job_row_number = db.Column(db.Integer, nullable=True)
+
+    __table_args__ = (
+        db.PrimaryKeyConstraint("id", name="notifications_pkey"),
+        UniqueConstraint(
+            "job_id", "job_row_number", name="uq_notifications_job_row_number"
+        ),
+    )
+
+
 class NotificationHistory(db.Model, HistoryModel):
     __tablename__ = "notification_history"
 
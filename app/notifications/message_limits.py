@@ -0,0 +1,117 @@
+from datetime import timedelta
+from threading import Lock
+from time import monotonic
+
+from flask import current_app
+
+from app import redis_store
+from app.errors import TotalRequestsError
+from app.utils import utc_now
+from notifications_utils.clients.redis import total_limit_cache_key
+
+# a day's counter is kept this long after the day ends, so leases can still be given back
+COUNTER_GRACE_PERIOD = timedelta(hours=1)
+
+
+def seconds_until_counter_expires(now=None):
+    now = now or utc_now()
+    end_of_day = (now + timedelta(days=1)).replace(
+        hour=0, minute=0, second=0, microsecond=0
+    )
+    return int((end_of_day + COUNTER_GRACE_PERIOD - now).total_seconds())
+
+
+class Lease:
+    def __init__(self, cache_key, remaining):
+        self.cache_key = cache_key
+        self.remaining = remaining
+        self.taken_at = monotonic()
+
+
+class MessageLimits:
+    """
+    Counts messages against each service's total_message_limit in redis, once per message.
+
+    Rather than going to redis for every message, each process leases a block of a service's
+    quota at a time, counting it all as used in redis straight away, and hands it out locally.
+    Blocks come out of redis atomically and never take the counter over the limit, so however
+    many processes are sending, a service can't go over its limit. Any of a block that hasn't
+    been used after MESSAGE_LIMIT_LEASE_SECONDS is given back, the next time the process
+    reserves anything. Until then, or if the process stops first, it still counts as used.
+    """
+
+    def __init__(self):
+        self.leases = {}
+        self._lock = Lock()
+
+    def reserve(self, service, count=1):
+        """
+        Count `count` messages the service is about to send, or raise TotalRequestsError if
+        that would take it over its limit.
+        """
+        cache_key = total_limit_cache_key(service.id)
+        limit = service.total_message_limit
+        with self._lock:
+            self._give_back_expired_leases()
+
+            lease = self.leases.get(service.id)
+            if lease and lease.cache_key != cache_key:
+                # the day has changed, so what's left belongs to yesterday's counter
+                self._give_back(self.leases.pop(service.id))
+                lease = None
+            leased = lease.remaining if lease else 0
+            if leased >= count:
+                lease.remaining -= count
+                return
+
+            # don't let one process hold more than a small share of a service's limit
+            block_size = min(
+                current_app.config["MESSAGE_LIMIT_LEASE_SIZE"], max(limit // 100, 1)
+            )
+            needed = count - leased
+            added = redis_store.incr_within_limit(
+                cache_key,
+                max(needed, block_size),
+                limit,
+                ex=seconds_until_counter_expires(),
+                minimum=needed,
+            )
+            if not added:
+                current_app.logger.warning(
+                    f"service {service.id} has been rate limited for total use, limit {limit}"
+                )
+                raise TotalRequestsError(limit)
+
+            self.leases[service.id] = Lease(cache_key, added - needed)
+
+    def release(self, service, count=1):
+        """
+        Give back `count` messages reserved for the service that won't be sent after all. They go
+        back into the process's lease, to be used by the next reservation or given back to redis
+        with the rest of it.
+        """
+        cache_key = total_limit_cache_key(service.id)
+        with self._lock:
+            lease = self.leases.get(service.id)
+            if lease and lease.cache_key == cache_key:
+                lease.remaining += count
+            else:
+                redis_store.decr_if_exists(cache_key, count)
+
+    def give_back_all(self):
+        with self._lock:
+            while self.leases:
+                self._give_back(self.leases.popitem()[1])
+
+    def _give_back_expired_leases(self):
+        expired_before = monotonic() - current_app.config["MESSAGE_LIMIT_LEASE_SECONDS"]
+        for service_id, lease in list(self.leases.items()):
+            if lease.taken_at < expired_before:
+                self._give_back(self.leases.pop(service_id))
+
+    def _give_back(self, lease):
+        if lease.remaining:
+            redis_store.decr_if_exists(lease.cache_key, lease.remaining)
+
+
+message_limits = MessageLimits()
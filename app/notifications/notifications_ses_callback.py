@@ -1,6 +1,7 @@
-from flask import Blueprint, jsonify, request
+from flask import Blueprint, current_app, json, jsonify, request
 
-from app.celery.process_ses_receipts_tasks import process_ses_results
+from app import redis_store
+from app.celery.process_ses_receipts_tasks import SES_RESULTS_QUEUE, process_ses_results
 from app.config import QueueNames
 from app.errors import InvalidRequest
 from app.notifications.sns_handlers import sns_notification_handler
@@ -20,6 +21,12 @@ def email_ses_callback_handler():
 
     message = data.get("Message")
     if "mail" in message:
-        process_ses_results.apply_async([{"Message": message}], queue=QueueNames.NOTIFY)
+        if current_app.config["SES_RESULTS_BATCHED"] and redis_store.active:
+            # process_queued_ses_results picks these up in batches
+            redis_store.rpush(SES_RESULTS_QUEUE, json.dumps({"Message": message}))
+        else:
+            process_ses_results.apply_async(
+                [{"Message": message}], queue=QueueNames.NOTIFY
+            )
 
     return jsonify(result="success", message="SES-SNS callback succeeded"), 200
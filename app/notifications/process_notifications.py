@@ -1,14 +1,14 @@
-import json
 import os
 import uuid
 
 from flask import current_app
 
-from app import redis_store
+from app import notify_celery, redis_store
 from app.celery import provider_tasks
 from app.config import QueueNames
 from app.dao.notifications_dao import (
     dao_create_notification,
+    dao_create_notifications,
     dao_delete_notifications_by_id,
     dao_notification_exists,
     get_notification_by_id,
@@ -17,6 +17,7 @@ from app.enums import NotificationStatus, NotificationType
 from app.errors import BadRequestError
 from app.models import Notification
 from app.utils import hilite, utc_now
+from notifications_utils import fast_json
 from notifications_utils.recipients import (
     format_email_address,
     get_international_phone_info,
@@ -61,7 +62,50 @@ def get_notification(notification_id):
     return get_notification_by_id(notification_id)
 
 
-def persist_notification(
+def persist_notification(*, simulated=False, **kwargs):
+    notification = _build_notification(**kwargs)
+
+    # if simulated create a Notification model to return but do not persist the Notification to the dB
+    if not simulated:
+        if notification.notification_type == NotificationType.SMS:
+            # it's just too hard with redis and timing to test this here
+            if os.getenv("NOTIFY_ENVIRONMENT") == "test":
+                dao_create_notification(notification)
+            elif "verify_code" in str(notification.personalisation):
+                dao_create_notification(notification)
+
+            else:
+                redis_store.rpush(
+                    "message_queue",
+                    fast_json.dumps(notification.serialize_for_redis(notification)),
+                )
+        else:
+            dao_create_notification(notification)
+
+    return notification
+
+
+def persist_notifications(notifications_kwargs):
+    """
+    Does what persist_notification does for each of a list of notifications, given as the keyword
+    arguments for it, but saves them all with one insert.
+    """
+    notifications = []
+    to_save = []
+    for kwargs in notifications_kwargs:
+        kwargs = dict(kwargs)
+        simulated = kwargs.pop("simulated", False)
+        notification = _build_notification(**kwargs)
+        notifications.append(notification)
+        if not simulated:
+            to_save.append(notification)
+
+    if to_save:
+        dao_create_notifications(to_save)
+    return notifications
+
+
+def _build_notification(
     *,
     template_id,
     template_version,
@@ -77,7 +121,6 @@ def persist_notification(
     reference=None,
     client_reference=None,
     notification_id=None,
-    simulated=False,
     created_by_id=None,
     status=NotificationStatus.CREATED,
     reply_to_text=None,
@@ -139,23 +182,6 @@ def persist_notification(
             ex=1800,
         )
 
-    # if simulated create a Notification model to return but do not persist the Notification to the dB
-    if not simulated:
-        if notification.notification_type == NotificationType.SMS:
-            # it's just too hard with redis and timing to test this here
-            if os.getenv("NOTIFY_ENVIRONMENT") == "test":
-                dao_create_notification(notification)
-            elif "verify_code" in str(notification.personalisation):
-                dao_create_notification(notification)
-
-            else:
-                redis_store.rpush(
-                    "message_queue",
-                    json.dumps(notification.serialize_for_redis(notification)),
-                )
-        else:
-            dao_create_notification(notification)
-
     return notification
 
 
@@ -187,6 +213,46 @@ def send_notification_to_queue_detached(
     )
 
 
+def send_notifications_to_queue_detached(
+    key_type, notification_type, notification_ids, queue=None
+):
+    """
+    Does what send_notification_to_queue_detached does for each of a list of notifications, sending
+    each chunk of BULK_NOTIFICATIONS_QUEUE_CHUNK_SIZE tasks over one connection to the broker.
+
+    If a task can't be sent, the notifications that haven't been queued are deleted.
+    """
+    if notification_type == NotificationType.SMS:
+        queue = queue or QueueNames.SEND_SMS
+        deliver_task = provider_tasks.deliver_sms
+    if notification_type == NotificationType.EMAIL:
+        queue = queue or QueueNames.SEND_EMAIL
+        deliver_task = provider_tasks.deliver_email
+
+    notification_ids = list(notification_ids)
+    chunk_size = current_app.config["BULK_NOTIFICATIONS_QUEUE_CHUNK_SIZE"]
+    queued = 0
+    try:
+        for start in range(0, len(notification_ids), chunk_size):
+            with notify_celery.producer_or_acquire() as producer:
+                for notification_id in notification_ids[start : start + chunk_size]:
+                    deliver_task.apply_async(
+                        [str(notification_id)],
+                        queue=queue,
+                        countdown=60,
+                        producer=producer,
+                    )
+                    queued += 1
+    except Exception:
+        for notification_id in notification_ids[queued:]:
+            dao_delete_notifications_by_id(notification_id)
+        raise
+
+    current_app.logger.debug(
+        f"{len(notification_ids)} {notification_type} notifications sent to the {queue} queue for delivery"
+    )
+
+
 def send_notification_to_queue(notification, queue=None):
     send_notification_to_queue_detached(
         notification.key_type,
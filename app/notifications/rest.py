@@ -12,7 +12,11 @@ from app.notifications.process_notifications import (
     simulated_recipient,
 )
 from app.notifications.validators import (
+    add_rate_limit_headers,
     check_if_service_can_send_to_number,
+    check_service_over_api_rate_limit,
+    check_service_over_total_message_limit,
+    release_total_message_limit,
     service_has_permission,
     validate_template,
 )
@@ -34,6 +38,7 @@ from notifications_utils import SMS_CHAR_COUNT_LIMIT
 
 notifications = Blueprint("notifications", __name__)
 register_errors(notifications)
+notifications.after_request(add_rate_limit_headers)
 
 
 @notifications.route("/notifications/<uuid:notification_id>", methods=["GET"])
@@ -159,6 +164,8 @@ def send_notification(notification_type):
             f"{notification_type} notification type is not supported", 400
         )
 
+    check_service_over_api_rate_limit(authenticated_service, api_user.key_type)
+
     notification_form = (
         sms_template_notification_schema
         if notification_type == NotificationType.SMS
@@ -190,23 +197,31 @@ def send_notification(notification_type):
         )
 
     simulated = simulated_recipient(notification_form["to"], notification_type)
+    if not simulated:
+        check_service_over_total_message_limit(api_user.key_type, authenticated_service)
+
+    try:
+        notification_model = persist_notification(
+            template_id=template.id,
+            template_version=template.version,
+            recipient=notification_form["to"],
+            service=authenticated_service,
+            personalisation=notification_form.get("personalisation"),
+            notification_type=notification_type,
+            api_key_id=api_user.id,
+            key_type=api_user.key_type,
+            simulated=simulated,
+            reply_to_text=template.reply_to_text,
+        )
 
-    notification_model = persist_notification(
-        template_id=template.id,
-        template_version=template.version,
-        recipient=notification_form["to"],
-        service=authenticated_service,
-        personalisation=notification_form.get("personalisation"),
-        notification_type=notification_type,
-        api_key_id=api_user.id,
-        key_type=api_user.key_type,
-        simulated=simulated,
-        reply_to_text=template.reply_to_text,
-    )
+        if not simulated:
+            send_notification_to_queue(notification=notification_model, queue=None)
+    except Exception:
+        if not simulated:
+            release_total_message_limit(api_user.key_type, authenticated_service)
+        raise
 
-    if not simulated:
-        send_notification_to_queue(notification=notification_model, queue=None)
-    else:
+    if simulated:
         current_app.logger.debug(
             f"POST simulated notification for id: {notification_model.id}"
         )
@@ -1,7 +1,6 @@
-from datetime import datetime
-from zoneinfo import ZoneInfo
+from math import ceil
 
-from flask import current_app
+from flask import current_app, g
 from sqlalchemy.orm.exc import NoResultFound
 
 from app import redis_store
@@ -9,14 +8,15 @@ from app.dao.notifications_dao import dao_get_notification_count_for_service
 from app.dao.service_email_reply_to_dao import dao_get_reply_to_by_id
 from app.dao.service_sms_sender_dao import dao_get_service_sms_senders_by_id
 from app.enums import KeyType, NotificationType, ServicePermissionType, TemplateType
-from app.errors import BadRequestError, TotalRequestsError
+from app.errors import BadRequestError, RateLimitError, TotalRequestsError
 from app.models import ServicePermission
+from app.notifications.message_limits import message_limits
 from app.notifications.process_notifications import create_content_for_notification
 from app.serialised_models import SerialisedTemplate
 from app.service.utils import service_allowed_to_send_to
 from app.utils import get_public_notify_type_text
 from notifications_utils import SMS_CHAR_COUNT_LIMIT
-from notifications_utils.clients.redis import total_limit_cache_key
+from notifications_utils.clients.redis import rate_limit_cache_key
 from notifications_utils.recipients import (
     get_international_phone_info,
     validate_and_format_email_address,
@@ -24,38 +24,57 @@ from notifications_utils.recipients import (
 )
 
 
-def check_service_over_total_message_limit(key_type, service):
+def check_service_over_total_message_limit(key_type, service, count=1):
+    """
+    Count messages about to be sent against the service's total message limit, raising
+    TotalRequestsError if they would take it over.
+    """
     if key_type == KeyType.TEST or not current_app.config["REDIS_ENABLED"]:
-        return 0
+        return
 
-    cache_key = total_limit_cache_key(service.id)
-    service_stats = redis_store.get(cache_key)
+    message_limits.reserve(service, count)
 
-    # TODO
-    # For now we are using calendar year
-    # Switch to using service agreement dates when the Agreement model is ready
-    # If the service stat has never been set before, compute the remaining seconds for 2025
-    # and set it (all services) to expire on 12/31/2026.
-    if service_stats is None:
-        now_et = datetime.now(ZoneInfo("America/New_York"))
 
-        target_time = datetime(
-            2026, 12, 31, 23, 59, 59, tzinfo=ZoneInfo("America/New_York")
-        )
-        time_difference = target_time - now_et
-        seconds_difference = int(time_difference.total_seconds())
-        service_stats = 0
-        redis_store.set(cache_key, service_stats, ex=seconds_difference)
-        return service_stats
-    if int(service_stats) >= service.total_message_limit:
-        current_app.logger.warning(
-            "service {} has been rate limited for total use sent {} limit {}".format(
-                service.id, int(service_stats), service.total_message_limit
-            )
+def release_total_message_limit(key_type, service, count=1):
+    """
+    Give back messages counted by check_service_over_total_message_limit that weren't sent.
+    """
+    if key_type == KeyType.TEST or not current_app.config["REDIS_ENABLED"]:
+        return
+
+    message_limits.release(service, count)
+
+
+def check_service_over_api_rate_limit(service, key_type):
+    if (
+        not current_app.config["API_RATE_LIMIT_ENABLED"]
+        or not current_app.config["REDIS_ENABLED"]
+    ):
+        return
+
+    cache_key = rate_limit_cache_key(service.id, key_type)
+    rate_limit, interval = service.rate_limit, 60
+    g.rate_limit = redis_store.check_rate_limit(cache_key, rate_limit, interval)
+    if g.rate_limit.exceeded:
+        current_app.logger.info(
+            "service {} has been rate limited for throughput".format(service.id)
         )
-        raise TotalRequestsError(service.total_message_limit)
+        raise RateLimitError(rate_limit, interval, key_type)
+
 
-    return int(service_stats)
+def add_rate_limit_headers(response):
+    """
+    Tell API clients how much of their rate limit is left, after a request that was checked
+    against it, and when to retry if they've gone over.
+    """
+    rate_limit = g.get("rate_limit")
+    if rate_limit is not None:
+        response.headers["X-RateLimit-Limit"] = str(rate_limit.limit)
+        response.headers["X-RateLimit-Remaining"] = str(rate_limit.remaining)
+        response.headers["X-RateLimit-Reset"] = str(ceil(rate_limit.reset_after))
+        if rate_limit.exceeded:
+            response.headers["Retry-After"] = str(ceil(rate_limit.retry_after))
+    return response
 
 
 def check_application_over_retention_limit(key_type, service):
@@ -190,6 +209,14 @@ def check_notification_content_is_not_empty(template_with_content):
 def validate_template(
     template_id, personalisation, service, notification_type, check_char_count=True
 ):
+    template = get_valid_template(template_id, service, notification_type)
+    template_with_content = validate_template_content(
+        template, personalisation, check_char_count=check_char_count
+    )
+    return template, template_with_content
+
+
+def get_valid_template(template_id, service, notification_type):
     try:
         template = SerialisedTemplate.from_id_and_service_id(template_id, service.id)
     except NoResultFound:
@@ -198,7 +225,10 @@ def validate_template(
 
     check_template_is_for_notification_type(notification_type, template.template_type)
     check_template_is_active(template)
+    return template
 
+
+def validate_template_content(template, personalisation, check_char_count=True):
     template_with_content = create_content_for_notification(template, personalisation)
 
     check_notification_content_is_not_empty(template_with_content)
@@ -209,7 +239,7 @@ def validate_template(
     if check_char_count:
         check_is_message_too_long(template_with_content)
 
-    return template, template_with_content
+    return template_with_content
 
 
 def check_reply_to(service_id, reply_to_id, type_):
@@ -1,7 +1,9 @@
 import json
 from datetime import timedelta
+from threading import Lock
 from uuid import UUID
 
+import cachetools
 from iso8601 import ParseError, iso8601
 from jsonschema import Draft7Validator, FormatChecker, ValidationError
 
@@ -15,6 +17,11 @@ from notifications_utils.recipients import (
 
 format_checker = FormatChecker()
 
+# Validators for the schemas used so far, keyed by the id of the schema. The schema is kept with
+# its validator, so it can't be garbage collected and its id reused by another.
+_validators = cachetools.LRUCache(maxsize=256)
+_validators_lock = Lock()
+
 
 @format_checker.checks("validate_uuid", raises=Exception)
 def validate_uuid(instance):
@@ -67,8 +74,17 @@ def validate_schema_datetime(instance):
     return True
 
 
+def get_validator(schema):
+    with _validators_lock:
+        cached_schema, validator = _validators.get(id(schema), (None, None))
+        if cached_schema is not schema:
+            validator = Draft7Validator(schema, format_checker=format_checker)
+            _validators[id(schema)] = (schema, validator)
+        return validator
+
+
 def validate(json_to_validate, schema):
-    validator = Draft7Validator(schema, format_checker=format_checker)
+    validator = get_validator(schema)
     errors = list(validator.iter_errors(json_to_validate))
     if errors.__len__() > 0:
         raise ValidationError(build_error_message(errors))
@@ -1,33 +1,197 @@
+import json
+import os
+import time
 from collections import defaultdict
-from functools import partial
-from threading import RLock
+from functools import lru_cache, wraps
+from threading import Lock, RLock, Thread
 
 import cachetools
 from flask import current_app
+from sqlalchemy import event, inspect
 from werkzeug.utils import cached_property
 
-from app import db, redis_store
+from app import db, encryption, redis_store
 from app.dao.api_key_dao import get_model_api_keys
+from app.dao.dao_utils import invalidate_service_cache_on_commit
+from app.dao.service_callback_api_dao import (
+    get_service_complaint_callback_api_for_service,
+    get_service_delivery_status_callback_api_for_service,
+)
 from app.dao.services_dao import dao_fetch_service_by_id
+from app.enums import CallbackType
+from app.models import (
+    ApiKey,
+    Service,
+    ServiceCallbackApi,
+    ServiceEmailReplyTo,
+    ServiceGuestList,
+    ServicePermission,
+    ServiceSmsSender,
+    ServiceUser,
+    Template,
+    User,
+)
 from notifications_utils.clients.redis import RequestCache
+from notifications_utils.recipients import format_recipient
 from notifications_utils.serialised_model import (
     SerialisedModel,
     SerialisedModelCollection,
 )
 
-caches = defaultdict(partial(cachetools.TTLCache, maxsize=1024, ttl=2))
+# Writes to any of these evict the service's cached models. Template is handled separately, as
+# its own redis key needs deleting too.
+SERVICE_CACHE_MODELS = (
+    ApiKey,
+    ServiceCallbackApi,
+    ServiceEmailReplyTo,
+    ServiceGuestList,
+    ServicePermission,
+    ServiceSmsSender,
+    ServiceUser,
+)
+INVALIDATION_CHANNEL = "serialised-model-invalidations"
+# every redis key cached for a service is added to this set, so they can all be deleted at once
+SERVICE_CACHE_TAG = "service-{service_id}-cache-keys"
+# how long entries are kept when the invalidation listener isn't running, eg if redis is off
+UNINVALIDATED_TTL = 2
+
+
+class CacheInvalidationListener:
+    """
+    Evicts a service's cached serialised models from this process as soon as any process
+    publishes a write to them on INVALIDATION_CHANNEL.
+
+    Entries are only kept for SERIALISED_MODEL_CACHE_TTL while the listener is subscribed. If it
+    isn't (redis is disabled, or the connection dropped and messages may have been missed) they
+    fall back to UNINVALIDATED_TTL. Everything is cleared when the connection drops, since
+    invalidations for what was cached before then can no longer arrive, and again when it
+    resubscribes.
+    """
+
+    def __init__(self):
+        self.subscribed = False
+        self._pid = None
+        self._lock = Lock()
+        self._metrics_lock = Lock()
+        self.reset_metrics()
+
+    def reset_metrics(self):
+        with self._metrics_lock:
+            self.metrics = {
+                "hits": 0,
+                "misses": 0,
+                "invalidations": 0,
+                "invalidation_lag_seconds": 0.0,
+                "invalidation_max_lag_seconds": 0.0,
+            }
+
+    def record(self, name):
+        with self._metrics_lock:
+            self.metrics[name] += 1
+
+    def get_metrics(self):
+        with self._metrics_lock:
+            metrics = dict(self.metrics)
+        lookups = metrics["hits"] + metrics["misses"]
+        metrics["hit_ratio"] = metrics["hits"] / lookups if lookups else None
+        metrics["subscribed"] = self.subscribed
+        return metrics
+
+    def ttl(self):
+        if self.subscribed:
+            return current_app.config["SERIALISED_MODEL_CACHE_TTL"]
+        return UNINVALIDATED_TTL
+
+    def ensure_started(self):
+        # threads don't survive a fork, so each worker process starts its own
+        if not redis_store.active or self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._pid == os.getpid():
+                return
+            self._pid = os.getpid()
+            self.subscribed = False
+            Thread(
+                target=self._listen,
+                args=(current_app._get_current_object(),),
+                name="serialised-model-invalidations",
+                daemon=True,
+            ).start()
+
+    def _listen(self, app):
+        while True:
+            try:
+                pubsub = redis_store.redis_store.pubsub(ignore_subscribe_messages=True)
+                pubsub.subscribe(INVALIDATION_CHANNEL)
+                # anything published while we weren't listening was missed
+                clear_memory_caches()
+                self.subscribed = True
+                for message in pubsub.listen():
+                    self.handle_message(message["data"])
+            except Exception:
+                app.logger.exception(
+                    "Serialised model cache invalidation listener failed, retrying"
+                )
+            self.subscribed = False
+            clear_memory_caches()
+            time.sleep(1)
+
+    def handle_message(self, data):
+        message = json.loads(data)
+        evict_service_from_memory_caches(message["service_id"])
+        lag = max(time.time() - message["published_at"], 0)
+        with self._metrics_lock:
+            self.metrics["invalidations"] += 1
+            self.metrics["invalidation_lag_seconds"] += lag
+            self.metrics["invalidation_max_lag_seconds"] = max(
+                self.metrics["invalidation_max_lag_seconds"], lag
+            )
+
+
+invalidation_listener = CacheInvalidationListener()
+
+
+def _entry_expires_at(key, value, now):
+    return now + invalidation_listener.ttl()
+
+
+_MISSING = object()
+caches = defaultdict(lambda: cachetools.TLRUCache(maxsize=1024, ttu=_entry_expires_at))
 locks = defaultdict(RLock)
 redis_cache = RequestCache(redis_store)
+# bumped for a service whenever its models are evicted, and for None whenever everything is
+# cleared, so that a lookup which was reading while that happened doesn't cache what it read
+generations = defaultdict(int)
+generations_lock = Lock()
+
+
+def _generation(key):
+    # every cached model is looked up by service id, alone or with a template id and version
+    with generations_lock:
+        return [generations[None], *(generations.get(str(part), 0) for part in key)]
 
 
 def memory_cache(func):
-    @cachetools.cached(
-        cache=caches[func.__qualname__],
-        lock=locks[func.__qualname__],
-        key=ignore_first_argument_cache_key,
-    )
+    cache = caches[func.__qualname__]
+    lock = locks[func.__qualname__]
+
+    @wraps(func)
     def wrapper(*args, **kwargs):
-        return func(*args, **kwargs)
+        invalidation_listener.ensure_started()
+        key = ignore_first_argument_cache_key(*args, **kwargs)
+        with lock:
+            value = cache.get(key, _MISSING)
+        if value is not _MISSING:
+            invalidation_listener.record("hits")
+            return value
+
+        invalidation_listener.record("misses")
+        generation = _generation(key)
+        value = func(*args, **kwargs)
+        with lock:
+            if _generation(key) == generation:
+                cache[key] = value
+        return value
 
     return wrapper
 
@@ -36,6 +200,90 @@ def ignore_first_argument_cache_key(cls, *args, **kwargs):
     return cachetools.keys.hashkey(*args, **kwargs)
 
 
+def clear_memory_caches():
+    with generations_lock:
+        generations[None] += 1
+    for name, cache in caches.items():
+        with locks[name]:
+            cache.clear()
+
+
+def evict_service_from_memory_caches(service_id):
+    service_id = str(service_id)
+    with generations_lock:
+        generations[service_id] += 1
+    for name, cache in caches.items():
+        with locks[name]:
+            for key in [key for key in cache.keys() if service_id in map(str, key)]:
+                cache.pop(key, None)
+
+
+def publish_service_invalidation(service_id, template_ids=()):
+    """
+    Delete a service's cached models from redis, then tell every process to drop its own copies.
+    The redis keys go first so that nothing can repopulate a process's cache from them.
+    """
+    redis_store.delete_tagged(
+        SERVICE_CACHE_TAG.format(service_id=service_id),
+        # keys cached before they were tagged
+        keys=[
+            f"service-{service_id}",
+            f"service-{service_id}-allowlist",
+            *(
+                f"service-{service_id}-template-{template_id}-version-None"
+                for template_id in template_ids
+            ),
+        ],
+    )
+    if redis_store.active:
+        try:
+            redis_store.redis_store.publish(
+                INVALIDATION_CHANNEL,
+                json.dumps(
+                    {"service_id": str(service_id), "published_at": time.time()}
+                ),
+            )
+        except Exception:
+            current_app.logger.exception(
+                f"Could not publish cache invalidation for service {service_id}"
+            )
+    evict_service_from_memory_caches(service_id)
+
+
+@event.listens_for(db.session, "after_flush")
+def _collect_service_cache_invalidations(session, flush_context):
+    for obj in [*session.new, *session.dirty, *session.deleted]:
+        if isinstance(obj, Service):
+            invalidate_service_cache_on_commit(obj.id)
+        elif isinstance(obj, SERVICE_CACHE_MODELS):
+            invalidate_service_cache_on_commit(obj.service_id)
+        elif isinstance(obj, Template):
+            invalidate_service_cache_on_commit(obj.service_id, obj.id)
+        elif isinstance(obj, User) and _contact_details_changed(obj):
+            for service in obj.services:
+                invalidate_service_cache_on_commit(service.id)
+
+
+def _contact_details_changed(user):
+    state = inspect(user)
+    return state.deleted or any(
+        state.attrs[name].history.has_changes()
+        for name in ("email_address", "mobile_number")
+    )
+
+
+@event.listens_for(db.session, "after_commit")
+def _publish_service_cache_invalidations(session):
+    invalidations = session.info.pop("service_cache_invalidations", {})
+    for service_id, template_ids in invalidations.items():
+        publish_service_invalidation(service_id, template_ids)
+
+
+@event.listens_for(db.session, "after_rollback")
+def _discard_service_cache_invalidations(session):
+    session.info.pop("service_cache_invalidations", None)
+
+
 class SerialisedTemplate(SerialisedModel):
     ALLOWED_PROPERTIES = {
         "archived",
@@ -54,7 +302,11 @@ class SerialisedTemplate(SerialisedModel):
         return cls(cls.get_dict(template_id, service_id, version)["data"])
 
     @staticmethod
-    @redis_cache.set("service-{service_id}-template-{template_id}-version-{version}")
+    @redis_cache.set(
+        "service-{service_id}-template-{template_id}-version-{version}",
+        tags=[SERVICE_CACHE_TAG],
+        compress=True,
+    )
     def get_dict(template_id, service_id, version):
         from app.dao import templates_dao
         from app.schemas import template_schema
@@ -93,7 +345,7 @@ class SerialisedService(SerialisedModel):
         return cls(cls.get_dict(service_id)["data"])
 
     @staticmethod
-    @redis_cache.set("service-{service_id}")
+    @redis_cache.set("service-{service_id}", tags=[SERVICE_CACHE_TAG])
     def get_dict(service_id):
         from app.schemas import service_schema
 
@@ -111,6 +363,112 @@ class SerialisedService(SerialisedModel):
         return self.id in current_app.config["HIGH_VOLUME_SERVICE"]
 
 
+class SerialisedServiceAllowlist(SerialisedModel):
+    """
+    Who a restricted service, or a team key, is allowed to send to. Recipients are stored already
+    formatted by format_recipient, so checking one is a single set lookup.
+    """
+
+    ALLOWED_PROPERTIES = {
+        "team_members",
+        "guest_list",
+    }
+
+    def __init__(self, _dict):
+        super().__init__(_dict)
+        self.team_members = frozenset(self.team_members)
+        self.guest_list = frozenset(self.guest_list)
+
+    @classmethod
+    @memory_cache
+    def from_service_id(cls, service_id):
+        return cls(cls.get_dict(service_id)["data"])
+
+    @staticmethod
+    @redis_cache.set("service-{service_id}-allowlist", tags=[SERVICE_CACHE_TAG])
+    def get_dict(service_id):
+        service = dao_fetch_service_by_id(service_id)
+        allowlist = {
+            "team_members": _format_recipients(
+                recipient
+                for user in service.users
+                for recipient in (user.mobile_number, user.email_address)
+            ),
+            "guest_list": _format_recipients(
+                member.recipient for member in service.guest_list
+            ),
+        }
+        db.session.commit()
+
+        return {"data": allowlist}
+
+    def allows(self, recipient, allow_guest_list_recipients=True):
+        recipient = format_recipient(recipient)
+        return (
+            recipient in self.team_members
+            or (allow_guest_list_recipients and recipient in self.guest_list)
+            # official simulated numbers can be sent to in trial mode, for development
+            or recipient
+            in _formatted_simulated_numbers(
+                tuple(current_app.config["SIMULATED_SMS_NUMBERS"])
+            )
+        )
+
+
+def _format_recipients(recipients):
+    return sorted({format_recipient(recipient) for recipient in recipients} - {""})
+
+
+@lru_cache
+def _formatted_simulated_numbers(numbers):
+    return frozenset(format_recipient(number) for number in numbers)
+
+
+class SerialisedServiceCallbackApi(SerialisedModel):
+    """
+    A service's callback api of one CallbackType. The bearer token is cached encrypted, as it is
+    in the db, and only decrypted when it's used.
+    """
+
+    ALLOWED_PROPERTIES = {
+        "id",
+        "url",
+        "encrypted_bearer_token",
+    }
+
+    @classmethod
+    @memory_cache
+    def from_service_id(cls, service_id, callback_type):
+        """
+        Returns None if the service doesn't have one, which is cached too, as most don't.
+        """
+        callback_api = cls.get_dict(service_id, callback_type)["data"]
+        return cls(callback_api) if callback_api else None
+
+    @staticmethod
+    @redis_cache.set(
+        "service-{service_id}-callback-api-{callback_type}", tags=[SERVICE_CACHE_TAG]
+    )
+    def get_dict(service_id, callback_type):
+        get_callback_api = {
+            CallbackType.DELIVERY_STATUS: get_service_delivery_status_callback_api_for_service,
+            CallbackType.COMPLAINT: get_service_complaint_callback_api_for_service,
+        }[callback_type]
+        callback_api = get_callback_api(service_id=service_id)
+        callback_api_dict = callback_api and {
+            "id": str(callback_api.id),
+            "url": callback_api.url,
+            "encrypted_bearer_token": callback_api._bearer_token,
+        }
+        db.session.commit()
+
+        return {"data": callback_api_dict}
+
+    @property
+    def bearer_token(self):
+        return encryption.decrypt(self.encrypted_bearer_token)
+
+
 class SerialisedAPIKey(SerialisedModel):
     ALLOWED_PROPERTIES = {
         "id",
@@ -13,6 +13,7 @@ from app.notifications.process_notifications import (
 )
 from app.notifications.validators import (
     check_service_over_total_message_limit,
+    release_total_message_limit,
     validate_and_format_recipient,
     validate_template,
 )
@@ -44,8 +45,6 @@ def send_one_off_notification(service_id, post_data):
 
     validate_template(template.id, personalisation, service, template.template_type)
 
-    check_service_over_total_message_limit(KeyType.NORMAL, service)
-
     validate_and_format_recipient(
         send_to=post_data["to"],
         key_type=KeyType.NORMAL,
@@ -64,27 +63,35 @@ def send_one_off_notification(service_id, post_data):
         service=service,
         template=template,
     )
-    notification = persist_notification(
-        template_id=template.id,
-        template_version=template.version,
-        recipient=post_data["to"],
-        service=service,
-        personalisation=personalisation,
-        notification_type=template.template_type,
-        api_key_id=None,
-        key_type=KeyType.NORMAL,
-        created_by_id=post_data["created_by"],
-        reply_to_text=reply_to,
-        reference=create_one_off_reference(template.template_type),
-        client_reference=client_reference,
-    )
 
-    queue_name = None
+    # only counted once everything's been checked
+    check_service_over_total_message_limit(KeyType.NORMAL, service)
 
-    send_notification_to_queue(
-        notification=notification,
-        queue=queue_name,
-    )
+    try:
+        notification = persist_notification(
+            template_id=template.id,
+            template_version=template.version,
+            recipient=post_data["to"],
+            service=service,
+            personalisation=personalisation,
+            notification_type=template.template_type,
+            api_key_id=None,
+            key_type=KeyType.NORMAL,
+            created_by_id=post_data["created_by"],
+            reply_to_text=reply_to,
+            reference=create_one_off_reference(template.template_type),
+            client_reference=client_reference,
+        )
+
+        queue_name = None
+
+        send_notification_to_queue(
+            notification=notification,
+            queue=queue_name,
+        )
+    except Exception:
+        release_total_message_limit(KeyType.NORMAL, service)
+        raise
 
     return {"id": str(notification.id)}
 
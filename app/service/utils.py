@@ -1,11 +1,6 @@
-import itertools
-
-from flask import current_app
-
-from app.dao.services_dao import dao_fetch_service_by_id
 from app.enums import KeyType, RecipientType
 from app.models import ServiceGuestList
-from notifications_utils.recipients import allowed_to_send_to
+from app.serialised_models import SerialisedServiceAllowlist
 
 
 def get_recipients_from_request(request_json, key, type):
@@ -35,23 +30,9 @@ def service_allowed_to_send_to(
     if key_type == KeyType.NORMAL and not service.restricted:
         return True
 
-    # Revert back to the ORM model here so we can get some things which
-    # aren’t in the serialised model
-    service = dao_fetch_service_by_id(service.id)
-
-    team_members = itertools.chain.from_iterable(
-        [user.mobile_number, user.email_address] for user in service.users
-    )
-    guest_list_members = [
-        member.recipient for member in service.guest_list if allow_guest_list_recipients
-    ]
-
-    # As per discussion we have decided to allow official simulated
-    # numbers to go out in trial mode for development purposes.
-    guest_list_members.extend(current_app.config["SIMULATED_SMS_NUMBERS"])
     if (key_type == KeyType.NORMAL and service.restricted) or (
         key_type == KeyType.TEAM
     ):
-        return allowed_to_send_to(
-            recipient, itertools.chain(team_members, guest_list_members)
+        return SerialisedServiceAllowlist.from_service_id(service.id).allows(
+            recipient, allow_guest_list_recipients
         )
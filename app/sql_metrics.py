@@ -0,0 +1,99 @@
+"""
+Counters for SQL statements, connection hold times and pool waits, kept per process and broken
+down by the Flask endpoint or Celery task that caused them. Populated by the events set up in
+app.setup_sqlalchemy_events and exposed at /_status/sql-metrics.
+"""
+
+import hashlib
+import re
+from collections import defaultdict
+from threading import Lock
+from time import monotonic
+
+from celery import current_task
+from flask import current_app, has_request_context, request
+from sqlalchemy.pool import QueuePool
+
+_STRING_LITERAL = re.compile(r"'(?:[^']|'')*'")
+_NUMBER = re.compile(r"\b\d+(?:\.\d+)?\b")
+# :name but not a ::type cast
+_BIND_PARAMETER = re.compile(r"%\(\w+\)s|%s|(?<!:):\w+")
+_VALUE_LIST = re.compile(r"\(\s*\?(?:\s*,\s*\?)*\s*\)")
+_WHITESPACE = re.compile(r"\s+")
+
+
+def fingerprint_statement(statement):
+    """
+    Return (normalised statement, fingerprint). Literals and bind parameters are replaced with ?,
+    and lists of them collapsed, so the same query with different values gets the same fingerprint.
+    """
+    normalised = _STRING_LITERAL.sub("?", statement)
+    normalised = _BIND_PARAMETER.sub("?", normalised)
+    normalised = _NUMBER.sub("?", normalised)
+    normalised = _VALUE_LIST.sub("(...)", normalised)
+    normalised = _WHITESPACE.sub(" ", normalised).strip()
+    return normalised, hashlib.sha1(normalised.encode()).hexdigest()[:12]
+
+
+def get_request_data():
+    """Describe the web request or celery task using the database."""
+    if has_request_context():
+        return {
+            "method": request.method,
+            "host": request.host,
+            "url_rule": request.url_rule.rule if request.url_rule else "No endpoint",
+        }
+    if current_task:
+        return {
+            "method": "celery",
+            "host": current_app.config["NOTIFY_APP_NAME"],  # worker name
+            "url_rule": current_task.name,
+        }
+    return None
+
+
+def metrics_source(request_data):
+    if request_data is None or request_data["method"] == "unknown":
+        return "unknown"
+    return f"{request_data['method']} {request_data['url_rule']}"
+
+
+class SqlMetrics:
+    def __init__(self):
+        self._lock = Lock()
+        self._counters = defaultdict(lambda: defaultdict(float))
+
+    def record(self, source, name, seconds):
+        with self._lock:
+            counters = self._counters[source]
+            counters[f"{name}_count"] += 1
+            counters[f"{name}_seconds"] += seconds
+            counters[f"{name}_max_seconds"] = max(
+                counters[f"{name}_max_seconds"], seconds
+            )
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                source: dict(counters) for source, counters in self._counters.items()
+            }
+
+    def reset(self):
+        with self._lock:
+            self._counters.clear()
+
+
+sql_metrics = SqlMetrics()
+
+
+class TimedQueuePool(QueuePool):
+    """A QueuePool that records how long each checkout waits for a connection."""
+
+    def _do_get(self):
+        start = monotonic()
+        try:
+            return super()._do_get()
+        finally:
+            sql_metrics.record(
+                metrics_source(get_request_data()), "pool_wait", monotonic() - start
+            )
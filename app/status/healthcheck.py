@@ -2,11 +2,18 @@ from flask import Blueprint, current_app, jsonify, request
 from sqlalchemy import text
 from werkzeug.exceptions import ServiceUnavailable
 
-from app import db, version
+from app import db, redis_store, version
+from app.dao.dao_utils import get_pool_metrics
 from app.dao.organization_dao import dao_count_organizations_with_live_services
 from app.dao.services_dao import dao_count_live_services
+from app.errors import register_errors
+from app.serialised_models import invalidation_listener
+from app.sql_metrics import sql_metrics
 
 status = Blueprint("status", __name__)
+# process internals, so unlike the status checks these need admin auth
+status_metrics = Blueprint("status_metrics", __name__)
+register_errors(status_metrics)
 
 
 @status.route("/", methods=["GET"])
@@ -58,6 +65,34 @@ def live_service_and_organization_counts():
         raise ServiceUnavailable("Service temporarily unavailable")
 
 
+@status_metrics.route("/_status/db-pools")
+def db_pools():
+    response = jsonify(get_pool_metrics())
+    response.headers["Cache-Control"] = "no-cache, no-store, must-revalidate"
+    return response, 200
+
+
+@status_metrics.route("/_status/sql-metrics")
+def sql_metrics_by_source():
+    response = jsonify(sql_metrics.snapshot())
+    response.headers["Cache-Control"] = "no-cache, no-store, must-revalidate"
+    return response, 200
+
+
+@status_metrics.route("/_status/serialised-model-cache")
+def serialised_model_cache_metrics():
+    response = jsonify(invalidation_listener.get_metrics())
+    response.headers["Cache-Control"] = "no-cache, no-store, must-revalidate"
+    return response, 200
+
+
+@status_metrics.route("/_status/redis-invalidation")
+def redis_invalidation_metrics():
+    response = jsonify(redis_store.get_invalidation_metrics())
+    response.headers["Cache-Control"] = "no-cache, no-store, must-revalidate"
+    return response, 200
+
+
 def get_db_version():
     try:
         query = "SELECT version_num FROM alembic_version"
@@ -0,0 +1,183 @@
+"""
+
+Revision ID: 0419_partition_notifications
+Revises: 0418_user_state_enum
+Create Date: 2026-10-19 09:00:00.000000
+
+Partition notifications by range on created_at, so that retention can detach and drop whole
+days instead of deleting rows in batches.
+
+The existing table is attached as notifications_legacy, covering everything created before
+tomorrow, so existing rows are not rewritten. Daily partitions after that are created by the
+maintain-notification-partitions task.
+
+Postgres requires unique constraints on a partitioned table to include the partition key, so the
+primary key becomes (id, created_at). Uniqueness of id and of (job_id, job_row_number) on their own
+is enforced by the notification_ids table, which triggers keep in step with notifications. It keeps
+the notifications_pkey / uq_notifications_job_row_number names for the constraints that matter to
+callers, so a duplicate insert still raises an IntegrityError (save_sms and save_email rely on this
+to ignore replayed messages).
+
+This locks notifications while it rebuilds the primary key of the existing rows and fills
+notification_ids, so it should be run in a maintenance window.
+"""
+
+from datetime import timedelta
+
+import sqlalchemy as sa
+from alembic import op
+
+revision = "0419_partition_notifications"
+down_revision = "0418_user_state_enum"
+
+PRECREATE_DAYS = 14
+
+
+def _non_unique_index_definitions(table_name):
+    return op.get_bind().execute(sa.text(f"""
+            SELECT pg_indexes.indexname, pg_indexes.indexdef
+              FROM pg_indexes
+              JOIN pg_class ON pg_class.relname = pg_indexes.indexname
+              JOIN pg_index ON pg_index.indexrelid = pg_class.oid
+             WHERE pg_indexes.tablename = '{table_name}'
+               AND NOT pg_index.indisunique
+            """)).all()
+
+
+def _foreign_key_definitions(table_name):
+    return op.get_bind().execute(sa.text(f"""
+            SELECT conname, pg_get_constraintdef(oid) AS definition
+              FROM pg_constraint
+             WHERE conrelid = '{table_name}'::regclass
+               AND contype = 'f'
+            """)).all()
+
+
+def upgrade():
+    conn = op.get_bind()
+    view_definition = conn.execute(
+        sa.text("SELECT pg_get_viewdef('notifications_all_time_view')")
+    ).scalar()
+    index_definitions = _non_unique_index_definitions("notifications")
+    foreign_keys = _foreign_key_definitions("notifications")
+
+    op.execute("DROP VIEW notifications_all_time_view")
+    op.execute("ALTER TABLE notifications RENAME TO notifications_legacy")
+    op.execute(
+        "ALTER TABLE notifications_legacy DROP CONSTRAINT uq_notifications_job_row_number"
+    )
+    op.execute("ALTER TABLE notifications_legacy DROP CONSTRAINT notifications_pkey")
+    op.execute(
+        "ALTER TABLE notifications_legacy "
+        "ADD CONSTRAINT notifications_legacy_pkey PRIMARY KEY (id, created_at)"
+    )
+    for index_name, _ in index_definitions:
+        op.execute(f"ALTER INDEX {index_name} RENAME TO {index_name}_legacy")
+
+    op.execute("""
+        CREATE TABLE notifications (
+            LIKE notifications_legacy
+            INCLUDING DEFAULTS INCLUDING CONSTRAINTS INCLUDING STORAGE
+        ) PARTITION BY RANGE (created_at)
+    """)
+    op.execute(
+        "ALTER TABLE notifications "
+        "ADD CONSTRAINT notifications_partitioned_pkey PRIMARY KEY (id, created_at)"
+    )
+    # the definitions were read before the rename, so they now point at the new parent table
+    for _, index_definition in index_definitions:
+        op.execute(index_definition)
+    for constraint_name, definition in foreign_keys:
+        op.execute(
+            f"ALTER TABLE notifications ADD CONSTRAINT {constraint_name} {definition}"
+        )
+
+    op.execute("""
+        CREATE TABLE notification_ids (
+            id UUID NOT NULL,
+            job_id UUID,
+            job_row_number INTEGER,
+            CONSTRAINT notifications_pkey PRIMARY KEY (id),
+            CONSTRAINT uq_notifications_job_row_number UNIQUE (job_id, job_row_number)
+        )
+    """)
+    op.execute("""
+        INSERT INTO notification_ids (id, job_id, job_row_number)
+        SELECT id, job_id, job_row_number FROM notifications_legacy
+    """)
+    op.execute("""
+        CREATE FUNCTION notification_ids_sync() RETURNS trigger AS $$
+        BEGIN
+            IF TG_OP IN ('UPDATE', 'DELETE') THEN
+                DELETE FROM notification_ids WHERE id = OLD.id;
+            END IF;
+            IF TG_OP IN ('UPDATE', 'INSERT') THEN
+                INSERT INTO notification_ids (id, job_id, job_row_number)
+                VALUES (NEW.id, NEW.job_id, NEW.job_row_number);
+            END IF;
+            RETURN NULL;
+        END
+        $$ LANGUAGE plpgsql
+    """)
+    op.execute("""
+        CREATE TRIGGER notification_ids_sync
+        AFTER INSERT OR DELETE OR UPDATE OF id, job_id, job_row_number ON notifications
+        FOR EACH ROW EXECUTE FUNCTION notification_ids_sync()
+    """)
+
+    range_start = conn.execute(sa.text("""
+            SELECT date_trunc(
+                'day', greatest(max(created_at), timezone('utc', now()))
+            ) + interval '1 day'
+              FROM notifications_legacy
+            """)).scalar()
+    op.execute(f"""
+        ALTER TABLE notifications ATTACH PARTITION notifications_legacy
+        FOR VALUES FROM (MINVALUE) TO ('{range_start:%Y-%m-%d %H:%M:%S}')
+    """)
+    for day in range(PRECREATE_DAYS):
+        start = range_start + timedelta(days=day)
+        end = start + timedelta(days=1)
+        op.execute(f"""
+            CREATE TABLE notifications_p{start:%Y%m%d} PARTITION OF notifications
+            FOR VALUES FROM ('{start:%Y-%m-%d %H:%M:%S}') TO ('{end:%Y-%m-%d %H:%M:%S}')
+        """)
+
+    op.execute(f"CREATE VIEW notifications_all_time_view AS {view_definition}")
+
+
+def downgrade():
+    conn = op.get_bind()
+    view_definition = conn.execute(
+        sa.text("SELECT pg_get_viewdef('notifications_all_time_view')")
+    ).scalar()
+    index_definitions = _non_unique_index_definitions("notifications")
+    foreign_keys = _foreign_key_definitions("notifications")
+
+    op.execute("DROP VIEW notifications_all_time_view")
+    op.execute("ALTER TABLE notifications RENAME TO notifications_partitioned")
+    op.execute("""
+        CREATE TABLE notifications (
+            LIKE notifications_partitioned
+            INCLUDING DEFAULTS INCLUDING CONSTRAINTS INCLUDING STORAGE
+        )
+    """)
+    op.execute("INSERT INTO notifications SELECT * FROM notifications_partitioned")
+    # drops every partition, and with them the trigger
+    op.execute("DROP TABLE notifications_partitioned CASCADE")
+    op.execute("DROP FUNCTION notification_ids_sync")
+    op.execute("DROP TABLE notification_ids")
+
+    op.execute("ALTER TABLE notifications ADD PRIMARY KEY (id)")
+    op.execute(
+        "ALTER TABLE notifications ADD CONSTRAINT uq_notifications_job_row_number "
+        "UNIQUE (job_id, job_row_number)"
+    )
+    for _, index_definition in index_definitions:
+        op.execute(index_definition.replace(" ON ONLY ", " ON "))
+    for constraint_name, definition in foreign_keys:
+        op.execute(
+            f"ALTER TABLE notifications ADD CONSTRAINT {constraint_name} {definition}"
+        )
+
+    op.execute(f"CREATE VIEW notifications_all_time_view AS {view_definition}")
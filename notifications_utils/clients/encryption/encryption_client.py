@@ -1,11 +1,32 @@
-from base64 import urlsafe_b64encode
-from json import dumps, loads
+import binascii
+import os
+from base64 import urlsafe_b64decode, urlsafe_b64encode
+from collections import OrderedDict, namedtuple
+from threading import Lock
 
+from cryptography.exceptions import InvalidTag
 from cryptography.fernet import Fernet, InvalidToken
 from cryptography.hazmat.primitives import hashes
+from cryptography.hazmat.primitives.ciphers.aead import AESGCM
+from cryptography.hazmat.primitives.kdf.hkdf import HKDF
 from cryptography.hazmat.primitives.kdf.pbkdf2 import PBKDF2HMAC
 from itsdangerous import BadSignature, URLSafeSerializer
 
+from notifications_utils.fast_json import dumpb, loads
+
+FERNET = "fernet"
+AES_GCM = "aes-gcm"
+
+# The first byte of a message says how it was encrypted. Fernet tokens always start with 0x80.
+# AES-GCM messages start with 0x01, which is also authenticated along with the message, followed
+# by the nonce then the ciphertext and tag. The byte only identifies the format: both schemes'
+# keys come from SECRET_KEY, so there's only ever one key for each.
+FERNET_VERSION = 0x80
+AES_GCM_VERSION = 0x01
+AES_GCM_NONCE_SIZE = 12
+
+_Keys = namedtuple("_Keys", ["fernet", "aes_gcm"])
+
 
 class EncryptionError(Exception):
     pass
@@ -16,38 +37,83 @@ class SaltLengthError(Exception):
 
 
 class Encryption:
+    # how many keys derived from custom salts to keep, as each takes a few hundred ms to derive
+    derived_key_cache_size = 128
+
     def init_app(self, app):
+        """
+        ENCRYPTION_SCHEME picks how new messages are encrypted: "fernet" (the default) or
+        "aes-gcm", which is faster and gives shorter messages. Messages encrypted with either can
+        always be decrypted, so the scheme can be changed while messages are in flight.
+
+        Salts listed in ENCRYPTION_PREDERIVED_SALTS have their keys derived here, so that the
+        first message encrypted with each doesn't have to wait for it.
+        """
         self._serializer = URLSafeSerializer(app.config.get("SECRET_KEY"))
         self._salt = app.config.get("DANGEROUS_SALT")
         self._password = app.config.get("SECRET_KEY").encode()
+        self._scheme = app.config.get("ENCRYPTION_SCHEME", FERNET)
+        self._custom_keys = OrderedDict()
+        self._custom_keys_lock = Lock()
+
+        if self._scheme not in (FERNET, AES_GCM):
+            raise EncryptionError(f"Unknown ENCRYPTION_SCHEME {self._scheme}")
 
         try:
-            self._shared_encryptor = Fernet(self._derive_key(self._salt))
+            self._shared_keys = self._make_keys(self._salt)
         except SaltLengthError as reason:
             raise EncryptionError(
                 "DANGEROUS_SALT must be at least 16 bytes"
             ) from reason
 
+        for salt in app.config.get("ENCRYPTION_PREDERIVED_SALTS", ()):
+            self._keys(salt)
+
     def encrypt(self, thing_to_encrypt, salt=None):
         """Encrypt a string or object
 
         thing_to_encrypt must be serializable as JSON
         Returns a UTF-8 string
         """
-        serialized_bytes = dumps(thing_to_encrypt).encode("utf-8")
-        encrypted_bytes = self._encryptor(salt).encrypt(serialized_bytes)
-        return encrypted_bytes.decode("utf-8")
+        serialized_bytes = dumpb(thing_to_encrypt)
+        keys = self._keys(salt)
+        if self._scheme == AES_GCM:
+            header = bytes([AES_GCM_VERSION])
+            nonce = os.urandom(AES_GCM_NONCE_SIZE)
+            encrypted_bytes = keys.aes_gcm.encrypt(nonce, serialized_bytes, header)
+            return urlsafe_b64encode(header + nonce + encrypted_bytes).decode("utf-8")
+        return keys.fernet.encrypt(serialized_bytes).decode("utf-8")
 
     def decrypt(self, thing_to_decrypt, salt=None):
         """Decrypt a UTF-8 string or bytes.
 
         Once decrypted, thing_to_decrypt must be deserializable from JSON.
         """
+        if isinstance(thing_to_decrypt, str):
+            thing_to_decrypt = thing_to_decrypt.encode("utf-8")
         try:
-            return loads(self._encryptor(salt).decrypt(thing_to_decrypt))
-        except InvalidToken as reason:
+            message = urlsafe_b64decode(thing_to_decrypt)
+        except (binascii.Error, ValueError) as reason:
             raise EncryptionError from reason
 
+        keys = self._keys(salt)
+        if message[:1] == bytes([FERNET_VERSION]):
+            try:
+                return loads(keys.fernet.decrypt(thing_to_decrypt))
+            except InvalidToken as reason:
+                raise EncryptionError from reason
+        if message[:1] == bytes([AES_GCM_VERSION]):
+            header, nonce, encrypted_bytes = (
+                message[:1],
+                message[1 : 1 + AES_GCM_NONCE_SIZE],
+                message[1 + AES_GCM_NONCE_SIZE :],
+            )
+            try:
+                return loads(keys.aes_gcm.decrypt(nonce, encrypted_bytes, header))
+            except (InvalidTag, ValueError) as reason:
+                raise EncryptionError from reason
+        raise EncryptionError("Unknown encryption version")
+
     def sign(self, thing_to_sign, salt=None):
         return self._serializer.dumps(thing_to_sign, salt=(salt or self._salt))
 
@@ -57,16 +123,42 @@ class Encryption:
         except BadSignature as reason:
             raise EncryptionError from reason
 
-    def _encryptor(self, salt=None):
+    def _keys(self, salt=None):
         if salt is None:
-            return self._shared_encryptor
-        else:
-            try:
-                return Fernet(self._derive_key(salt))
-            except SaltLengthError as reason:
-                raise EncryptionError(
-                    "Custom salt value must be at least 16 bytes"
-                ) from reason
+            return self._shared_keys
+
+        with self._custom_keys_lock:
+            keys = self._custom_keys.get(salt)
+            if keys is not None:
+                self._custom_keys.move_to_end(salt)
+                return keys
+
+        # derived outside the lock, so other salts aren't held up. Two threads might both derive
+        # the same key, which is harmless
+        try:
+            keys = self._make_keys(salt)
+        except SaltLengthError as reason:
+            raise EncryptionError(
+                "Custom salt value must be at least 16 bytes"
+            ) from reason
+
+        with self._custom_keys_lock:
+            self._custom_keys[salt] = keys
+            self._custom_keys.move_to_end(salt)
+            while len(self._custom_keys) > self.derived_key_cache_size:
+                self._custom_keys.popitem(last=False)
+        return keys
+
+    def _make_keys(self, salt):
+        key = self._derive_key(salt)
+        # AES-GCM gets its own key, rather than reusing Fernet's with a different algorithm
+        aes_gcm_key = HKDF(
+            algorithm=hashes.SHA256(),
+            length=32,
+            salt=None,
+            info=b"notify-payload-aes-gcm",
+        ).derive(urlsafe_b64decode(key))
+        return _Keys(fernet=Fernet(key), aes_gcm=AESGCM(aes_gcm_key))
 
     def _derive_key(self, salt):
         """Derive a key suitable for use within Fernet from the SECRET_KEY and salt
@@ -1,6 +1,8 @@
 import numbers
 import uuid
-from time import time
+from collections import defaultdict, namedtuple
+from threading import Lock
+from time import monotonic
 
 from flask import current_app
 from flask_redis import FlaskRedis
@@ -33,10 +35,25 @@ def prepare_value(val):
         raise ValueError("cannot cast {} to a string".format(type(val)))
 
 
+# exceeded: whether this request is over the limit, and so was not counted
+# remaining: how many more requests could be made straight away
+# retry_after: seconds until the next request would be allowed, 0 unless exceeded
+# reset_after: seconds until the full limit is available again
+RateLimit = namedtuple(
+    "RateLimit", ["exceeded", "limit", "remaining", "retry_after", "reset_after"]
+)
+
+
 class RedisClient:
     redis_store = FlaskRedis()
     active = False
     scripts = {}
+    # how many keys delete_by_pattern looks at with each SCAN, and deletes with each UNLINK
+    SCAN_BATCH_SIZE = 1000
+
+    def __init__(self):
+        self._metrics_lock = Lock()
+        self._invalidation_metrics = defaultdict(lambda: defaultdict(int))
 
     def pipeline(self):
         return self.redis_store.pipeline()
@@ -49,18 +66,76 @@ class RedisClient:
             self.register_scripts()
 
     def register_scripts(self):
-        # delete keys matching a pattern supplied as a parameter. Does so in batches of 5000 to prevent unpack from
-        # exceeding lua's stack limit, and also to prevent errors if no keys match the pattern.
-        # Inspired by https://gist.github.com/ddre54/0a4751676272e0da8186
-        self.scripts["delete-keys-by-pattern"] = self.redis_store.register_script("""
-            local keys = redis.call('keys', ARGV[1])
+        # delete every key in the tag sets KEYS[1] to KEYS[ARGV[1]], and the sets themselves, then
+        # any other KEYS. Does so in batches of 5000 to prevent unpack from exceeding lua's stack
+        # limit. Inspired by https://gist.github.com/ddre54/0a4751676272e0da8186
+        self.scripts["delete-tagged"] = self.redis_store.register_script("""
             local deleted = 0
-            for i=1, #keys, 5000 do
-                deleted = deleted + redis.call('del', unpack(keys, i, math.min(i + 4999, #keys)))
+            local function unlink(keys)
+                for i=1, #keys, 5000 do
+                    deleted = deleted + redis.call('unlink', unpack(keys, i, math.min(i + 4999, #keys)))
+                end
             end
+            for i=1, tonumber(ARGV[1]) do
+                unlink(redis.call('smembers', KEYS[i]))
+            end
+            unlink(KEYS)
             return deleted
             """)
 
+        # generic cell rate algorithm, see check_rate_limit. Floats are returned as strings, as
+        # redis would truncate them to integers. The tolerance of a microsecond stops rounding
+        # errors refusing the last request of a burst
+        self.scripts["rate-limit"] = self.redis_store.register_script("""
+            local limit = tonumber(ARGV[1])
+            local interval = tonumber(ARGV[2])
+            local time = redis.call('time')
+            local now = tonumber(time[1]) + tonumber(time[2]) / 1000000
+            local emission_interval = interval / limit
+            local tolerance = 0.000001
+            local function seconds(value)
+                return string.format('%.6f', value)
+            end
+
+            local arrival = math.max(tonumber(redis.call('get', KEYS[1])) or now, now)
+            local next_arrival = arrival + emission_interval
+            local allowed_at = next_arrival - interval
+            if allowed_at - now > tolerance then
+                return {1, 0, seconds(allowed_at - now), seconds(arrival - now)}
+            end
+
+            redis.call(
+                'set', KEYS[1], seconds(next_arrival),
+                'px', math.ceil((next_arrival - now) * 1000)
+            )
+            return {
+                0,
+                math.floor((now - allowed_at + tolerance) / emission_interval),
+                '0',
+                seconds(next_arrival - now)
+            }
+            """)
+
+        # add up to ARGV[1] to a counter without taking it over ARGV[2], as long as at least ARGV[3]
+        # fits, and return how much was added. The key expires after ARGV[4] seconds
+        self.scripts["incr-within-limit"] = self.redis_store.register_script("""
+            local available = tonumber(ARGV[2]) - tonumber(redis.call('get', KEYS[1]) or '0')
+            if available < tonumber(ARGV[3]) then
+                return 0
+            end
+            local added = math.min(tonumber(ARGV[1]), available)
+            redis.call('incrby', KEYS[1], added)
+            redis.call('expire', KEYS[1], ARGV[4])
+            return added
+            """)
+
+        # decrement a counter, unless it has already expired
+        self.scripts["decr-if-exists"] = self.redis_store.register_script("""
+            if redis.call('exists', KEYS[1]) == 1 then
+                return redis.call('decrby', KEYS[1], ARGV[1])
+            end
+            """)
+
     def delete_by_pattern(self, pattern, raise_exception=False):
         r"""
         Deletes all keys matching a given pattern, and returns how many keys were deleted.
@@ -73,10 +148,25 @@ class RedisClient:
         * h[a-b]llo matches hallo and hbllo
 
         Use \ to escape special characters if you want to match them verbatim
+
+        This walks the whole keyspace with SCAN, a batch at a time so redis can serve other
+        clients in between, but it's still slow. Prefer delete_tagged for anything done often.
         """
         if self.active:
+            start = monotonic()
+            deleted = 0
             try:
-                return self.scripts["delete-keys-by-pattern"](args=[pattern])
+                batch = []
+                for key in self.redis_store.scan_iter(
+                    match=pattern, count=self.SCAN_BATCH_SIZE
+                ):
+                    batch.append(key)
+                    if len(batch) == self.SCAN_BATCH_SIZE:
+                        deleted += self.redis_store.unlink(*batch)
+                        batch = []
+                if batch:
+                    deleted += self.redis_store.unlink(*batch)
+                return deleted
             except Exception as e:
                 current_app.logger.exception(
                     f"Exception in delete_by_pattern pattern={pattern}"
@@ -84,61 +174,126 @@ class RedisClient:
                 self.__handle_exception(
                     e, raise_exception, "delete-by-pattern", pattern
                 )
+            finally:
+                self._record_invalidation(
+                    "delete_by_pattern", monotonic() - start, deleted
+                )
 
         return 0
 
-    def exceeded_rate_limit(self, cache_key, limit, interval, raise_exception=False):
+    def set_tagged(self, key, value, tags, ex=None, raise_exception=False):
         """
-        Rate limiting.
-        - Uses Redis sorted sets
-        - Also uses redis "multi" which is abstracted into pipeline() by FlaskRedis/PyRedis
-        - Sends all commands to redis as a group to be executed atomically
-
-        Method:
-        (1) Add event, scored by timestamp (zadd). The score determines order in set.
-        (2) Use zremrangebyscore to delete all set members with a score between
-            - Earliest entry (lowest score == earliest timestamp) - represented as '-inf'
-                and
-            - Current timestamp minus the interval
-            - Leaves only relevant entries in the set (those between now and now - interval)
-        (3) Count the set
-        (4) If count > limit fail request
-        (5) Ensure we expire the set key to preserve space
-
-        Notes:
-        - Failed requests count. If over the limit and keep making requests you'll stay over the limit.
-        - The actual value in the set is just the timestamp, the same as the score. We don't store any requets details.
-        - return value of pipe.execute() is an array containing the outcome of each call.
-            - result[2] == outcome of pipe.zcard()
-        - If redis is inactive, or we get an exception, allow the request
+        Set a key, and add it to each of the tag sets, so it is deleted by delete_tagged for any
+        of them. The tag sets expire ex seconds after the latest key was added to them.
+        """
+        key = prepare_value(key)
+        value = prepare_value(value)
+        if self.active:
+            try:
+                pipe = self.redis_store.pipeline()
+                pipe.set(key, value, ex=ex)
+                for tag in tags:
+                    pipe.sadd(tag, key)
+                    if ex:
+                        pipe.expire(tag, ex)
+                pipe.execute()
+            except Exception as e:
+                self.__handle_exception(e, raise_exception, "set-tagged", key)
+
+    def delete_tagged(self, *tags, keys=(), raise_exception=False):
+        """
+        Delete every key added to any of the tag sets by set_tagged, the tag sets, and any other
+        keys given, in one round trip. Returns how many keys were deleted.
+        """
+        tags = [prepare_value(tag) for tag in tags]
+        keys = [prepare_value(key) for key in keys]
+        if self.active:
+            start = monotonic()
+            deleted = 0
+            try:
+                deleted = self.scripts["delete-tagged"](
+                    keys=[*tags, *keys], args=[len(tags)]
+                )
+                return deleted
+            except Exception as e:
+                self.__handle_exception(
+                    e, raise_exception, "delete-tagged", ", ".join(tags)
+                )
+            finally:
+                self._record_invalidation("delete_tagged", monotonic() - start, deleted)
+
+        return 0
+
+    def _record_invalidation(self, operation, seconds, keys_deleted):
+        with self._metrics_lock:
+            metrics = self._invalidation_metrics[operation]
+            metrics["count"] += 1
+            metrics["seconds"] += seconds
+            metrics["max_seconds"] = max(metrics["max_seconds"], seconds)
+            metrics["keys_deleted"] += keys_deleted
+
+    def get_invalidation_metrics(self):
+        """
+        How many times each way of deleting cached keys has been called in this process, how long
+        they took in total and at most, and how many keys they deleted.
+        """
+        with self._metrics_lock:
+            return {
+                operation: dict(metrics)
+                for operation, metrics in self._invalidation_metrics.items()
+            }
+
+    def check_rate_limit(self, cache_key, limit, interval, raise_exception=False):
+        """
+        Rate limiting, using the generic cell rate algorithm (GCRA) in a lua script.
+
+        Requests are allowed at an even rate of limit per interval, with bursts of up to limit
+        requests at once. The only state is one key per cache_key, holding the "theoretical
+        arrival time" when the next request would be due if every allowed request so far had
+        arrived evenly spaced. Each request:
+
+        (1) Moves the arrival time forward by interval / limit, or starts it from now
+        (2) Is over the limit if that puts it more than interval ahead of now. The arrival time
+            isn't moved, so requests over the limit don't count
+        (3) Otherwise stores the new arrival time, expiring once it has passed
+
+        That is one round trip and O(1) memory, however high the limit. The script uses redis's
+        own clock, so that every app instance agrees on the time.
+
+        If redis is inactive, or we get an exception, the request is allowed.
 
         :param cache_key:
         :param limit: Number of requests permitted within interval
-        :param interval: Interval we measure requests in
+        :param interval: Interval we measure requests in, in seconds
         :param raise_exception: Should throw exception
-        :return:
+        :return: a RateLimit
         """
         cache_key = prepare_value(cache_key)
         if self.active:
             try:
-                pipe = self.redis_store.pipeline()
-                when = time()
-                pipe.zadd(cache_key, {when: when})
-                pipe.zremrangebyscore(cache_key, "-inf", when - interval)
-                pipe.zcard(cache_key)
-                pipe.expire(cache_key, interval)
-                result = pipe.execute()
-                return result[2] > limit
+                exceeded, remaining, retry_after, reset_after = self.scripts[
+                    "rate-limit"
+                ](keys=[cache_key], args=[limit, interval])
+                return RateLimit(
+                    exceeded=bool(exceeded),
+                    limit=limit,
+                    remaining=int(remaining),
+                    retry_after=float(retry_after),
+                    reset_after=float(reset_after),
+                )
             except Exception as e:
                 current_app.logger.exception(
-                    f"Exception in exceeded_rate_limit cache_key {cache_key} limit = {limit}"
-                )
-                self.__handle_exception(
-                    e, raise_exception, "rate-limit-pipeline", cache_key
+                    f"Exception in check_rate_limit cache_key {cache_key} limit = {limit}"
                 )
-                return False
-        else:
-            return False
+                self.__handle_exception(e, raise_exception, "rate-limit", cache_key)
+        return RateLimit(
+            exceeded=False, limit=limit, remaining=limit, retry_after=0, reset_after=0
+        )
+
+    def exceeded_rate_limit(self, cache_key, limit, interval, raise_exception=False):
+        return self.check_rate_limit(
+            cache_key, limit, interval, raise_exception=raise_exception
+        ).exceeded
 
     def set(
         self, key, value, ex=None, px=None, nx=False, xx=False, raise_exception=False
@@ -156,6 +311,36 @@ class RedisClient:
             except Exception as e:
                 self.__handle_exception(e, raise_exception, "incr", key)
 
+    def incr_within_limit(
+        self, key, amount, limit, ex, minimum=1, raise_exception=False
+    ):
+        """
+        Atomically add up to amount to the counter at key, without taking it over limit, and
+        return how much was added. Adds nothing, and returns 0, if less than minimum would fit.
+        The key expires ex seconds later.
+
+        If redis is inactive, or we get an exception, returns amount as if it all fitted.
+        """
+        key = prepare_value(key)
+        if self.active:
+            try:
+                return int(
+                    self.scripts["incr-within-limit"](
+                        keys=[key], args=[amount, limit, minimum, ex]
+                    )
+                )
+            except Exception as e:
+                self.__handle_exception(e, raise_exception, "incr-within-limit", key)
+        return amount
+
+    def decr_if_exists(self, key, amount, raise_exception=False):
+        key = prepare_value(key)
+        if self.active:
+            try:
+                return self.scripts["decr-if-exists"](keys=[key], args=[amount])
+            except Exception as e:
+                self.__handle_exception(e, raise_exception, "decr-if-exists", key)
+
     def get(self, key, raise_exception=False):
         key = prepare_value(key)
         if self.active:
@@ -163,18 +348,33 @@ class RedisClient:
 
         return None
 
-    def rpush(self, key, value):
+    def mget(self, keys, raise_exception=False):
+        keys = [prepare_value(key) for key in keys]
+        if self.active and keys:
+            try:
+                return self.redis_store.mget(keys)
+            except Exception as e:
+                self.__handle_exception(e, raise_exception, "mget", ", ".join(keys))
+
+        return [None] * len(keys)
+
+    def rpush(self, key, *values):
         if self.active:
-            self.redis_store.rpush(key, value)
+            return self.redis_store.rpush(key, *values)
 
-    def lpop(self, key):
+    def lpop(self, key, count=None):
         if self.active:
-            return self.redis_store.lpop(key)
+            return self.redis_store.lpop(key, count)
 
     def llen(self, key):
         if self.active:
             return self.redis_store.llen(key)
 
+    def scan_iter(self, match):
+        if self.active:
+            return self.redis_store.scan_iter(match=match, count=self.SCAN_BATCH_SIZE)
+        return []
+
     def ltrim(self, key, start, end):
         if self.active:
             return self.redis_store.ltrim(key, start, end)
@@ -182,10 +382,14 @@ class RedisClient:
     def delete(self, *keys, raise_exception=False):
         keys = [prepare_value(k) for k in keys]
         if self.active:
+            start = monotonic()
+            deleted = 0
             try:
-                self.redis_store.delete(*keys)
+                deleted = self.redis_store.delete(*keys)
             except Exception as e:
                 self.__handle_exception(e, raise_exception, "delete", ", ".join(keys))
+            finally:
+                self._record_invalidation("delete", monotonic() - start, deleted)
 
     def __handle_exception(self, e, raise_exception, operation, key_name):
         current_app.logger.exception(
@@ -1,78 +1,130 @@
-import json
-from contextlib import suppress
+import zlib
 from datetime import timedelta
 from functools import wraps
 from inspect import signature
 
+from notifications_utils import fast_json
+
 
 class RequestCache:
     DEFAULT_TTL = int(timedelta(days=7).total_seconds())
+    # with compress=True, values at least this long are stored compressed
+    COMPRESS_MIN_BYTES = 1024
+    # JSON can't start with this, so compressed and plain values can be told apart
+    COMPRESSED_PREFIX = b"zlib:"
 
     def __init__(self, redis_client):
         self.redis_client = redis_client
 
     @staticmethod
-    def _get_argument(argument_name, client_method, args, kwargs):
-        with suppress(KeyError):
-            return kwargs[argument_name]
-
-        with suppress(ValueError, IndexError):
-            argument_index = list(signature(client_method).parameters).index(
-                argument_name
+    def _key_builder(key_format, client_method):
+        """
+        Work out once, when a method is decorated, where each of its arguments will be found, and
+        return a function that makes the key for a call from its args and kwargs.
+
+        An argument is taken from kwargs, then args, then its default.
+        """
+        parameters = [
+            (index, name, parameter.default)
+            for index, (name, parameter) in enumerate(
+                signature(client_method).parameters.items()
             )
-            return args[argument_index]
+        ]
+
+        def make_key(args, kwargs):
+            values = {}
+            for index, name, default in parameters:
+                if name in kwargs:
+                    values[name] = kwargs[name]
+                elif index < len(args):
+                    values[name] = args[index]
+                else:
+                    values[name] = default
+            return key_format.format_map(values)
+
+        return make_key
+
+    def _encode(self, value, compress):
+        encoded = fast_json.dumps(value)
+        if compress and len(encoded) >= self.COMPRESS_MIN_BYTES:
+            return self.COMPRESSED_PREFIX + zlib.compress(encoded.encode("utf-8"))
+        return encoded
+
+    def _decode(self, cached):
+        if cached.startswith(self.COMPRESSED_PREFIX):
+            cached = zlib.decompress(cached[len(self.COMPRESSED_PREFIX) :])
+        return fast_json.loads(cached)
+
+    def set(self, key_format, *, ttl_in_seconds=DEFAULT_TTL, tags=(), compress=False):
+        """
+        Cache what the method returns under key_format. The key is also added to each of the tag
+        sets named by tags, which are formatted the same way, for delete_by_tag. With compress,
+        large values are stored compressed.
+
+        The decorated method gets a get_many method, which takes a list of tuples of arguments
+        and returns what the method would return for each, fetching all the cached ones with a
+        single MGET.
+        """
 
-        with suppress(KeyError):
-            return signature(client_method).parameters[argument_name].default
+        def _set(client_method):
+            make_key = RequestCache._key_builder(key_format, client_method)
+            make_tags = [RequestCache._key_builder(tag, client_method) for tag in tags]
 
-        raise TypeError(
-            "{}() takes no argument called '{}'".format(
-                client_method.__name__, argument_name
-            )
-        )
+            def call_and_cache(redis_key, args, kwargs):
+                api_response = client_method(*args, **kwargs)
+                value = self._encode(api_response, compress)
+                if make_tags:
+                    self.redis_client.set_tagged(
+                        redis_key,
+                        value,
+                        tags=[make_tag(args, kwargs) for make_tag in make_tags],
+                        ex=int(ttl_in_seconds),
+                    )
+                else:
+                    self.redis_client.set(
+                        redis_key,
+                        value,
+                        ex=int(ttl_in_seconds),
+                    )
+                return api_response
 
-    @staticmethod
-    def _make_key(key_format, client_method, args, kwargs):
-        return key_format.format(
-            **{
-                argument_name: RequestCache._get_argument(
-                    argument_name, client_method, args, kwargs
-                )
-                for argument_name in list(signature(client_method).parameters)
-            }
-        )
-
-    def set(self, key_format, *, ttl_in_seconds=DEFAULT_TTL):
-        def _set(client_method):
             @wraps(client_method)
             def new_client_method(*args, **kwargs):
-                redis_key = RequestCache._make_key(
-                    key_format, client_method, args, kwargs
-                )
+                redis_key = make_key(args, kwargs)
                 cached = self.redis_client.get(redis_key)
                 if cached:
-                    return json.loads(cached.decode("utf-8"))
-                api_response = client_method(*args, **kwargs)
-                self.redis_client.set(
-                    redis_key,
-                    json.dumps(api_response),
-                    ex=int(ttl_in_seconds),
-                )
-                return api_response
-
+                    return self._decode(cached)
+                return call_and_cache(redis_key, args, kwargs)
+
+            def get_many(calls):
+                calls = [tuple(args) for args in calls]
+                redis_keys = [make_key(args, {}) for args in calls]
+                return [
+                    (
+                        self._decode(cached)
+                        if cached
+                        else call_and_cache(redis_key, args, {})
+                    )
+                    for args, redis_key, cached in zip(
+                        calls, redis_keys, self.redis_client.mget(redis_keys)
+                    )
+                ]
+
+            new_client_method.get_many = get_many
             return new_client_method
 
         return _set
 
     def delete(self, key_format):
         def _delete(client_method):
+            make_key = RequestCache._key_builder(key_format, client_method)
+
             @wraps(client_method)
             def new_client_method(*args, **kwargs):
                 try:
                     api_response = client_method(*args, **kwargs)
                 finally:
-                    redis_key = self._make_key(key_format, client_method, args, kwargs)
-                    self.redis_client.delete(redis_key)
+                    self.redis_client.delete(make_key(args, kwargs))
                 return api_response
 
             return new_client_method
@@ -81,13 +133,30 @@ class RequestCache:
 
     def delete_by_pattern(self, key_format):
         def _delete(client_method):
+            make_key = RequestCache._key_builder(key_format, client_method)
+
+            @wraps(client_method)
+            def new_client_method(*args, **kwargs):
+                try:
+                    api_response = client_method(*args, **kwargs)
+                finally:
+                    self.redis_client.delete_by_pattern(make_key(args, kwargs))
+                return api_response
+
+            return new_client_method
+
+        return _delete
+
+    def delete_by_tag(self, tag_format):
+        def _delete(client_method):
+            make_tag = RequestCache._key_builder(tag_format, client_method)
+
             @wraps(client_method)
             def new_client_method(*args, **kwargs):
                 try:
                     api_response = client_method(*args, **kwargs)
                 finally:
-                    redis_key = self._make_key(key_format, client_method, args, kwargs)
-                    self.redis_client.delete_by_pattern(redis_key)
+                    self.redis_client.delete_tagged(make_tag(args, kwargs))
                 return api_response
 
             return new_client_method
@@ -29,6 +29,17 @@ from . import EMAIL_REGEX_PATTERN, hostname_part, tld_part
 
 us_prefix = "1"
 
+# Validated phone numbers and formatted recipients are remembered, so numbers that repeat - in a
+# job, or across the tasks that handle one notification - are only parsed once per process
+RECIPIENT_CACHE_SIZE = 10_000
+
+# A North American number written in one of the usual ways: ten digits, optionally after 1 or +1,
+# with spaces, dots, dashes or brackets between the groups. phonenumbers.parse gives the same
+# result for these as reading the digits directly, but is much slower.
+_NANP_PHONE_NUMBER = re.compile(
+    r"^(?:\+?1[\s.-]?)?\(?([2-9]\d{2})\)?[\s.-]?([2-9]\d{2})[\s.-]?(\d{4})$"
+)
+
 first_column_headings = {
     "email": ["email address"],
     "sms": ["phone number"],
@@ -66,6 +77,7 @@ class RecipientCSV:
         self.remaining_messages = remaining_messages
         self.rows_as_list = None
         self.should_validate = should_validate
+        self._validated_phone_numbers = {}
 
     def __len__(self):
         if not hasattr(self, "_len"):
@@ -331,6 +343,20 @@ class RecipientCSV:
 
         return False
 
+    def _validate_phone_number(self, value):
+        # rows are validated as they're read, so each distinct number is only checked once
+        if value not in self._validated_phone_numbers:
+            try:
+                self._validated_phone_numbers[value] = validate_phone_number(
+                    value, international=self.allow_international_sms
+                )
+            except InvalidPhoneError as error:
+                self._validated_phone_numbers[value] = error
+        result = self._validated_phone_numbers[value]
+        if isinstance(result, InvalidPhoneError):
+            raise InvalidPhoneError(str(result))
+        return result
+
     def _get_error_for_field(self, key, value):  # noqa: C901
         if self.is_address_column(key):
             return
@@ -349,9 +375,7 @@ class RecipientCSV:
                 if self.template_type == "email":
                     validate_email_address(value)
                 if self.template_type == "sms":
-                    validate_phone_number(
-                        value, international=self.allow_international_sms
-                    )
+                    self._validate_phone_number(value)
             except (InvalidEmailError, InvalidPhoneError) as error:
                 current_app.logger.exception(f"Email or phone error for {value}")
                 return str(error)
@@ -507,10 +531,21 @@ class InvalidAddressError(InvalidEmailError):
 
 def normalize_phone_number(phonenumber):
     if isinstance(phonenumber, str):
-        phonenumber = phonenumbers.parse(phonenumber, "US")
+        phonenumber = _parse_phone_number(phonenumber, "US")
     return phonenumbers.format_number(phonenumber, phonenumbers.PhoneNumberFormat.E164)
 
 
+def _parse_phone_number(number, region):
+    if isinstance(number, str) and (region == "US" or number.startswith("+1")):
+        match = _NANP_PHONE_NUMBER.match(number)
+        if match:
+            return phonenumbers.PhoneNumber(
+                country_code=int(us_prefix),
+                national_number=int("".join(match.groups())),
+            )
+    return phonenumbers.parse(number, region)
+
+
 def is_us_phone_number(number):
     try:
         return _get_country_code(number) == us_prefix
@@ -528,6 +563,7 @@ international_phone_info = namedtuple(
 )
 
 
+@lru_cache(maxsize=RECIPIENT_CACHE_SIZE)
 def get_international_phone_info(number):
     number = validate_phone_number(number, international=True)
     prefix = _get_country_code(number)
@@ -565,7 +601,10 @@ _NANP_COUNTRY_AREA_CODES = [
 
 
 def _get_country_code(number):
-    parsed = phonenumbers.parse(number, "US")
+    return _get_country_code_for_parsed_number(_parse_phone_number(number, "US"))
+
+
+def _get_country_code_for_parsed_number(parsed):
     country_code = str(parsed.country_code)
     if country_code == us_prefix:
         area_code = str(parsed.national_number)[:3]
@@ -590,22 +629,25 @@ def use_numeric_sender(number):
 
 def validate_us_phone_number(number):
     try:
-        parsed = phonenumbers.parse(number, "US")
-        if not is_us_phone_number(number):
-            raise InvalidPhoneError("Not a US number")
-        if phonenumbers.is_valid_number(parsed):
-            return normalize_phone_number(parsed)
-        if len(str(parsed.national_number)) > 10:
-            raise InvalidPhoneError("Too many digits")
-        if len(str(parsed.national_number)) < 10:
-            raise InvalidPhoneError("Not enough digits")
-        if phonenumbers.is_possible_number(parsed):
-            raise InvalidPhoneError("Phone number range is not in use")
-        raise InvalidPhoneError("Phone number is not possible")
+        return _validate_parsed_us_phone_number(_parse_phone_number(number, "US"))
     except NumberParseException as exc:
         raise InvalidPhoneError(exc._msg) from exc
 
 
+def _validate_parsed_us_phone_number(parsed):
+    if _get_country_code_for_parsed_number(parsed) != us_prefix:
+        raise InvalidPhoneError("Not a US number")
+    if phonenumbers.is_valid_number(parsed):
+        return normalize_phone_number(parsed)
+    if len(str(parsed.national_number)) > 10:
+        raise InvalidPhoneError("Too many digits")
+    if len(str(parsed.national_number)) < 10:
+        raise InvalidPhoneError("Not enough digits")
+    if phonenumbers.is_possible_number(parsed):
+        raise InvalidPhoneError("Phone number range is not in use")
+    raise InvalidPhoneError("Phone number is not possible")
+
+
 def show_mangled_number_clues(number):
 
     translator = {
@@ -627,9 +669,39 @@ def show_mangled_number_clues(number):
 
 
 def validate_phone_number(number, international=False):
-    if (not international) or is_us_phone_number(number):
+    if not isinstance(number, str):
+        return _validate_phone_number(number, international)
+
+    formatted_number, error_message = _validate_phone_number_and_remember(
+        number, bool(international)
+    )
+    if error_message is not None:
+        raise InvalidPhoneError(error_message)
+    return formatted_number
+
+
+@lru_cache(maxsize=RECIPIENT_CACHE_SIZE)
+def _validate_phone_number_and_remember(number, international):
+    # errors are remembered too, but as messages - raising the same exception instance again would
+    # keep adding to its traceback
+    try:
+        return _validate_phone_number(number, international), None
+    except InvalidPhoneError as error:
+        return None, str(error)
+
+
+def _validate_phone_number(number, international):
+    if not international:
         return validate_us_phone_number(number)
 
+    # parse once and reuse the result if it's a US number, rather than checking that first
+    try:
+        parsed = _parse_phone_number(number, "US")
+    except NumberParseException:
+        parsed = None
+    if parsed is not None and _get_country_code_for_parsed_number(parsed) == us_prefix:
+        return _validate_parsed_us_phone_number(parsed)
+
     try:
         parsed = phonenumbers.parse(number, None)
         number = f"{parsed.country_code}{parsed.national_number}"
@@ -651,6 +723,25 @@ def validate_phone_number(number, international=False):
 validate_and_format_phone_number = validate_phone_number
 
 
+def validate_phone_numbers(numbers, international=False):
+    """
+    Validate and format many phone numbers, for example a column of a CSV file, checking each
+    distinct number only once.
+
+    :return: a dict of each number to either its formatted version or the InvalidPhoneError it
+        raised. Anything that isn't a string is left out.
+    """
+    results = {}
+    for number in numbers:
+        if not isinstance(number, str) or number in results:
+            continue
+        try:
+            results[number] = validate_phone_number(number, international)
+        except InvalidPhoneError as error:
+            results[number] = error
+    return results
+
+
 def try_validate_and_format_phone_number(number, international=None, log_msg=None):
     """
     For use in places where you shouldn't error if the phone number is invalid - for example if firetext pass us
@@ -720,7 +811,7 @@ def validate_and_format_email_address(email_address):
     return format_email_address(validate_email_address(email_address))
 
 
-@lru_cache(maxsize=32, typed=False)
+@lru_cache(maxsize=RECIPIENT_CACHE_SIZE, typed=False)
 def format_recipient(recipient):
     if not isinstance(recipient, str):
         return ""
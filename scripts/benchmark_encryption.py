@@ -0,0 +1,78 @@
+"""
+Time encrypting and decrypting with each ENCRYPTION_SCHEME, with the shared salt and with a
+custom salt, and show how long the encrypted messages are.
+
+    poetry run python scripts/benchmark_encryption.py [calls]
+
+The first call with a custom salt derives its key, which later calls reuse.
+"""
+
+import sys
+from os.path import abspath, dirname
+from time import perf_counter
+
+from flask import Flask
+
+sys.path.insert(0, dirname(dirname(abspath(__file__))))
+
+from notifications_utils.clients.encryption.encryption_client import (  # noqa: E402
+    AES_GCM,
+    FERNET,
+    Encryption,
+)
+
+CUSTOM_SALT = "benchmark-custom-salt"
+# roughly what process_row encrypts for each row of a job
+PAYLOAD = {
+    "template": "0f7a7ac5-6e8c-4bd1-8f6d-4c7f5a9c3c51",
+    "template_version": 3,
+    "job": "4a1d3b4e-2f43-4b8e-9f0c-0d6c1a2b9e77",
+    "to": "+12025550104",
+    "row_number": 1234,
+    "personalisation": {"name": "Example", "reference": "ABC-123456"},
+}
+
+
+def timed(description, function, calls):
+    start = perf_counter()
+    for _ in range(calls):
+        function()
+    elapsed = perf_counter() - start
+    print(f"{description:<40} {elapsed / calls * 1000:9.3f}ms per call")
+
+
+def main(calls):
+    for scheme in (FERNET, AES_GCM):
+        app = Flask(__name__)
+        app.config["SECRET_KEY"] = "benchmark-secret-key"
+        app.config["DANGEROUS_SALT"] = "benchmark-dangerous-salt"
+        app.config["ENCRYPTION_SCHEME"] = scheme
+        encryption = Encryption()
+        encryption.init_app(app)
+
+        encrypted = encryption.encrypt(PAYLOAD)
+        print(f"{scheme}: {len(encrypted)} characters per message")
+        timed("encrypt, shared salt", lambda: encryption.encrypt(PAYLOAD), calls)
+        timed("decrypt, shared salt", lambda: encryption.decrypt(encrypted), calls)
+
+        timed(
+            "encrypt, custom salt, first call",
+            lambda: encryption.encrypt(PAYLOAD, salt=CUSTOM_SALT),
+            1,
+        )
+        encrypted = encryption.encrypt(PAYLOAD, salt=CUSTOM_SALT)
+        timed(
+            "encrypt, custom salt",
+            lambda: encryption.encrypt(PAYLOAD, salt=CUSTOM_SALT),
+            calls,
+        )
+        timed(
+            "decrypt, custom salt",
+            lambda: encryption.decrypt(encrypted, salt=CUSTOM_SALT),
+            calls,
+        )
+        print()
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 10_000)
@@ -0,0 +1,97 @@
+"""
+Time encoding a page of the notifications list endpoints' responses with Flask's own JSON
+provider, and with FastJSONProvider, which uses orjson when it's installed.
+
+    poetry run python scripts/benchmark_json.py [pages]
+"""
+
+import sys
+import uuid
+from datetime import datetime, timedelta
+from os.path import abspath, dirname
+from time import perf_counter
+
+from flask import Flask
+from flask.json.provider import DefaultJSONProvider
+
+sys.path.insert(0, dirname(dirname(abspath(__file__))))
+
+from notifications_utils import fast_json  # noqa: E402
+
+PAGE_SIZE = 50
+
+
+def notification(index):
+    # what Notification.serialize() gives for each notification on a page
+    created_at = datetime(2025, 3, 1, 12) + timedelta(seconds=index)
+    return {
+        "id": uuid.uuid4(),
+        "reference": f"reference-{index}",
+        "email_address": None,
+        "phone_number": "+12028675309",
+        "line_1": None,
+        "line_2": None,
+        "line_3": None,
+        "line_4": None,
+        "line_5": None,
+        "line_6": None,
+        "postcode": None,
+        "type": "sms",
+        "status": "delivered",
+        "provider_response": "Message has been accepted by phone carrier",
+        "carrier": "Verizon Wireless",
+        "template": {
+            "version": 3,
+            "id": uuid.uuid4(),
+            "uri": f"/service/{uuid.uuid4()}/template/{uuid.uuid4()}",
+        },
+        "body": "Your appointment is tomorrow at 10am. Reply STOP to opt out.",
+        "subject": None,
+        "created_at": created_at.strftime("%Y-%m-%dT%H:%M:%S.%fZ"),
+        "created_by_name": None,
+        "sent_at": created_at.strftime("%Y-%m-%dT%H:%M:%S.%fZ"),
+        "completed_at": created_at.strftime("%Y-%m-%dT%H:%M:%S.%fZ"),
+        "scheduled_for": None,
+    }
+
+
+def timed(description, function, pages):
+    start = perf_counter()
+    for _ in range(pages):
+        function()
+    elapsed = perf_counter() - start
+    print(f"{description:<45} {elapsed / pages * 1e6:9.1f}µs per page")
+
+
+def main(pages):
+    app = Flask(__name__)
+    flask_provider = DefaultJSONProvider(app)
+    fast_provider = fast_json.FastJSONProvider(app)
+    response = {
+        "notifications": [notification(index) for index in range(PAGE_SIZE)],
+        "page_size": PAGE_SIZE,
+        "total": PAGE_SIZE,
+        "links": {"prev": None, "next": "/service/x/notifications?page=2"},
+    }
+    encoded = flask_provider.dumps(response)
+
+    print(
+        f"JSON backend: {'orjson' if fast_json.orjson else 'json (orjson not installed)'}, "
+        f"{PAGE_SIZE} notifications, {len(encoded)} bytes\n"
+    )
+    timed(
+        "encode page, Flask's provider",
+        lambda: flask_provider.dumps(response, separators=(",", ":")),
+        pages,
+    )
+    timed(
+        "encode page, FastJSONProvider",
+        lambda: fast_provider.dumps(response, separators=(",", ":")),
+        pages,
+    )
+    timed("decode page, Flask's provider", lambda: flask_provider.loads(encoded), pages)
+    timed("decode page, FastJSONProvider", lambda: fast_provider.loads(encoded), pages)
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 2_000)
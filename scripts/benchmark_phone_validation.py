@@ -0,0 +1,111 @@
+"""
+Time phone number validation on a CSV of recipients, by default loadtest_10k.csv.
+
+    poetry run python scripts/benchmark_phone_validation.py [path/to/file.csv]
+
+Each number is also validated with phonenumbers directly, parsing every row, for comparison.
+"""
+
+import sys
+from os.path import abspath, dirname, join
+from time import perf_counter
+
+import phonenumbers
+
+sys.path.insert(0, dirname(dirname(abspath(__file__))))
+
+from notifications_utils.recipients import (  # noqa: E402
+    RecipientCSV,
+    _validate_phone_number_and_remember,
+    format_recipient,
+    get_international_phone_info,
+    validate_phone_number,
+    validate_phone_numbers,
+)
+from notifications_utils.template import SMSMessageTemplate  # noqa: E402
+
+
+def clear_caches():
+    for cached in (
+        _validate_phone_number_and_remember,
+        format_recipient,
+        get_international_phone_info,
+    ):
+        cached.cache_clear()
+
+
+def timed(description, function, rows):
+    clear_caches()
+    start = perf_counter()
+    function()
+    elapsed = perf_counter() - start
+    print(
+        f"{description:<45} {elapsed * 1000:9.1f}ms {elapsed / rows * 1e6:8.2f}µs/row"
+    )
+
+
+def parse_every_row(numbers):
+    for number in numbers:
+        parsed = phonenumbers.parse(number, "US")
+        phonenumbers.is_valid_number(parsed)
+        phonenumbers.format_number(parsed, phonenumbers.PhoneNumberFormat.E164)
+
+
+def validate_every_row(numbers):
+    for number in numbers:
+        validate_phone_number(number, international=True)
+
+
+def validate_csv(file_data):
+    recipient_csv = RecipientCSV(
+        file_data,
+        template=SMSMessageTemplate({"content": "hello", "template_type": "sms"}),
+        allow_international_sms=True,
+    )
+    assert not recipient_csv.has_errors
+
+
+def main(path):
+    with open(path) as csv_file:
+        file_data = csv_file.read()
+    numbers = file_data.splitlines()[1:]
+    distinct_numbers = len(set(numbers))
+    print(f"{path}: {len(numbers)} rows, {distinct_numbers} distinct numbers\n")
+
+    timed(
+        "phonenumbers.parse on every row",
+        lambda: parse_every_row(numbers),
+        len(numbers),
+    )
+    timed(
+        "validate_phone_number on every row",
+        lambda: validate_every_row(numbers),
+        len(numbers),
+    )
+    timed(
+        "validate_phone_numbers",
+        lambda: validate_phone_numbers(numbers, international=True),
+        len(numbers),
+    )
+    timed("RecipientCSV validation", lambda: validate_csv(file_data), len(numbers))
+
+    # the same numbers, all different, to show the cost without any repeats
+    distinct = [f"+1202555{index % 10000:04d}" for index in range(len(numbers))]
+    timed(
+        "phonenumbers.parse, no repeats",
+        lambda: parse_every_row(distinct),
+        len(distinct),
+    )
+    timed(
+        "validate_phone_number, no repeats",
+        lambda: validate_every_row(distinct),
+        len(distinct),
+    )
+
+
+if __name__ == "__main__":
+    main(
+        sys.argv[1]
+        if len(sys.argv) > 1
+        else join(dirname(dirname(abspath(__file__))), "loadtest_10k.csv")
+    )
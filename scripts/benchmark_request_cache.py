@@ -0,0 +1,106 @@
+"""
+Time the overhead RequestCache adds to each call of a decorated method, against an in-memory
+stand-in for redis, and show how much compression saves on a large cached template.
+
+    poetry run python scripts/benchmark_request_cache.py [calls]
+"""
+
+import json
+import sys
+from os.path import abspath, dirname
+from time import perf_counter
+
+sys.path.insert(0, dirname(dirname(abspath(__file__))))
+
+from notifications_utils.clients.redis import RequestCache  # noqa: E402
+
+TEMPLATE = {
+    "data": {
+        "archived": False,
+        "content": "Dear ((name)),\n\n" + "Your application has been received. " * 60,
+        "id": "0f7a7ac5-6e8c-4bd1-8f6d-4c7f5a9c3c51",
+        "process_type": "normal",
+        "reply_to_text": None,
+        "subject": "Your application",
+        "template_type": "email",
+        "version": 3,
+    }
+}
+
+
+class InMemoryRedis:
+    def __init__(self):
+        self.values = {}
+
+    def get(self, key):
+        return self.values.get(key)
+
+    def mget(self, keys):
+        return [self.values.get(key) for key in keys]
+
+    def set(self, key, value, ex=None):
+        self.values[key] = value if isinstance(value, bytes) else value.encode()
+
+    def set_tagged(self, key, value, tags, ex=None):
+        self.set(key, value, ex)
+
+
+def timed(description, function, calls, per=1):
+    start = perf_counter()
+    for _ in range(calls):
+        function()
+    elapsed = perf_counter() - start
+    print(f"{description:<45} {elapsed / calls / per * 1e6:8.2f}µs per call")
+
+
+def main(calls):
+    cache = RequestCache(InMemoryRedis())
+
+    def get_template(template_id, service_id, version=None):
+        return TEMPLATE
+
+    cached_get_template = cache.set(
+        "service-{service_id}-template-{template_id}-version-{version}"
+    )(get_template)
+    cached_get_template("template-id", "service-id")
+
+    timed("undecorated call", lambda: get_template("template-id", "service-id"), calls)
+    timed(
+        "cache hit, positional arguments",
+        lambda: cached_get_template("template-id", "service-id"),
+        calls,
+    )
+    timed(
+        "cache hit, keyword arguments",
+        lambda: cached_get_template(template_id="template-id", service_id="service-id"),
+        calls,
+    )
+
+    if hasattr(cached_get_template, "get_many"):
+        batch = [("template-id", "service-id")] * 100
+        timed(
+            "get_many, per template in a batch of 100",
+            lambda: cached_get_template.get_many(batch),
+            calls // 100,
+            per=100,
+        )
+
+        compressed_get_template = cache.set(
+            "compressed-{service_id}-template-{template_id}-version-{version}",
+            compress=True,
+        )(get_template)
+        compressed_get_template("template-id", "service-id")
+        timed(
+            "cache hit, compressed",
+            lambda: compressed_get_template("template-id", "service-id"),
+            calls,
+        )
+        print(
+            f"\ntemplate: {len(json.dumps(TEMPLATE))} bytes as JSON, "
+            f"{len(cache.redis_client.values['compressed-service-id-template-template-id-version-None'])}"
+            " bytes compressed"
+        )
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 100_000)
@@ -0,0 +1,80 @@
+"""
+Time validating a request body against a schema, as each request to the api does, with the
+validator built for every request and with it reused.
+
+    poetry run python scripts/benchmark_schema_validation.py [requests]
+"""
+
+import sys
+from os.path import abspath, dirname
+from time import perf_counter
+
+sys.path.insert(0, dirname(dirname(abspath(__file__))))
+
+from jsonschema import Draft7Validator  # noqa: E402
+
+from app.schema_validation import format_checker, validate  # noqa: E402
+from app.service.service_callback_api_schema import (  # noqa: E402
+    update_service_callback_api_schema,
+)
+from app.service.service_senders_schema import (  # noqa: E402
+    add_service_email_reply_to_request,
+    add_service_sms_sender_request,
+)
+
+REQUESTS = [
+    (
+        "email reply-to address",
+        add_service_email_reply_to_request,
+        {"email_address": "someone@example.com", "is_default": True},
+    ),
+    (
+        "sms sender",
+        add_service_sms_sender_request,
+        {
+            "sms_sender": "12025550104",
+            "is_default": False,
+            "inbound_number_id": "0f7a7ac5-6e8c-4bd1-8f6d-4c7f5a9c3c51",
+        },
+    ),
+    (
+        "callback api",
+        update_service_callback_api_schema,
+        {
+            "url": "https://some.service.gov.uk/callback",
+            "bearer_token": "something_unique",
+            "updated_by_id": "0f7a7ac5-6e8c-4bd1-8f6d-4c7f5a9c3c51",
+        },
+    ),
+]
+
+
+def validate_with_new_validator(json_to_validate, schema):
+    validator = Draft7Validator(schema, format_checker=format_checker)
+    return list(validator.iter_errors(json_to_validate))
+
+
+def timed(description, function, requests):
+    start = perf_counter()
+    for _ in range(requests):
+        function()
+    elapsed = perf_counter() - start
+    print(f"{description:<45} {elapsed / requests * 1e6:8.2f}µs per request")
+
+
+def main(requests):
+    for name, schema, json_to_validate in REQUESTS:
+        timed(
+            f"{name}, new validator",
+            lambda: validate_with_new_validator(json_to_validate, schema),
+            requests,
+        )
+        timed(
+            f"{name}, cached validator",
+            lambda: validate(json_to_validate, schema),
+            requests,
+        )
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 10_000)
@@ -4,6 +4,7 @@ import uuid
 import jwt
 import pytest
 from flask import g, request
+from freezegun import freeze_time
 
 from app import db
 from app.authentication.auth import (
@@ -12,14 +13,18 @@ from app.authentication.auth import (
     _decode_jwt_token,
     _get_auth_token,
     _get_token_issuer,
+    _verified_token_expires_at,
     requires_auth,
     requires_internal_auth,
 )
 from app.dao.api_key_dao import expire_api_key, get_model_api_keys, get_unsigned_secrets
 from app.dao.services_dao import dao_fetch_service_by_id
-from notifications_python_client.authentication import create_jwt_token
+from notifications_python_client.authentication import (
+    create_jwt_token,
+    decode_jwt_token,
+)
 from tests import create_admin_authorization_header, create_service_authorization_header
-from tests.conftest import set_config_values
+from tests.conftest import set_config, set_config_values
 
 
 @pytest.fixture
@@ -238,6 +243,99 @@ def test_decode_jwt_token_returns_error_with_no_secrets(client):
     assert exc.value.short_message == "Invalid token: API key not found"
 
 
+@pytest.fixture
+def spy_decode_jwt_token(mocker):
+    return mocker.patch(
+        "app.authentication.auth.decode_jwt_token", wraps=decode_jwt_token
+    )
+
+
+def test_decode_jwt_token_only_checks_signature_once_per_token(
+    client, sample_api_key, sample_test_api_key, spy_decode_jwt_token
+):
+    token = create_jwt_token(
+        secret=sample_test_api_key.secret,
+        client_id=str(sample_test_api_key.service_id),
+    )
+    api_keys = [sample_api_key, sample_test_api_key]
+
+    assert _decode_jwt_token(token, api_keys) == sample_test_api_key
+    assert spy_decode_jwt_token.call_count == 2
+    assert _decode_jwt_token(token, api_keys) == sample_test_api_key
+    assert spy_decode_jwt_token.call_count == 2
+
+
+def test_decode_jwt_token_tries_last_used_api_key_first(
+    client, sample_api_key, sample_test_api_key, spy_decode_jwt_token
+):
+    service_id = sample_test_api_key.service_id
+    api_keys = [sample_api_key, sample_test_api_key]
+    for iat in (int(time.time()), int(time.time()) - 1):
+        token = create_custom_jwt_token(
+            payload={"iss": str(service_id), "iat": iat},
+            secret=sample_test_api_key.secret,
+        )
+        assert _decode_jwt_token(token, api_keys, service_id) == sample_test_api_key
+
+    assert [call.args[1] for call in spy_decode_jwt_token.call_args_list] == [
+        sample_api_key.secret,
+        sample_test_api_key.secret,
+        sample_test_api_key.secret,
+    ]
+
+
+def test_decode_jwt_token_tries_api_key_from_kid_header_first(
+    client, sample_api_key, sample_test_api_key, spy_decode_jwt_token
+):
+    token = create_custom_jwt_token(
+        headers={"typ": "JWT", "alg": "HS256", "kid": str(sample_test_api_key.id)},
+        payload={"iss": str(sample_test_api_key.service_id), "iat": int(time.time())},
+        secret=sample_test_api_key.secret,
+    )
+
+    assert (
+        _decode_jwt_token(token, [sample_api_key, sample_test_api_key])
+        == sample_test_api_key
+    )
+    spy_decode_jwt_token.assert_called_once_with(token, sample_test_api_key.secret)
+
+
+def test_decode_jwt_token_rejects_verified_token_once_api_key_revoked(
+    client, sample_api_key
+):
+    token = create_jwt_token(
+        secret=sample_api_key.secret, client_id=str(sample_api_key.service_id)
+    )
+    _decode_jwt_token(token, [sample_api_key])
+
+    expire_api_key(sample_api_key.service_id, sample_api_key.id)
+
+    with pytest.raises(AuthError) as exc:
+        _decode_jwt_token(token, [sample_api_key])
+    assert exc.value.short_message == "Invalid token: API key revoked"
+
+
+def test_decode_jwt_token_does_not_cache_expired_tokens(
+    notify_api, sample_api_key, spy_decode_jwt_token
+):
+    token = create_custom_jwt_token(
+        payload={"iss": str(sample_api_key.service_id), "iat": int(time.time()) - 60},
+        secret=sample_api_key.secret,
+    )
+
+    with set_config(notify_api, "ALLOW_EXPIRED_API_TOKEN", True):
+        _decode_jwt_token(token, [sample_api_key])
+        _decode_jwt_token(token, [sample_api_key])
+
+    assert spy_decode_jwt_token.call_count == 2
+
+
+def test_verified_tokens_expire_with_the_token():
+    with freeze_time("2025-01-01 12:00:00"):
+        iat = int(time.time()) - 10
+        assert _verified_token_expires_at("digest", ("id", "secret", iat), 1000) == 1020
+
+
 def test_requires_auth_should_not_allow_service_id_with_the_wrong_data_type(
     client, service_jwt_secret
 ):
@@ -11,6 +11,7 @@ from botocore.exceptions import ClientError
 from app import job_cache
 from app.aws import s3
 from app.aws.s3 import (
+    S3MultipartUpload,
     cleanup_old_s3_objects,
     download_from_s3,
     extract_phones,
@@ -677,3 +678,72 @@ def test_test_with_bom_header(mock_app):
 
 if __name__ == "__main__":
     test_valid_csv()
+
+
+def test_s3_multipart_upload_puts_small_files_in_one_request(mocker):
+    mock_client = mocker.patch("app.aws.s3.get_s3_client").return_value
+
+    with S3MultipartUpload("bucket", "some/file.csv") as upload:
+        upload.write(b"a,b\n")
+        upload.write(b"1,2\n")
+
+    mock_client.put_object.assert_called_once_with(
+        Bucket="bucket",
+        Key="some/file.csv",
+        Body=b"a,b\n1,2\n",
+        ServerSideEncryption="AES256",
+        ContentType="binary/octet-stream",
+    )
+    assert not mock_client.create_multipart_upload.called
+
+
+def test_s3_multipart_upload_uploads_parts_as_they_fill(mocker):
+    mocker.patch.object(S3MultipartUpload, "PART_SIZE", 4)
+    mock_client = mocker.patch("app.aws.s3.get_s3_client").return_value
+    mock_client.create_multipart_upload.return_value = {"UploadId": "upload-id"}
+    mock_client.upload_part.side_effect = [{"ETag": "1"}, {"ETag": "2"}, {"ETag": "3"}]
+
+    with S3MultipartUpload("bucket", "some/file.csv") as upload:
+        upload.write(b"abcd")
+        # nothing is sent until a part is full
+        upload.write(b"ef")
+        assert mock_client.upload_part.call_count == 1
+        upload.write(b"gh")
+        upload.write(b"i")
+
+    assert [c.kwargs["Body"] for c in mock_client.upload_part.call_args_list] == [
+        b"abcd",
+        b"efgh",
+        b"i",
+    ]
+    mock_client.complete_multipart_upload.assert_called_once_with(
+        Bucket="bucket",
+        Key="some/file.csv",
+        UploadId="upload-id",
+        MultipartUpload={
+            "Parts": [
+                {"ETag": "1", "PartNumber": 1},
+                {"ETag": "2", "PartNumber": 2},
+                {"ETag": "3", "PartNumber": 3},
+            ]
+        },
+    )
+    assert not mock_client.put_object.called
+
+
+def test_s3_multipart_upload_aborts_on_error(mocker):
+    mocker.patch.object(S3MultipartUpload, "PART_SIZE", 4)
+    mock_client = mocker.patch("app.aws.s3.get_s3_client").return_value
+    mock_client.create_multipart_upload.return_value = {"UploadId": "upload-id"}
+    mock_client.upload_part.return_value = {"ETag": "1"}
+
+    with pytest.raises(ValueError):
+        with S3MultipartUpload("bucket", "some/file.csv") as upload:
+            upload.write(b"abcdef")
+            raise ValueError()
+
+    mock_client.abort_multipart_upload.assert_called_once_with(
+        Bucket="bucket", Key="some/file.csv", UploadId="upload-id"
+    )
+    assert not mock_client.complete_multipart_upload.called
+    assert not mock_client.put_object.called
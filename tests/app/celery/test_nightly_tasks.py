@@ -15,21 +15,25 @@ from app.celery.nightly_tasks import (
     delete_inbound_sms,
     delete_notifications_for_service_and_type,
     delete_sms_notifications_older_than_retention,
+    maintain_notification_partitions,
     remove_sms_email_csv_files,
     s3,
     save_daily_notification_processing_time,
     timeout_notifications,
 )
-from app.enums import NotificationType, TemplateType
+from app.enums import CallbackType, NotificationStatus, NotificationType, TemplateType
 from app.models import FactProcessingTime, Job
+from app.serialised_models import SerialisedServiceCallbackApi
 from app.utils import utc_now
 from tests.app.db import (
     create_job,
     create_notification,
     create_service,
+    create_service_callback_api,
     create_service_data_retention,
     create_template,
 )
+from tests.conftest import set_config
 
 
 def mock_s3_get_list_match(bucket_name, subfolder="", suffix="", last_modified=None):
@@ -166,23 +170,127 @@ def test_delete_email_notifications_older_than_retentions_calls_child_task(
     mocked_notifications.assert_called_once_with(NotificationType.EMAIL)
 
 
+def test_maintain_notification_partitions_does_nothing_if_not_partitioned(
+    notify_api, mocker
+):
+    mocker.patch(
+        "app.celery.nightly_tasks.dao_notifications_table_is_partitioned",
+        return_value=False,
+    )
+    mock_create = mocker.patch(
+        "app.celery.nightly_tasks.dao_create_notification_partitions"
+    )
+    mock_archive = mocker.patch(
+        "app.celery.nightly_tasks.dao_archive_notification_partitions_before"
+    )
+
+    maintain_notification_partitions()
+
+    assert not mock_create.called
+    assert not mock_archive.called
+
+
+@freeze_time("2021-12-13T10:00")
+@pytest.mark.parametrize(
+    "longest_retention, expected_archive_before",
+    [
+        (None, datetime(2021, 12, 6)),
+        (3, datetime(2021, 12, 6)),
+        (30, datetime(2021, 11, 13)),
+    ],
+)
+def test_maintain_notification_partitions(
+    notify_api, mocker, longest_retention, expected_archive_before
+):
+    mocker.patch(
+        "app.celery.nightly_tasks.dao_notifications_table_is_partitioned",
+        return_value=True,
+    )
+    mocker.patch(
+        "app.celery.nightly_tasks.fetch_longest_days_of_retention",
+        return_value=longest_retention,
+    )
+    mock_create = mocker.patch(
+        "app.celery.nightly_tasks.dao_create_notification_partitions",
+        return_value=["notifications_p20211227"],
+    )
+    mock_archive = mocker.patch(
+        "app.celery.nightly_tasks.dao_archive_notification_partitions_before",
+        return_value={"notifications_p20211205": 10},
+    )
+
+    with notify_api.test_request_context(), set_config(
+        notify_api, "NOTIFICATIONS_PARTITION_PRECREATE_DAYS", 3
+    ):
+        maintain_notification_partitions()
+
+    mock_create.assert_called_once_with(until=datetime(2021, 12, 16))
+    mock_archive.assert_called_once_with(expected_archive_before)
+
+
 @freeze_time("2021-12-13T10:00")
 def test_timeout_notifications(mocker, sample_notification):
-    mock_update = mocker.patch("app.celery.nightly_tasks.check_and_queue_callback_task")
+    mock_queue = mocker.patch("app.celery.nightly_tasks.queue_callback_task")
     mock_dao = mocker.patch("app.celery.nightly_tasks.dao_timeout_notifications")
+    service_callback_api = create_service_callback_api(
+        service=sample_notification.service
+    )
 
     mock_dao.side_effect = [
-        [sample_notification],  # first batch to time out
-        [sample_notification],  # second batch
-        [],  # nothing left to time out
+        # first batch to time out
+        [(sample_notification.id, sample_notification.service_id)],
+        # second batch
+        [(sample_notification.id, sample_notification.service_id)],
+        # nothing left to time out
+        [],
     ]
 
     timeout_notifications()
     mock_dao.assert_called_with(datetime.fromisoformat("2021-12-10T10:00"))
-    assert mock_update.mock_calls == [
-        call(sample_notification),
-        call(sample_notification),
-    ]
+    assert [(c.args[0].id, c.args[1].id) for c in mock_queue.call_args_list] == [
+        (sample_notification.id, str(service_callback_api.id))
+    ] * 2
+
+
+def test_timeout_notifications_looks_up_each_services_callback_once(
+    mocker, sample_template
+):
+    mock_queue = mocker.patch("app.celery.nightly_tasks.queue_callback_task")
+    mock_get_callback = mocker.patch(
+        "app.celery.nightly_tasks.SerialisedServiceCallbackApi.from_service_id",
+        wraps=SerialisedServiceCallbackApi.from_service_id,
+    )
+    service_without_callback = create_service(service_name="no callback")
+    template_without_callback = create_template(service=service_without_callback)
+    service_callback_api = create_service_callback_api(service=sample_template.service)
+
+    with freeze_time(utc_now() - timedelta(days=4)):
+        with_callback = [
+            create_notification(sample_template, status=NotificationStatus.SENDING)
+            for _ in range(3)
+        ]
+        for _ in range(2):
+            create_notification(
+                template_without_callback, status=NotificationStatus.SENDING
+            )
+
+    timeout_notifications()
+
+    assert sorted(
+        mock_get_callback.call_args_list, key=lambda c: str(c.args[0])
+    ) == sorted(
+        [
+            call(sample_template.service_id, CallbackType.DELIVERY_STATUS),
+            call(service_without_callback.id, CallbackType.DELIVERY_STATUS),
+        ],
+        key=lambda c: str(c.args[0]),
+    )
+    assert sorted(c.args[0].id for c in mock_queue.call_args_list) == sorted(
+        n.id for n in with_callback
+    )
+    assert all(
+        c.args[1].id == str(service_callback_api.id) for c in mock_queue.call_args_list
+    )
 
 
 def test_delete_inbound_sms_calls_child_task(notify_api, mocker):
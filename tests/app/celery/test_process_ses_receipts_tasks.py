@@ -1,12 +1,15 @@
 import json
-from unittest.mock import ANY
+from unittest.mock import ANY, call
 
+import pytest
 from freezegun import freeze_time
 from sqlalchemy import select
 
 from app import db, encryption
 from app.celery.process_ses_receipts_tasks import (
+    process_queued_ses_results,
     process_ses_results,
+    process_ses_results_batch,
     remove_emails_from_bounce,
     remove_emails_from_complaint,
 )
@@ -18,6 +21,7 @@ from app.celery.test_key_tasks import (
 from app.dao.notifications_dao import get_notification_by_id
 from app.enums import CallbackType, NotificationStatus
 from app.models import Complaint
+from app.serialised_models import SerialisedServiceCallbackApi
 from app.utils import utc_now
 from tests.app.conftest import create_sample_notification
 from tests.app.db import (
@@ -25,6 +29,7 @@ from tests.app.db import (
     create_service_callback_api,
     ses_complaint_callback,
 )
+from tests.conftest import set_config
 
 
 def test_notifications_ses_400_with_invalid_header(client):
@@ -118,14 +123,15 @@ def test_notifications_ses_200_call_process_task(client, mocker):
         "app.notifications.sns_handlers.sns_notification_handler", return_value=data
     )
     json_data = json.dumps(data)
-    response = client.post(
-        path="/notifications/email/ses",
-        data=json_data,
-        headers=[
-            ("Content-Type", "application/json"),
-            ("x-amz-sns-message-type", "Notification"),
-        ],
-    )
+    with set_config(client.application, "SES_RESULTS_BATCHED", False):
+        response = client.post(
+            path="/notifications/email/ses",
+            data=json_data,
+            headers=[
+                ("Content-Type", "application/json"),
+                ("x-amz-sns-message-type", "Notification"),
+            ],
+        )
 
     process_mock.assert_called_once_with(
         [{"Message": {"mail": "baz"}}], queue="notify-internal-tasks"
@@ -133,6 +139,174 @@ def test_notifications_ses_200_call_process_task(client, mocker):
     assert response.status_code == 200
 
 
+def test_notifications_ses_200_queues_result_for_batch(client, mocker):
+    process_mock = mocker.patch(
+        "app.notifications.notifications_ses_callback.process_ses_results.apply_async"
+    )
+    redis_mock = mocker.patch(
+        "app.notifications.notifications_ses_callback.redis_store"
+    )
+    redis_mock.active = True
+    mocker.patch("app.notifications.sns_handlers.validate_sns_cert", return_value=True)
+    data = {"Type": "Notification", "foo": "bar", "Message": {"mail": "baz"}}
+    mocker.patch(
+        "app.notifications.sns_handlers.sns_notification_handler", return_value=data
+    )
+    with set_config(client.application, "SES_RESULTS_BATCHED", True):
+        response = client.post(
+            path="/notifications/email/ses",
+            data=json.dumps(data),
+            headers=[
+                ("Content-Type", "application/json"),
+                ("x-amz-sns-message-type", "Notification"),
+            ],
+        )
+
+    assert response.status_code == 200
+    redis_mock.rpush.assert_called_once_with("ses_results_queue", ANY)
+    assert json.loads(redis_mock.rpush.call_args.args[1]) == {
+        "Message": {"mail": "baz"}
+    }
+    process_mock.assert_not_called()
+
+
+def test_process_queued_ses_results_hands_over_what_is_queued_in_batches(
+    notify_api, mocker
+):
+    redis_mock = mocker.patch("app.celery.process_ses_receipts_tasks.redis_store")
+    redis_mock.llen.return_value = 3
+    queued = [json.dumps({"Message": str(i)}) for i in range(3)]
+    redis_mock.lpop.side_effect = [queued[:2], queued[2:]]
+    batch_mock = mocker.patch(
+        "app.celery.process_ses_receipts_tasks.process_ses_results_batch.apply_async"
+    )
+
+    with set_config(notify_api, "SES_RESULTS_BATCH_SIZE", 2):
+        process_queued_ses_results()
+
+    assert redis_mock.lpop.call_args_list == [
+        call("ses_results_queue", 2),
+        call("ses_results_queue", 1),
+    ]
+    assert batch_mock.call_args_list == [
+        call([[{"Message": "0"}, {"Message": "1"}]], queue="notify-internal-tasks"),
+        call([[{"Message": "2"}]], queue="notify-internal-tasks"),
+    ]
+
+
+def test_process_queued_ses_results_puts_receipts_back_if_batch_cannot_be_queued(
+    notify_api, mocker
+):
+    redis_mock = mocker.patch("app.celery.process_ses_receipts_tasks.redis_store")
+    redis_mock.llen.return_value = 2
+    queued = [json.dumps({"Message": str(i)}) for i in range(2)]
+    redis_mock.lpop.return_value = queued
+    mocker.patch(
+        "app.celery.process_ses_receipts_tasks.process_ses_results_batch.apply_async",
+        side_effect=Exception("EXPECTED"),
+    )
+
+    with pytest.raises(Exception, match="EXPECTED"):
+        process_queued_ses_results()
+
+    redis_mock.rpush.assert_called_once_with("ses_results_queue", *queued)
+
+
+@freeze_time("2017-11-17T12:14:03.646Z")
+def test_process_ses_results_batch(sample_email_template, mocker):
+    send_mock = mocker.patch(
+        "app.celery.service_callback_tasks.send_delivery_status_to_service.apply_async"
+    )
+    get_callback_api = mocker.patch(
+        "app.celery.process_ses_receipts_tasks.SerialisedServiceCallbackApi.from_service_id",
+        wraps=SerialisedServiceCallbackApi.from_service_id,
+    )
+    mock_retry = mocker.patch(
+        "app.celery.process_ses_receipts_tasks.process_ses_results_batch.retry"
+    )
+    create_service_callback_api(
+        service=sample_email_template.service, url="https://original_url.com"
+    )
+    delivered, hard_bounced, soft_bounced, pending_hard_bounced = (
+        create_notification(
+            sample_email_template, reference=reference, status=status, sent_at=utc_now()
+        )
+        for reference, status in [
+            ("ref1", NotificationStatus.SENDING),
+            ("ref2", NotificationStatus.SENDING),
+            ("ref3", NotificationStatus.SENDING),
+            ("ref4", NotificationStatus.PENDING),
+        ]
+    )
+    already_delivered = create_notification(
+        sample_email_template, reference="ref5", status=NotificationStatus.DELIVERED
+    )
+    not_in_db_yet = ses_notification_callback(reference="ref6")
+
+    process_ses_results_batch(
+        [
+            ses_notification_callback(reference="ref1"),
+            ses_hard_bounce_callback(reference="ref2"),
+            ses_soft_bounce_callback(reference="ref3"),
+            ses_hard_bounce_callback(reference="ref4"),
+            ses_hard_bounce_callback(reference="ref5"),
+            not_in_db_yet,
+        ]
+    )
+
+    for notification, status in [
+        (delivered, NotificationStatus.DELIVERED),
+        (hard_bounced, NotificationStatus.PERMANENT_FAILURE),
+        (soft_bounced, NotificationStatus.TEMPORARY_FAILURE),
+        (pending_hard_bounced, NotificationStatus.TEMPORARY_FAILURE),
+        (already_delivered, NotificationStatus.DELIVERED),
+    ]:
+        assert get_notification_by_id(notification.id).status == status
+    assert get_notification_by_id(delivered.id).to == "1"
+    assert send_mock.call_count == 4
+    get_callback_api.assert_called_once_with(
+        sample_email_template.service_id, CallbackType.DELIVERY_STATUS
+    )
+    # only the receipt that might be for a notification not in the db yet is retried
+    mock_retry.assert_called_once_with(
+        args=[[not_in_db_yet]], queue="retry-tasks", expires=ANY
+    )
+
+
+def test_process_ses_results_batch_retries_delivery_receipts_if_update_fails(
+    sample_email_template, mocker
+):
+    # ses_complaint_callback is for the notification with reference ref1
+    create_notification(template=sample_email_template, reference="ref1")
+    create_notification(
+        sample_email_template, reference="ref2", status=NotificationStatus.SENDING
+    )
+    create_service_callback_api(
+        service=sample_email_template.service,
+        callback_type=CallbackType.COMPLAINT,
+    )
+    send_complaint_mock = mocker.patch(
+        "app.celery.process_ses_receipts_tasks.send_complaint_to_service.apply_async"
+    )
+    mocker.patch(
+        "app.dao.notifications_dao.dao_update_notification_statuses",
+        side_effect=Exception("EXPECTED"),
+    )
+    mock_retry = mocker.patch(
+        "app.celery.process_ses_receipts_tasks.process_ses_results_batch.retry"
+    )
+    delivery_receipt = ses_notification_callback(reference="ref2")
+
+    process_ses_results_batch([ses_complaint_callback(), delivery_receipt])
+
+    # the complaint was saved and its callback queued, so only the receipt is retried
+    mock_retry.assert_called_once_with(
+        args=[[delivery_receipt]], queue="retry-tasks", expires=ANY
+    )
+    assert len(db.session.execute(select(Complaint)).scalars().all()) == 1
+    send_complaint_mock.assert_called_once()
+
+
 def test_process_ses_results(sample_email_template):
     create_notification(
         sample_email_template,
@@ -424,6 +598,7 @@ def test_ses_callback_should_send_on_complaint_to_user_callback_api(
         "complaint_id": str(db.session.execute(select(Complaint)).scalars().one().id),
         "notification_id": str(notification.id),
         "reference": None,
+        "service_id": str(notification.service_id),
         "service_callback_api_bearer_token": "some_super_secret",
         "service_callback_api_url": "https://original_url.com",
         "to": "recipient1@example.com",
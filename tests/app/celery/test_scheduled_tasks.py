@@ -5,6 +5,8 @@ from unittest import mock
 from unittest.mock import ANY, MagicMock, call
 
 import pytest
+from celery.exceptions import Retry
+from sqlalchemy.exc import SQLAlchemyError
 
 from app.celery import scheduled_tasks
 from app.celery.scheduled_tasks import (
@@ -622,3 +624,54 @@ def test_process_delivery_receipts_success(mocker):
     dao_update_mock.assert_any_call(list(range(1000, 2000)), True)
     dao_update_mock.assert_any_call(list(range(500)), False)
     processor.retry.assert_not_called()
+
+
+def test_process_delivery_receipts_checkpoints_watermarks_after_updating_db(mocker):
+    redis_mock = mocker.patch("app.celery.scheduled_tasks.redis_store")
+    redis_mock.get.return_value = b'{"group": {"timestamp": 1, "event_ids": {}}}'
+    mocker.patch("app.celery.scheduled_tasks.current_app")
+    cloudwatch_mock = mocker.patch("app.celery.scheduled_tasks.AwsCloudwatchClient")
+
+    def check_delivery_receipts(start, end, watermarks):
+        assert watermarks == {"group": {"timestamp": 1, "event_ids": {}}}
+        watermarks["group"] = {"timestamp": 2, "event_ids": {"a": 2}}
+        return ["delivered"], []
+
+    cloudwatch_mock.return_value.check_delivery_receipts.side_effect = (
+        check_delivery_receipts
+    )
+    dao_update_mock = mocker.patch(
+        "app.celery.scheduled_tasks.dao_update_delivery_receipts",
+        side_effect=lambda *args: redis_mock.set.assert_not_called(),
+    )
+    processor = MagicMock()
+    processor.process_delivery_receipts = process_delivery_receipts
+
+    processor.process_delivery_receipts()
+
+    dao_update_mock.assert_called_once_with(["delivered"], True)
+    redis_mock.set.assert_called_once_with(
+        "delivery-receipts-watermarks",
+        '{"group": {"timestamp": 2, "event_ids": {"a": 2}}}',
+        ex=86400,
+    )
+
+
+def test_process_delivery_receipts_keeps_watermarks_if_db_update_fails(mocker):
+    redis_mock = mocker.patch("app.celery.scheduled_tasks.redis_store")
+    redis_mock.get.return_value = None
+    mocker.patch("app.celery.scheduled_tasks.current_app")
+    cloudwatch_mock = mocker.patch("app.celery.scheduled_tasks.AwsCloudwatchClient")
+    cloudwatch_mock.return_value.check_delivery_receipts.return_value = (
+        ["delivered"],
+        [],
+    )
+    mocker.patch(
+        "app.celery.scheduled_tasks.dao_update_delivery_receipts",
+        side_effect=SQLAlchemyError,
+    )
+
+    with pytest.raises(Retry):
+        process_delivery_receipts()
+
+    redis_mock.set.assert_not_called()
@@ -1,14 +1,20 @@
 import json
 from datetime import datetime
+from unittest.mock import call
 
 import pytest
 import requests_mock
 from freezegun import freeze_time
 
 from app import get_encryption
+from app.celery.process_ses_receipts_tasks import queue_callback_task
 from app.celery.service_callback_tasks import (
+    create_delivery_status_callback_data,
+    flush_delivery_status_callbacks,
     send_complaint_to_service,
+    send_delivery_status_batch_to_service,
     send_delivery_status_to_service,
+    sweep_delivery_status_callbacks,
 )
 from app.enums import CallbackType, NotificationStatus, NotificationType
 from app.utils import DATETIME_FORMAT, utc_now
@@ -19,6 +25,7 @@ from tests.app.db import (
     create_service_callback_api,
     create_template,
 )
+from tests.conftest import set_config_values
 
 encryption = get_encryption()
 
@@ -228,6 +235,256 @@ def _set_up_test_data(notification_type, callback_type):
     return callback_api, template
 
 
+def test_send_delivery_status_to_service_records_callback_against_service(
+    notify_db_session, mocker
+):
+    mock_post = mocker.patch(
+        "app.celery.service_callback_tasks.callback_dispatcher.post"
+    )
+    template = create_template(service=create_service())
+    callback_api = create_service_callback_api(service=template.service)
+    notification = create_notification(template=template)
+
+    send_delivery_status_to_service(
+        notification.id,
+        encrypted_status_update=create_delivery_status_callback_data(
+            notification, callback_api
+        ),
+    )
+
+    assert mock_post.call_args.args[0] == callback_api.url
+    assert mock_post.call_args.kwargs["service_id"] == str(template.service_id)
+
+
+@pytest.fixture
+def batched_callbacks(notify_api, mocker):
+    """
+    Turns on batched callbacks for every service, with the batch lists kept in memory.
+    """
+    lists = {}
+
+    def rpush(key, *values):
+        lists.setdefault(key, []).extend(values)
+        return len(lists[key])
+
+    def lpop(key, count):
+        popped, lists[key] = lists.get(key, [])[:count], lists.get(key, [])[count:]
+        return popped or None
+
+    mock_redis = mocker.patch("app.celery.service_callback_tasks.redis_store")
+    mock_redis.rpush.side_effect = rpush
+    mock_redis.lpop.side_effect = lpop
+    mock_redis.scan_iter.side_effect = lambda match: [
+        key.encode("utf-8") for key, values in lists.items() if values
+    ]
+    mocker.patch(
+        "app.celery.service_callback_tasks.batches_delivery_status_callbacks",
+        return_value=True,
+    )
+    mocker.patch(
+        "app.celery.process_ses_receipts_tasks.batches_delivery_status_callbacks",
+        return_value=True,
+    )
+    with set_config_values(
+        notify_api, {"CALLBACK_BATCH_SIZE": 3, "CALLBACK_BATCH_MAX_WAIT_MS": 500}
+    ):
+        yield lists
+
+
+def test_queue_callback_task_sends_a_full_batch_at_once(
+    notify_db_session, mocker, batched_callbacks
+):
+    mock_flush = mocker.patch(
+        "app.celery.service_callback_tasks.flush_delivery_status_callbacks.apply_async"
+    )
+    mock_send_batch = mocker.patch(
+        "app.celery.service_callback_tasks.send_delivery_status_batch_to_service.apply_async"
+    )
+    mock_send = mocker.patch(
+        "app.celery.process_ses_receipts_tasks.send_delivery_status_to_service.apply_async"
+    )
+    callback_api, template = _set_up_test_data(
+        NotificationType.EMAIL, CallbackType.DELIVERY_STATUS
+    )
+    notifications = [create_notification(template=template) for _ in range(4)]
+
+    for notification in notifications:
+        queue_callback_task(notification, callback_api)
+
+    # the first status in each batch starts the clock on it
+    assert (
+        mock_flush.call_args_list
+        == [call([str(template.service_id)], queue="service-callbacks", countdown=0.5)]
+        * 2
+    )
+    mock_send.assert_not_called()
+    mock_send_batch.assert_called_once()
+    batch = encryption.decrypt(mock_send_batch.call_args.args[0][0])
+    assert batch["service_id"] == str(template.service_id)
+    assert batch["service_callback_api_url"] == callback_api.url
+    assert batch["service_callback_api_bearer_token"] == callback_api.bearer_token
+    assert [
+        status_update["notification_id"] for status_update in batch["status_updates"]
+    ] == [str(notification.id) for notification in notifications[:3]]
+    assert (
+        len(batched_callbacks[f"delivery-status-callbacks-{template.service_id}"]) == 1
+    )
+
+
+def test_flush_delivery_status_callbacks_sends_what_is_waiting(
+    notify_db_session, mocker, batched_callbacks
+):
+    mocker.patch(
+        "app.celery.service_callback_tasks.flush_delivery_status_callbacks.apply_async"
+    )
+    mock_send_batch = mocker.patch(
+        "app.celery.service_callback_tasks.send_delivery_status_batch_to_service.apply_async"
+    )
+    callback_api, template = _set_up_test_data(
+        NotificationType.SMS, CallbackType.DELIVERY_STATUS
+    )
+    batched_callbacks[f"delivery-status-callbacks-{template.service_id}"] = [
+        json.dumps({"notification_id": str(i)}) for i in range(5)
+    ]
+
+    flush_delivery_status_callbacks(str(template.service_id))
+
+    assert [
+        [
+            status_update["notification_id"]
+            for status_update in encryption.decrypt(call.args[0][0])["status_updates"]
+        ]
+        for call in mock_send_batch.call_args_list
+    ] == [["0", "1", "2"], ["3", "4"]]
+    assert batched_callbacks[f"delivery-status-callbacks-{template.service_id}"] == []
+
+
+def test_flush_delivery_status_callbacks_drops_batch_if_callback_api_removed(
+    notify_db_session, mocker, batched_callbacks
+):
+    mock_send_batch = mocker.patch(
+        "app.celery.service_callback_tasks.send_delivery_status_batch_to_service.apply_async"
+    )
+    service = create_service()
+    batched_callbacks[f"delivery-status-callbacks-{service.id}"] = [
+        json.dumps({"notification_id": "1"})
+    ]
+
+    flush_delivery_status_callbacks(str(service.id))
+
+    mock_send_batch.assert_not_called()
+
+
+def test_flush_delivery_status_callbacks_puts_batch_back_if_it_cannot_be_queued(
+    notify_db_session, mocker, batched_callbacks
+):
+    mocker.patch(
+        "app.celery.service_callback_tasks.send_delivery_status_batch_to_service.apply_async",
+        side_effect=Exception("EXPECTED"),
+    )
+    callback_api, template = _set_up_test_data(
+        NotificationType.SMS, CallbackType.DELIVERY_STATUS
+    )
+    waiting = [json.dumps({"notification_id": str(i)}) for i in range(2)]
+    batched_callbacks[f"delivery-status-callbacks-{template.service_id}"] = list(
+        waiting
+    )
+
+    with pytest.raises(Exception, match="EXPECTED"):
+        flush_delivery_status_callbacks(str(template.service_id))
+
+    assert (
+        batched_callbacks[f"delivery-status-callbacks-{template.service_id}"] == waiting
+    )
+
+
+def test_queue_callback_task_leaves_full_batch_for_sweep_if_it_cannot_be_queued(
+    notify_db_session, mocker, batched_callbacks
+):
+    mocker.patch(
+        "app.celery.service_callback_tasks.flush_delivery_status_callbacks.apply_async",
+        side_effect=Exception("EXPECTED"),
+    )
+    mocker.patch(
+        "app.celery.service_callback_tasks.send_delivery_status_batch_to_service.apply_async",
+        side_effect=Exception("EXPECTED"),
+    )
+    callback_api, template = _set_up_test_data(
+        NotificationType.EMAIL, CallbackType.DELIVERY_STATUS
+    )
+    notifications = [create_notification(template=template) for _ in range(3)]
+
+    for notification in notifications:
+        queue_callback_task(notification, callback_api)
+
+    assert [
+        json.loads(status_update)["notification_id"]
+        for status_update in batched_callbacks[
+            f"delivery-status-callbacks-{template.service_id}"
+        ]
+    ] == [str(notification.id) for notification in notifications]
+
+
+def test_sweep_delivery_status_callbacks_flushes_waiting_batches(
+    notify_api, mocker, batched_callbacks
+):
+    mock_flush = mocker.patch(
+        "app.celery.service_callback_tasks.flush_delivery_status_callbacks.apply_async"
+    )
+    batched_callbacks["delivery-status-callbacks-1234"] = ["{}"]
+    batched_callbacks["delivery-status-callbacks-5678"] = ["{}", "{}"]
+
+    sweep_delivery_status_callbacks()
+
+    assert mock_flush.call_args_list == [
+        call(["1234"], queue="service-callbacks"),
+        call(["5678"], queue="service-callbacks"),
+    ]
+
+
+@pytest.mark.parametrize("status_code, retried", [(200, False), (500, True)])
+def test_send_delivery_status_batch_to_service_posts_statuses_as_a_list(
+    notify_db_session, mocker, status_code, retried
+):
+    callback_api, template = _set_up_test_data(
+        NotificationType.EMAIL, CallbackType.DELIVERY_STATUS
+    )
+    notifications = [
+        create_notification(template=template, status=NotificationStatus.DELIVERED)
+        for _ in range(2)
+    ]
+    status_updates = [
+        encryption.decrypt(
+            create_delivery_status_callback_data(notification, callback_api)
+        )
+        for notification in notifications
+    ]
+    mock_retry = mocker.patch(
+        "app.celery.service_callback_tasks.send_delivery_status_batch_to_service.retry"
+    )
+
+    with requests_mock.Mocker() as request_mock:
+        request_mock.post(callback_api.url, json={}, status_code=status_code)
+        send_delivery_status_batch_to_service(
+            encryption.encrypt(
+                {
+                    "service_id": str(template.service_id),
+                    "service_callback_api_url": callback_api.url,
+                    "service_callback_api_bearer_token": callback_api.bearer_token,
+                    "status_updates": status_updates,
+                }
+            )
+        )
+
+    assert request_mock.call_count == 1
+    sent = request_mock.request_history[0].json()
+    assert [item["id"] for item in sent] == [
+        str(notification.id) for notification in notifications
+    ]
+    assert {item["status"] for item in sent} == {NotificationStatus.DELIVERED}
+    assert mock_retry.called == retried
+
+
 def _set_up_data_for_status_update(callback_api, notification):
     data = {
         "notification_id": str(notification.id),
@@ -17,7 +17,8 @@ from app import db, get_encryption
 from app.celery import provider_tasks, tasks
 from app.celery.tasks import (
     __total_sending_limits_for_job_exceeded,
-    _generate_notifications_report,
+    _generate_notifications_reports,
+    generate_notification_reports_task,
     get_recipient_csv_and_template_and_sender_id,
     process_incomplete_job,
     process_incomplete_jobs,
@@ -32,7 +33,12 @@ from app.celery.tasks import (
     send_inbound_sms_to_service,
 )
 from app.config import QueueNames
-from app.dao import jobs_dao, service_email_reply_to_dao, service_sms_sender_dao
+from app.dao import (
+    jobs_dao,
+    notifications_dao,
+    service_email_reply_to_dao,
+    service_sms_sender_dao,
+)
 from app.enums import (
     JobStatus,
     KeyType,
@@ -40,6 +46,7 @@ from app.enums import (
     NotificationType,
     TemplateType,
 )
+from app.errors import TotalRequestsError
 from app.models import Job, Notification
 from app.serialised_models import SerialisedService, SerialisedTemplate
 from app.utils import DATETIME_FORMAT, utc_now
@@ -1145,7 +1152,9 @@ def test_send_inbound_sms_to_service_retries_if_request_throws_unknown(
     )
 
     mocked = mocker.patch("app.celery.tasks.send_inbound_sms_to_service.retry")
-    mocker.patch("app.celery.tasks.request", side_effect=RequestException())
+    mocker.patch(
+        "app.celery.tasks.callback_dispatcher.post", side_effect=RequestException()
+    )
 
     send_inbound_sms_to_service(inbound_sms.id, inbound_sms.service_id)
 
@@ -1710,9 +1719,9 @@ def test_total_sending_limits_exceeded(mocker):
     job_id = "test_job_id"
 
     mock_check_service_limit = mocker.patch(
-        "app.celery.tasks.check_service_over_total_message_limit"
+        "app.celery.tasks.check_service_over_total_message_limit",
+        side_effect=TotalRequestsError(1000),
     )
-    mock_check_service_limit.return_value = 800
 
     mock_utc_now = mocker.patch("app.celery.tasks.utc_now")
     mock_utc_now.return_value = datetime(2024, 11, 10, 12, 0, 0)
@@ -1721,6 +1730,7 @@ def test_total_sending_limits_exceeded(mocker):
 
     result = __total_sending_limits_for_job_exceeded(mock_service, mock_job, job_id)
     assert result is True
+    mock_check_service_limit.assert_called_once_with(KeyType.NORMAL, mock_service, 300)
 
     assert mock_job.job_status == "sending limits exceeded"
     assert mock_job.processing_finished == datetime(2024, 11, 10, 12, 0, 0)
@@ -1796,93 +1806,103 @@ def test_save_api_email_or_sms_sqlalchemy_error_with_max_retries():
         assert "Max retry failed" in mock_exception.call_args[0][0]
 
 
-def get_mock_notification():
-    notif = MagicMock()
-    notif.job_id = "job-id"
-    notif.service_id = "service-id"
-    notif.job_row_number = 5
-    notif.serialize_for_csv.return_value = {
-        "recipient": "1234567890",
-        "template_name": "Test Template",
-        "created_by_name": "Tester",
-        "carrier": "TestCarrier",
-        "status": "delivered",
-        "created_at": "2025-08-10T12:00:00",
-        "job_name": "Job A",
-        "provider_response": "Success",
-    }
-    return notif
-
-
-@patch("app.dao.notifications_dao.get_notifications_for_service")
-@patch("app.aws.s3.get_personalisation_from_s3")
-@patch("app.aws.s3.get_phone_number_from_s3")
-@patch("app.celery.tasks.get_csv_location")
-@patch("app.aws.s3.s3upload")
-@patch("app.aws.s3.delete_s3_object")
-@patch("app.celery.tasks.current_app")
-def test_generate_notifications_report_normal_case(
-    mock_current_app,
-    mock_delete,
-    mock_upload,
-    mock_get_csv_location,
-    mock_get_phone_number,
-    mock_get_personalisation,
-    mock_get_notifications,
-    notify_api,
-):
+class FakeMultipartUpload(io.BytesIO):
+    uploads = {}
+
+    def __init__(self, bucket_name, file_location):
+        super().__init__()
+        self.file_location = file_location
 
-    mock_get_notifications.return_value.items = [get_mock_notification()]
-    mock_get_phone_number.return_value = "1234567890"
-    mock_get_personalisation.return_value = {"name": "John"}
-    mock_get_csv_location.return_value = (
-        "my-bucket",
-        "some/file/location.csv",
-        "access",
-        "sekret",
-        "region",
+    def __exit__(self, exc_type, exc_value, traceback):
+        if exc_type is None:
+            self.uploads[self.file_location] = self.getvalue().decode("utf-8")
+        self.close()
+
+
+@pytest.fixture
+def mock_report_upload(mocker):
+    FakeMultipartUpload.uploads = {}
+    mocker.patch("app.celery.tasks.s3.S3MultipartUpload", FakeMultipartUpload)
+    mocker.patch(
+        "app.celery.tasks.get_csv_location",
+        side_effect=lambda service_id, report_id: (
+            "bucket",
+            f"{service_id}-service-notify/{report_id}.csv",
+            "access",
+            "secret",
+            "region",
+        ),
     )
+    return FakeMultipartUpload.uploads
 
-    mock_current_app.config = {
-        "CSV_UPLOAD_BUCKET": {"bucket": "my-bucket", "region": "region"}
+
+@freeze_time("2025-08-12 16:00")
+def test_generate_notifications_reports_writes_every_window_in_one_pass(
+    sample_template, sample_job, mock_report_upload, mocker
+):
+    mock_get_phone_number = mocker.patch(
+        "app.aws.s3.get_phone_number_from_s3", return_value="15555555555"
+    )
+    mock_delete = mocker.patch("app.aws.s3.delete_s3_object")
+    mock_stream = mocker.patch(
+        "app.dao.notifications_dao.dao_stream_notifications_for_report",
+        wraps=notifications_dao.dao_stream_notifications_for_report,
+    )
+    service_id = sample_template.service_id
+    create_notification(job=sample_job, job_row_number=0, status="delivered")
+    create_notification(sample_template, created_at=utc_now() - timedelta(days=2))
+    create_notification(sample_template, created_at=utc_now() - timedelta(days=6))
+    create_notification(sample_template, created_at=utc_now() - timedelta(days=10))
+    create_notification(sample_template, key_type=KeyType.TEST)
+
+    _generate_notifications_reports(service_id)
+
+    mock_stream.assert_called_once_with(service_id, 7, 20000)
+    mock_get_phone_number.assert_called_once_with(service_id, sample_job.id, 0)
+    assert not mock_delete.called
+
+    reports = {
+        location.split("/")[1]: csv_data.splitlines()
+        for location, csv_data in mock_report_upload.items()
+    }
+    assert reports.keys() == {
+        "1-day-report.csv",
+        "3-day-report.csv",
+        "5-day-report.csv",
+        "7-day-report.csv",
     }
+    assert reports["1-day-report.csv"][0] == (
+        "Phone Number,Template,Sent By,Carrier,Status,Time,Batch File,Carrier Response"
+    )
+    assert reports["1-day-report.csv"][1].startswith("15555555555,sms Template Name,")
+    assert {name: len(report) - 1 for name, report in reports.items()} == {
+        "1-day-report.csv": 1,
+        "3-day-report.csv": 2,
+        "5-day-report.csv": 2,
+        "7-day-report.csv": 3,
+    }
+    # newest first, so the shorter reports are the start of the longer ones
+    assert reports["7-day-report.csv"][:3] == reports["3-day-report.csv"]
+
 
-    _generate_notifications_report("service-id", "report-id", 7)
+def test_generate_notifications_reports_deletes_reports_with_no_notifications(
+    sample_service, mock_report_upload, mocker
+):
+    mock_delete = mocker.patch("app.aws.s3.delete_s3_object")
 
-    mock_get_personalisation.assert_called_once()
-    mock_get_phone_number.assert_called_once()
+    _generate_notifications_reports(sample_service.id)
 
-    mock_upload.assert_called_once()
-    args, kwargs = mock_upload.call_args
-    assert kwargs["bucket_name"] == "my-bucket"
-    assert kwargs["file_location"] == "some/file/location.csv"
-    assert isinstance(kwargs["filedata"], io.BytesIO)
+    assert mock_report_upload == {}
+    assert mock_delete.call_args_list == [
+        call(f"{sample_service.id}-service-notify/{limit_days}-day-report.csv")
+        for limit_days in [1, 3, 5, 7]
+    ]
 
 
-@patch("app.aws.s3.delete_s3_object")
-@patch("app.celery.tasks.get_csv_location")
-@patch("app.dao.notifications_dao.get_notifications_for_service")
-@patch("app.celery.tasks.current_app")
-def test_generate_notifications_report_no_notifications(
-    mock_current_app,
-    mock_get_notifications,
-    mock_get_csv_location,
-    mock_delete_s3,
-    notify_api,
-):
-    mock_get_notifications.return_value.items = []
-    mock_get_csv_location.return_value = (
-        "bucket",
-        "service-id-service-notify/report-id.csv",
-        "access",
-        "secret",
-        "region",
-    )
+def test_generate_notification_reports_task(sample_service, mocker):
+    mock_generate = mocker.patch("app.celery.tasks._generate_notifications_reports")
+    create_service(service_name="inactive", active=False)
 
-    _generate_notifications_report("service-id", "report-id", 7)
+    generate_notification_reports_task()
 
-    mock_current_app.logger.info.assert_any_call("SKIP service-id")
-    mock_delete_s3.assert_called_once_with("service-id-service-notify/report-id.csv")
-    mock_current_app.logger.info.assert_any_call(
-        "Deleted stale report service-id-service-notify/report-id.csv - no new data"
-    )
+    mock_generate.assert_called_once_with(sample_service.id)
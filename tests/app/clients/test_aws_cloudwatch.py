@@ -1,7 +1,7 @@
 import json
 
 # import os
-from datetime import datetime, timedelta
+from datetime import UTC, datetime, timedelta
 from unittest.mock import MagicMock, patch
 
 import pytest
@@ -199,7 +199,8 @@ def test_get_log_with_pagination(mock_client):
         {"events": [{"message": "msg2"}]},
     ]
 
-    start = datetime.utcnow() - timedelta(minutes=5)
+    # short enough to be read in one slice
+    start = datetime.utcnow() - timedelta(seconds=10)
     end = datetime.utcnow()
 
     logs = client._get_log("log-group", start, end)
@@ -231,8 +232,98 @@ def test_get_receipts():
 
     result = client._get_receipts("group", datetime.utcnow(), datetime.utcnow())
     assert len(result) == 1
-    event = json.loads(list(result)[0])
-    assert event["status"] == "DELIVERED"
+    assert result[0]["status"] == "DELIVERED"
+
+
+def _receipt_event(event_id, timestamp):
+    return {
+        "eventId": event_id,
+        "timestamp": timestamp,
+        "message": json.dumps(
+            {
+                "notification": {"messageId": event_id, "timestamp": "t"},
+                "status": "DELIVERED",
+                "delivery": {"providerResponse": "Phone accepted msg"},
+            }
+        ),
+    }
+
+
+class FakeLogsClient:
+    def __init__(self, events):
+        self.events = events
+        self.start_times = []
+
+    def filter_log_events(self, logGroupName, startTime, endTime, nextToken=None):
+        self.start_times.append(startTime)
+        events = [e for e in self.events if startTime <= e["timestamp"] <= endTime]
+        # one event per page
+        page = int(nextToken or 0)
+        response = {"events": events[page : page + 1]}
+        if page + 1 < len(events):
+            response["nextToken"] = str(page + 1)
+        return response
+
+
+def test_get_receipts_without_watermark_reads_from_start_and_sets_watermark():
+    end = datetime(2025, 1, 1, 12, tzinfo=UTC)
+    now_ms = int(end.timestamp() * 1000)
+    client = AwsCloudwatchClient()
+    client._client = FakeLogsClient(
+        [_receipt_event("a", now_ms - 300_000), _receipt_event("b", now_ms - 1000)]
+    )
+    watermarks = {}
+
+    result = client._get_receipts("group", end - timedelta(minutes=3), end, watermarks)
+
+    assert [receipt["notification.messageId"] for receipt in result] == ["b"]
+    assert watermarks == {
+        "group": {"timestamp": now_ms - 1000, "event_ids": {"b": now_ms - 1000}}
+    }
+
+
+def test_get_receipts_carries_on_from_watermark_without_rereading_events():
+    end = datetime(2025, 1, 1, 12, tzinfo=UTC)
+    now_ms = int(end.timestamp() * 1000)
+    client = AwsCloudwatchClient()
+    client._client = FakeLogsClient(
+        [
+            _receipt_event("old", now_ms - 3_600_000),
+            _receipt_event("seen", now_ms - 600_000),
+            _receipt_event("new", now_ms - 590_000),
+            _receipt_event("newer", now_ms - 1000),
+        ]
+    )
+    # last run was ten minutes ago
+    watermarks = {
+        "group": {
+            "timestamp": now_ms - 600_000,
+            "event_ids": {"seen": now_ms - 600_000},
+        }
+    }
+
+    result = client._get_receipts("group", end - timedelta(minutes=3), end, watermarks)
+
+    assert client._client.start_times[0] == now_ms - 600_000 - 60_000
+    assert [receipt["notification.messageId"] for receipt in result] == ["new", "newer"]
+    assert watermarks["group"] == {
+        "timestamp": now_ms - 1000,
+        "event_ids": {"newer": now_ms - 1000},
+    }
+
+
+def test_get_receipts_catches_up_at_most_a_day():
+    end = datetime(2025, 1, 1, 12, tzinfo=UTC)
+    now_ms = int(end.timestamp() * 1000)
+    client = AwsCloudwatchClient()
+    client._client = FakeLogsClient([])
+    watermarks = {"group": {"timestamp": now_ms - 7 * 86_400_000, "event_ids": {}}}
+
+    assert client._get_receipts("group", end, end, watermarks) == []
+
+    assert client._client.start_times[0] == now_ms - 86_400_000
+    # nothing new, so carry on from the same place next time
+    assert watermarks["group"]["timestamp"] == now_ms - 7 * 86_400_000
 
 
 # @patch("app.clients.cloudwatch.aws_cloudwatch.current_app")
@@ -243,8 +334,9 @@ def test_check_delivery_receipts(mock_cloud_config):
     mock_cloud_config.ses_domain_arn = (
         "arn:aws:ses:us-north-1:123456789012:identity/example.com"
     )
+    failure = {"delivery.providerResponse": "Invalid phone number"}
     client._get_receipts = MagicMock(
-        side_effect=[{"delivered1", "delivered2"}, {"failed1"}]
+        side_effect=[["delivered1", "delivered2"], [failure]]
     )
 
     start = datetime.utcnow() - timedelta(minutes=10)
@@ -252,5 +344,88 @@ def test_check_delivery_receipts(mock_cloud_config):
 
     delivered, failed = client.check_delivery_receipts(start, end)
 
-    assert delivered == {"delivered1", "delivered2"}
-    assert failed == {"failed1"}
+    assert delivered == ["delivered1", "delivered2"]
+    assert failed == [failure]
+
+
+@patch("app.clients.cloudwatch.aws_cloudwatch.cloud_config")
+def test_check_delivery_receipts_raises_if_no_quota_left(mock_cloud_config):
+    client = AwsCloudwatchClient()
+    mock_cloud_config.ses_domain_arn = (
+        "arn:aws:ses:us-north-1:123456789012:identity/example.com"
+    )
+    client._get_receipts = MagicMock(
+        side_effect=[[], [{"delivery.providerResponse": "No quota left for account"}]]
+    )
+
+    with pytest.raises(Exception, match="No Quota Left"):
+        client.check_delivery_receipts(datetime.utcnow(), datetime.utcnow())
+
+
+def test_get_log_reads_window_in_slices_without_gaps_or_overlaps():
+    end = datetime(2025, 1, 1, 12, tzinfo=UTC)
+    end_ms = int(end.timestamp() * 1000)
+    start_ms = end_ms - 600_000
+    # 600,001 inclusive milliseconds in 16 slices
+    slice_starts = list(range(start_ms, end_ms + 1, 37_501))
+    # an event at either end of every slice
+    timestamps = sorted(
+        slice_starts + [slice_start - 1 for slice_start in slice_starts[1:]] + [end_ms]
+    )
+    client = AwsCloudwatchClient()
+    client._client = FakeLogsClient(
+        [_receipt_event(str(timestamp), timestamp) for timestamp in timestamps]
+    )
+
+    events = client._get_log("group", end - timedelta(minutes=10), end)
+
+    assert sorted(set(client._client.start_times)) == slice_starts
+    assert len(slice_starts) == 16
+    assert [event["timestamp"] for event in events] == timestamps
+
+
+def test_get_log_window_shorter_than_minimum_slice_is_read_at_once():
+    end = datetime(2025, 1, 1, 12, tzinfo=UTC)
+    client = AwsCloudwatchClient()
+    client._client = FakeLogsClient([])
+
+    client._get_log("group", end - timedelta(seconds=14), end)
+
+    assert client._client.start_times == [int(end.timestamp() * 1000) - 14_000]
+
+
+def test_get_log_retries_just_the_slice_that_failed(mocker):
+    sleep = mocker.patch("app.clients.cloudwatch.aws_cloudwatch.gevent.sleep")
+    end = datetime(2025, 1, 1, 12, tzinfo=UTC)
+    end_ms = int(end.timestamp() * 1000)
+    fake_logs_client = FakeLogsClient([_receipt_event("a", end_ms)])
+    failures = [Exception("ThrottlingException")]
+
+    def filter_log_events(**kwargs):
+        if kwargs["endTime"] == end_ms and failures:
+            raise failures.pop()
+        return fake_logs_client.filter_log_events(**kwargs)
+
+    client = AwsCloudwatchClient()
+    client._client = MagicMock()
+    client._client.filter_log_events.side_effect = filter_log_events
+
+    events = client._get_log("group", end - timedelta(seconds=30), end)
+
+    assert [event["eventId"] for event in events] == ["a"]
+    # two slices, and the second read twice
+    assert client._client.filter_log_events.call_count == 3
+    sleep.assert_called_once_with(1)
+
+
+def test_get_log_raises_if_a_slice_keeps_failing(mocker):
+    mocker.patch("app.clients.cloudwatch.aws_cloudwatch.gevent.sleep")
+    client = AwsCloudwatchClient()
+    client._client = MagicMock()
+    client._client.filter_log_events.side_effect = Exception("ThrottlingException")
+    end = datetime(2025, 1, 1, 12, tzinfo=UTC)
+
+    with pytest.raises(Exception, match="ThrottlingException"):
+        client._get_log("group", end - timedelta(seconds=10), end)
+
+    assert client._client.filter_log_events.call_count == 3
@@ -41,3 +41,23 @@ def test_send_sms_returns_raises_error_if_there_is_no_valid_number_is_found(
         with pytest.raises(ValueError) as excinfo:
             aws_sns_client.send_sms(to, content, reference)
         assert "No valid numbers found for SMS delivery" in str(excinfo.value)
+
+
+@pytest.mark.parametrize(
+    "to, expected_phone_number",
+    [
+        ("+12025550104", "+12025550104"),
+        ("12025550104", "+12025550104"),
+        ("+1 (202) 555-0104", "+12025550104"),
+        ("+447123456789", "+447123456789"),
+    ],
+)
+def test_send_sms_formats_phone_number(notify_api, mocker, to, expected_phone_number):
+    with notify_api.app_context():
+        aws_sns_client = get_aws_sns_client()
+        aws_sns_client.init_app(current_app)
+        boto_mock = mocker.patch.object(aws_sns_client, "_client", create=True)
+        aws_sns_client.send_sms(to, "foo", "foo")
+        assert (
+            boto_mock.publish.call_args.kwargs["PhoneNumber"] == expected_phone_number
+        )
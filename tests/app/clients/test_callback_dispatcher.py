@@ -0,0 +1,165 @@
+import json
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from threading import Thread
+
+import pytest
+from requests import ConnectionError
+
+from app.clients.callback_dispatcher import (
+    CallbackDispatcher,
+    CircuitOpenError,
+    HostBusyError,
+)
+from tests.conftest import set_config_values
+
+
+class CallbackServer(ThreadingHTTPServer):
+    def __init__(self):
+        super().__init__(("127.0.0.1", 0), CallbackHandler)
+        self.status_code = 200
+        self.requests = []
+        self.connections = set()
+
+    @property
+    def url(self):
+        return f"http://127.0.0.1:{self.server_address[1]}/callback"
+
+
+class CallbackHandler(BaseHTTPRequestHandler):
+    # so connections are kept open between requests
+    protocol_version = "HTTP/1.1"
+
+    def do_POST(self):
+        body = self.rfile.read(int(self.headers["Content-Length"]))
+        self.server.requests.append((dict(self.headers), json.loads(body)))
+        self.server.connections.add(self.client_address)
+        self.send_response(self.server.status_code)
+        self.send_header("Content-Length", "0")
+        self.end_headers()
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def callback_server():
+    server = CallbackServer()
+    Thread(target=server.serve_forever, daemon=True).start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.fixture
+def dispatcher(notify_api):
+    with set_config_values(
+        notify_api,
+        {
+            "CALLBACK_MAX_CONNECTIONS_PER_HOST": 2,
+            "CALLBACK_HOST_BUSY_TIMEOUT": 0.1,
+            "CALLBACK_CIRCUIT_BREAKER_FAILURES": 3,
+            "CALLBACK_CIRCUIT_BREAKER_RESET_SECONDS": 60,
+        },
+    ):
+        yield CallbackDispatcher()
+
+
+def test_post_reuses_connection_to_host(dispatcher, callback_server):
+    for i in range(3):
+        response = dispatcher.post(
+            callback_server.url, {"id": i}, "some-token", service_id="service-1"
+        )
+        assert response.status_code == 200
+
+    assert [body for headers, body in callback_server.requests] == [
+        {"id": 0},
+        {"id": 1},
+        {"id": 2},
+    ]
+    headers = callback_server.requests[0][0]
+    assert headers["Authorization"] == "Bearer some-token"
+    assert headers["Content-Type"] == "application/json"
+    assert len(callback_server.connections) == 1
+
+
+def test_post_records_metrics_per_service(dispatcher, callback_server):
+    dispatcher.post(callback_server.url, {}, "token", service_id="service-1")
+    dispatcher.post(callback_server.url, {}, "token", service_id="service-2")
+    callback_server.status_code = 500
+    dispatcher.post(callback_server.url, {}, "token", service_id="service-2")
+
+    metrics = dispatcher.get_metrics()
+
+    assert {
+        service_id: (service["requests"], service["errors"])
+        for service_id, service in metrics["services"].items()
+    } == {"service-1": (1, 0), "service-2": (2, 1)}
+    assert metrics["services"]["service-1"]["latency_seconds_max"] > 0
+    host = callback_server.url.removesuffix("/callback")
+    assert metrics["hosts"] == {host: {"state": "closed", "consecutive_failures": 1}}
+
+
+def test_circuit_opens_after_consecutive_failures(dispatcher, callback_server):
+    callback_server.status_code = 503
+    for _ in range(3):
+        assert dispatcher.post(callback_server.url, {}, "token").status_code == 503
+
+    with pytest.raises(CircuitOpenError):
+        dispatcher.post(callback_server.url, {}, "token")
+
+    assert len(callback_server.requests) == 3
+    assert dispatcher.get_metrics()["services"]["None"]["rejected"] == 1
+
+
+def test_circuit_is_per_host(dispatcher, callback_server):
+    dead_url = "http://127.0.0.1:1/callback"
+    for _ in range(3):
+        with pytest.raises(ConnectionError):
+            dispatcher.post(dead_url, {}, "token")
+
+    with pytest.raises(CircuitOpenError):
+        dispatcher.post(dead_url, {}, "token")
+    assert dispatcher.post(callback_server.url, {}, "token").status_code == 200
+
+
+def test_circuit_lets_one_request_through_after_reset_period(
+    notify_api, dispatcher, callback_server
+):
+    callback_server.status_code = 500
+    for _ in range(3):
+        dispatcher.post(callback_server.url, {}, "token")
+
+    notify_api.config["CALLBACK_CIRCUIT_BREAKER_RESET_SECONDS"] = 0
+    # the test request fails, so the circuit opens again
+    assert dispatcher.post(callback_server.url, {}, "token").status_code == 500
+    notify_api.config["CALLBACK_CIRCUIT_BREAKER_RESET_SECONDS"] = 60
+    with pytest.raises(CircuitOpenError):
+        dispatcher.post(callback_server.url, {}, "token")
+
+    notify_api.config["CALLBACK_CIRCUIT_BREAKER_RESET_SECONDS"] = 0
+    callback_server.status_code = 200
+    assert dispatcher.post(callback_server.url, {}, "token").status_code == 200
+    notify_api.config["CALLBACK_CIRCUIT_BREAKER_RESET_SECONDS"] = 60
+    # and now it's closed again
+    assert dispatcher.post(callback_server.url, {}, "token").status_code == 200
+    assert len(callback_server.requests) == 6
+
+
+def test_client_errors_do_not_trip_circuit(dispatcher, callback_server):
+    callback_server.status_code = 400
+    for _ in range(5):
+        assert dispatcher.post(callback_server.url, {}, "token").status_code == 400
+
+
+def test_post_gives_up_if_all_connections_to_host_are_busy(dispatcher, callback_server):
+    host = dispatcher._get_host(callback_server.url.removesuffix("/callback"))
+    # two callbacks already in progress
+    host.slots.acquire()
+    host.slots.acquire()
+
+    with pytest.raises(HostBusyError):
+        dispatcher.post(callback_server.url, {}, "token")
+
+    host.slots.release()
+    assert dispatcher.post(callback_server.url, {}, "token").status_code == 200
+    assert len(callback_server.requests) == 1
@@ -10,6 +10,7 @@ from sqlalchemy import delete, select
 from sqlalchemy.orm.session import make_transient
 
 from app import db
+from app.clients.callback_dispatcher import callback_dispatcher
 from app.dao.api_key_dao import save_model_api_key
 from app.dao.invited_user_dao import save_invited_user
 from app.dao.jobs_dao import dao_create_job
@@ -68,6 +69,13 @@ def rmock():
         yield rmock
 
 
+@pytest.fixture(autouse=True)
+def reset_callback_dispatcher():
+    # so one test's failing callbacks can't trip a circuit breaker for the next
+    yield
+    callback_dispatcher.reset()
+
+
 def create_sample_notification(
     notify_db,
     notify_db_session,
@@ -21,6 +21,7 @@ from app.dao.notifications_dao import (
     dao_get_notification_count_for_service_message_ratio,
     dao_get_notification_history_by_reference,
     dao_get_notifications_by_recipient_or_reference,
+    dao_stream_notifications_by_ids,
     dao_timeout_notifications,
     dao_update_delivery_receipts,
     dao_update_notification,
@@ -885,7 +886,12 @@ def test_dao_timeout_notifications(sample_template):
 
     temporary_failure_notifications = dao_timeout_notifications(utc_now())
 
-    assert len(temporary_failure_notifications) == 2
+    assert sorted(temporary_failure_notifications) == sorted(
+        [
+            (sending.id, sample_template.service_id),
+            (pending.id, sample_template.service_id),
+        ]
+    )
     assert db.session.get(Notification, created.id).status == NotificationStatus.CREATED
     assert (
         db.session.get(Notification, sending.id).status
@@ -921,6 +927,29 @@ def test_dao_timeout_notifications_only_updates_for_older_notifications(
     assert db.session.get(Notification, pending.id).status == NotificationStatus.PENDING
 
 
+def test_dao_timeout_notifications_updates_at_most_limit_notifications(
+    sample_template,
+):
+    with freeze_time(utc_now() - timedelta(minutes=2)):
+        for _ in range(3):
+            create_notification(sample_template, status=NotificationStatus.SENDING)
+
+    assert len(dao_timeout_notifications(utc_now(), limit=2)) == 2
+    assert len(dao_timeout_notifications(utc_now(), limit=2)) == 1
+    assert dao_timeout_notifications(utc_now(), limit=2) == []
+
+
+def test_dao_stream_notifications_by_ids(sample_template):
+    notifications = [create_notification(sample_template) for _ in range(3)]
+    create_notification(sample_template)
+
+    streamed = dao_stream_notifications_by_ids(
+        [n.id for n in notifications], chunk_size=2
+    )
+
+    assert sorted(n.id for n in streamed) == sorted(n.id for n in notifications)
+
+
 def test_should_return_notifications_excluding_jobs_by_default(
     sample_template, sample_job, sample_api_key
 ):
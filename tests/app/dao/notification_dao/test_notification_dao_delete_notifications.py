@@ -1,11 +1,13 @@
 import uuid
 from datetime import datetime, timedelta
 
+import pytest
 from freezegun import freeze_time
 from sqlalchemy import func, select
 
 from app import db
 from app.dao.notifications_dao import (
+    _next_archive_batch_size,
     insert_notification_history_delete_notifications,
     move_notifications_to_notification_history,
 )
@@ -127,6 +129,51 @@ def test_move_notifications_keeps_calling_until_no_more_to_delete_and_then_retur
     assert mock_insert.call_count == 4
 
 
+def test_move_notifications_adapts_batch_size_to_how_long_batches_take(mocker):
+    mock_insert = mocker.patch(
+        "app.dao.notifications_dao.insert_notification_history_delete_notifications",
+        side_effect=[10000, 20000, 10000, 3, 0],
+    )
+    # each batch is timed with two calls to time()
+    mocker.patch(
+        "app.dao.notifications_dao.time",
+        side_effect=[0, 5, 100, 140, 200, 220, 300, 300.1, 400, 400],
+    )
+
+    result = move_notifications_to_notification_history(
+        NotificationType.SMS, uuid.uuid4(), datetime(2021, 1, 1), qry_limit=10000
+    )
+
+    assert result == 40003
+    assert [call.kwargs["qry_limit"] for call in mock_insert.call_args_list] == [
+        # fast, so doubled
+        10000,
+        # slow, so halved
+        20000,
+        # on target, so unchanged
+        10000,
+        # short batches don't change the size
+        10000,
+        10000,
+    ]
+
+
+@pytest.mark.parametrize(
+    "batch_size, elapsed_seconds, expected_batch_size",
+    [
+        (50000, 20, 50000),
+        (50000, 40, 25000),
+        (50000, 400, 25000),
+        (50000, 10, 100000),
+        (50000, 0, 100000),
+        (80000, 10, 100000),
+        (1500, 40, 1000),
+    ],
+)
+def test_next_archive_batch_size(batch_size, elapsed_seconds, expected_batch_size):
+    assert _next_archive_batch_size(batch_size, elapsed_seconds) == expected_batch_size
+
+
 def test_move_notifications_only_moves_for_given_notification_type(sample_service):
     delete_time = datetime(2020, 6, 1, 12)
     one_second_before = delete_time - timedelta(seconds=1)
@@ -0,0 +1,216 @@
+import uuid
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy import select, text, update
+from sqlalchemy.exc import IntegrityError
+
+from app import db
+from app.dao.notifications_dao import (
+    dao_archive_notification_partition,
+    dao_archive_notification_partitions_before,
+    dao_create_notification_partitions,
+    dao_get_detached_notification_partitions,
+    dao_get_notification_partitions,
+    dao_notifications_table_is_partitioned,
+)
+from app.enums import KeyType
+from app.models import Notification, NotificationHistory, NotificationId
+from app.utils import get_midnight_in_utc, utc_now
+from tests.app.db import create_job, create_notification
+
+
+def _newest_partition_end():
+    return dao_get_notification_partitions()[-1][2]
+
+
+def _notification_ids():
+    return set(db.session.execute(select(NotificationId.id)).scalars())
+
+
+def test_notifications_table_is_partitioned_by_day(notify_db_session):
+    assert dao_notifications_table_is_partitioned()
+
+    partitions = dao_get_notification_partitions()
+    assert partitions[0][0] == "notifications_legacy"
+    assert partitions[0][1] is None
+    for name, range_start, range_end, detach_pending in partitions[1:]:
+        assert name == f"notifications_p{range_start:%Y%m%d}"
+        assert range_end - range_start == timedelta(days=1)
+        assert not detach_pending
+    assert _newest_partition_end() > utc_now()
+
+
+def test_notification_ids_tracks_inserts_updates_and_deletes(sample_template):
+    notification = create_notification(template=sample_template)
+    assert _notification_ids() == {notification.id}
+
+    # moves the row into the legacy partition
+    db.session.execute(
+        update(Notification)
+        .where(Notification.id == notification.id)
+        .values(created_at=datetime(2020, 1, 1))
+    )
+    db.session.commit()
+    assert _notification_ids() == {notification.id}
+
+    db.session.delete(notification)
+    db.session.commit()
+    assert _notification_ids() == set()
+
+
+def test_notification_id_is_unique_across_partitions(sample_template):
+    notification = create_notification(template=sample_template)
+
+    db.session.add(
+        Notification(
+            id=notification.id,
+            to="1",
+            service_id=notification.service_id,
+            template_id=notification.template_id,
+            template_version=notification.template_version,
+            key_type=KeyType.NORMAL,
+            notification_type=notification.notification_type,
+            # same id, but a created_at that lands in a different partition
+            created_at=datetime(2020, 1, 1),
+        )
+    )
+    with pytest.raises(IntegrityError, match="notifications_pkey"):
+        db.session.commit()
+    db.session.rollback()
+
+
+def test_job_row_number_is_unique_across_partitions(sample_job):
+    create_notification(job=sample_job, job_row_number=1)
+
+    with pytest.raises(IntegrityError, match="uq_notifications_job_row_number"):
+        create_notification(
+            job=sample_job, job_row_number=1, created_at=datetime(2020, 1, 1)
+        )
+    db.session.rollback()
+
+    create_notification(job=create_job(sample_job.template), job_row_number=1)
+
+
+def test_insert_past_the_newest_partition_fails(sample_template):
+    with pytest.raises(IntegrityError, match="no partition of relation"):
+        create_notification(
+            template=sample_template,
+            created_at=_newest_partition_end() + timedelta(hours=1),
+        )
+    db.session.rollback()
+
+
+def test_create_notification_partitions_is_idempotent(notify_db_session):
+    newest_partition_end = _newest_partition_end()
+
+    assert dao_create_notification_partitions(until=newest_partition_end) == []
+
+    created = dao_create_notification_partitions(
+        until=newest_partition_end + timedelta(hours=1)
+    )
+    assert created == [f"notifications_p{newest_partition_end:%Y%m%d}"]
+    assert _newest_partition_end() == newest_partition_end + timedelta(days=1)
+
+    assert dao_create_notification_partitions(until=_newest_partition_end()) == []
+
+    dao_archive_notification_partition(created[0])
+
+
+def test_archive_notification_partition(sample_template):
+    range_start = _newest_partition_end()
+    (partition_name,) = dao_create_notification_partitions(
+        until=range_start + timedelta(hours=1)
+    )
+    archived_notification = create_notification(
+        template=sample_template, created_at=range_start
+    )
+    archived_notification_id = archived_notification.id
+    create_notification(
+        template=sample_template, created_at=range_start, key_type=KeyType.TEST
+    )
+    kept_notification = create_notification(template=sample_template)
+
+    assert dao_archive_notification_partition(partition_name) == 1
+
+    assert partition_name not in [p[0] for p in dao_get_notification_partitions()]
+    assert not db.session.execute(
+        text("SELECT to_regclass(:name)"), {"name": partition_name}
+    ).scalar()
+    assert db.session.execute(select(Notification.id)).scalars().all() == [
+        kept_notification.id
+    ]
+    assert _notification_ids() == {kept_notification.id}
+    # test key notifications are not kept in history
+    assert db.session.execute(select(NotificationHistory.id)).scalars().all() == [
+        archived_notification_id
+    ]
+
+
+def test_archive_notification_partitions_before_finishes_partitions_left_detached(
+    sample_template,
+):
+    range_start = _newest_partition_end()
+    (partition_name,) = dao_create_notification_partitions(
+        until=range_start + timedelta(hours=1)
+    )
+    create_notification(template=sample_template, created_at=range_start)
+    kept_notification = create_notification(template=sample_template)
+    # the task died after detaching the partition, before it was dropped
+    db.session.execute(
+        text(f"ALTER TABLE notifications DETACH PARTITION {partition_name}")
+    )
+    db.session.commit()
+    assert dao_get_detached_notification_partitions() == [partition_name]
+
+    archived = dao_archive_notification_partitions_before(datetime(2000, 1, 1))
+
+    assert archived == {partition_name: 0}
+    assert dao_get_detached_notification_partitions() == []
+    assert not db.session.execute(
+        text("SELECT to_regclass(:name)"), {"name": partition_name}
+    ).scalar()
+    assert _notification_ids() == {kept_notification.id}
+
+
+def test_archive_notification_partitions_before_only_archives_older_partitions(
+    mocker,
+):
+    today = get_midnight_in_utc(datetime(2021, 1, 10))
+    mocker.patch(
+        "app.dao.notifications_dao.dao_get_notification_partitions",
+        return_value=[
+            ("notifications_legacy", None, today - timedelta(days=2), False),
+            (
+                "notifications_p20210108",
+                today - timedelta(days=2),
+                today - timedelta(days=1),
+                True,
+            ),
+            ("notifications_p20210109", today - timedelta(days=1), today, False),
+        ],
+    )
+    mocker.patch(
+        "app.dao.notifications_dao.dao_get_detached_notification_partitions",
+        return_value=[],
+    )
+    mock_archive = mocker.patch(
+        "app.dao.notifications_dao.dao_archive_notification_partition",
+        return_value=5,
+    )
+
+    archived = dao_archive_notification_partitions_before(today - timedelta(hours=12))
+
+    assert archived == {"notifications_legacy": 5, "notifications_p20210108": 5}
+    assert mock_archive.call_args_list == [
+        mocker.call("notifications_legacy", detach_pending=False),
+        mocker.call("notifications_p20210108", detach_pending=True),
+    ]
+
+
+def test_notification_can_be_found_by_id_alone(sample_template):
+    notification_id = create_notification(template=sample_template).id
+    db.session.expunge_all()
+
+    assert db.session.get(Notification, notification_id).id == notification_id
+    assert db.session.get(Notification, uuid.uuid4()) is None
@@ -0,0 +1,86 @@
+from unittest.mock import patch
+
+import pytest
+from sqlalchemy import create_engine, select
+
+from app import db
+from app.dao import dao_utils
+from app.dao.dao_utils import get_pool_metrics, read_replica
+from app.models import Service
+from tests.app.db import create_service
+from tests.conftest import set_config
+
+
+@pytest.fixture
+def replica_engine(notify_api):
+    # a second engine on the test database stands in for the replica
+    engine = create_engine(notify_api.config["SQLALCHEMY_DATABASE_URI"])
+    with patch.dict(db.engines, {"replica": engine}), patch.dict(
+        dao_utils._replica_lag_check, {"checked_at": None, "usable": False}
+    ):
+        yield engine
+    engine.dispose()
+
+
+def test_read_replica_uses_primary_if_no_replica_configured(notify_db_session):
+    with read_replica():
+        assert db.session.get_bind() is db.engines[None]
+
+
+def test_read_replica_routes_queries_to_replica(notify_db_session, replica_engine):
+    service = create_service()
+
+    with read_replica():
+        assert db.session.get_bind() is replica_engine
+        assert db.session.execute(select(Service.id)).scalars().all() == [service.id]
+
+    assert db.session.get_bind() is db.engines[None]
+
+
+def test_read_replica_works_as_a_decorator(notify_db_session, replica_engine):
+    @read_replica()
+    def get_bind():
+        return db.session.get_bind()
+
+    assert get_bind() is replica_engine
+
+
+def test_read_replica_uses_primary_if_replica_is_lagging(
+    notify_api, notify_db_session, replica_engine
+):
+    with set_config(notify_api, "SQLALCHEMY_REPLICA_MAX_LAG_SECONDS", -1):
+        with read_replica():
+            assert db.session.get_bind() is db.engines[None]
+
+
+def test_read_replica_only_checks_lag_every_interval(
+    notify_db_session, replica_engine, mocker
+):
+    mock_connect = mocker.spy(replica_engine, "connect")
+
+    for _ in range(3):
+        with read_replica():
+            pass
+
+    assert mock_connect.call_count == 1
+
+
+def test_read_replica_uses_primary_if_lag_check_fails(
+    notify_db_session, replica_engine, mocker
+):
+    replica_engine.dispose()
+    mocker.patch.object(
+        replica_engine, "connect", side_effect=dao_utils.SQLAlchemyError()
+    )
+
+    with read_replica():
+        assert db.session.get_bind() is db.engines[None]
+
+
+def test_get_pool_metrics(notify_db_session, replica_engine):
+    with replica_engine.connect():
+        metrics = get_pool_metrics()
+
+    assert set(metrics) == {"primary", "replica"}
+    assert metrics["replica"]["checked_out"] == 1
+    assert set(metrics["primary"]) == {"size", "checked_out", "checked_in", "overflow"}
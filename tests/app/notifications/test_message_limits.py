@@ -0,0 +1,151 @@
+from datetime import datetime
+from unittest.mock import call
+
+import pytest
+from freezegun import freeze_time
+
+from app.errors import TotalRequestsError
+from app.notifications.message_limits import (
+    MessageLimits,
+    seconds_until_counter_expires,
+)
+from tests.conftest import set_config
+
+
+@pytest.fixture
+def mock_redis(mocker):
+    mock_redis = mocker.patch("app.notifications.message_limits.redis_store")
+    mock_redis.incr_within_limit.side_effect = lambda key, amount, *args, **kwargs: (
+        amount
+    )
+    return mock_redis
+
+
+@pytest.mark.parametrize(
+    "now, expected_seconds",
+    [
+        (datetime(2025, 3, 1, 0, 0, 0), 25 * 60 * 60),
+        (datetime(2025, 3, 1, 23, 59, 0), 61 * 60),
+        (datetime(2026, 12, 31, 12, 0, 0), 13 * 60 * 60),
+    ],
+)
+def test_seconds_until_counter_expires(now, expected_seconds):
+    assert seconds_until_counter_expires(now) == expected_seconds
+
+
+@freeze_time("2025-03-01 12:00:00")
+def test_reserve_leases_a_block_at_a_time(notify_api, sample_service, mock_redis):
+    message_limits = MessageLimits()
+
+    for _ in range(250):
+        message_limits.reserve(sample_service)
+
+    cache_key = f"{sample_service.id}-2025-03-01-total-count"
+    assert (
+        mock_redis.incr_within_limit.call_args_list
+        == [call(cache_key, 100, 100000, ex=13 * 60 * 60, minimum=1)] * 3
+    )
+    assert message_limits.leases[sample_service.id].remaining == 50
+
+
+@freeze_time("2025-03-01 12:00:00")
+def test_reserve_a_whole_job_uses_what_is_left_of_the_lease(
+    notify_api, sample_service, mock_redis
+):
+    message_limits = MessageLimits()
+    message_limits.reserve(sample_service)
+
+    message_limits.reserve(sample_service, 5000)
+
+    assert mock_redis.incr_within_limit.call_args_list[1] == call(
+        f"{sample_service.id}-2025-03-01-total-count",
+        4901,
+        100000,
+        ex=13 * 60 * 60,
+        minimum=4901,
+    )
+    assert message_limits.leases[sample_service.id].remaining == 0
+
+
+def test_reserve_lease_is_a_small_share_of_the_limit(
+    notify_api, sample_service, mock_redis
+):
+    sample_service.total_message_limit = 1000
+
+    MessageLimits().reserve(sample_service)
+
+    assert mock_redis.incr_within_limit.call_args.args[1:3] == (10, 1000)
+
+
+def test_reserve_raises_if_over_limit(notify_api, sample_service, mock_redis):
+    mock_redis.incr_within_limit.side_effect = None
+    mock_redis.incr_within_limit.return_value = 0
+
+    with pytest.raises(TotalRequestsError) as e:
+        MessageLimits().reserve(sample_service, 300)
+
+    assert e.value.message == "Exceeded total application limits (100000) for today"
+
+
+def test_reserve_gives_back_yesterdays_lease(notify_api, sample_service, mock_redis):
+    message_limits = MessageLimits()
+    with freeze_time("2025-03-01 23:59:59"):
+        message_limits.reserve(sample_service)
+
+    with freeze_time("2025-03-02 00:00:01"):
+        message_limits.reserve(sample_service)
+
+    mock_redis.decr_if_exists.assert_called_once_with(
+        f"{sample_service.id}-2025-03-01-total-count", 99
+    )
+    assert (
+        message_limits.leases[sample_service.id].cache_key
+        == f"{sample_service.id}-2025-03-02-total-count"
+    )
+
+
+def test_reserve_gives_back_expired_leases(notify_api, sample_service, mock_redis):
+    message_limits = MessageLimits()
+    message_limits.reserve(sample_service, 30)
+
+    with set_config(notify_api, "MESSAGE_LIMIT_LEASE_SECONDS", 0):
+        message_limits.reserve(sample_service)
+
+    mock_redis.decr_if_exists.assert_called_once_with(
+        message_limits.leases[sample_service.id].cache_key, 70
+    )
+    assert mock_redis.incr_within_limit.call_count == 2
+
+
+def test_release_puts_messages_back_in_the_lease(
+    notify_api, sample_service, mock_redis
+):
+    message_limits = MessageLimits()
+    message_limits.reserve(sample_service)
+
+    message_limits.release(sample_service)
+
+    assert message_limits.leases[sample_service.id].remaining == 100
+    mock_redis.decr_if_exists.assert_not_called()
+
+
+@freeze_time("2025-03-01 12:00:00")
+def test_release_without_a_lease_gives_back_to_redis(
+    notify_api, sample_service, mock_redis
+):
+    MessageLimits().release(sample_service, 3)
+
+    mock_redis.decr_if_exists.assert_called_once_with(
+        f"{sample_service.id}-2025-03-01-total-count", 3
+    )
+
+
+def test_give_back_all(notify_api, sample_service, mock_redis):
+    message_limits = MessageLimits()
+    message_limits.reserve(sample_service)
+
+    message_limits.give_back_all()
+
+    mock_redis.decr_if_exists.assert_called_once()
+    assert mock_redis.decr_if_exists.call_args.args[1] == 99
+    assert message_limits.leases == {}
@@ -106,7 +106,7 @@ def test_check_and_queue_callback_task(mocker, sample_notification):
     # reason, so we need to take this approach instead
     mock_create_args = mock_create.mock_calls[0][1]
     assert mock_create_args[0] == sample_notification
-    assert mock_create_args[1].id == callback_api.id
+    assert mock_create_args[1].id == str(callback_api.id)
 
     mock_send.assert_called_once_with(
         [str(sample_notification.id), mock_create.return_value],
@@ -15,7 +15,9 @@ from app.models import Notification, NotificationHistory
 from app.notifications.process_notifications import (
     create_content_for_notification,
     persist_notification,
+    persist_notifications,
     send_notification_to_queue,
+    send_notifications_to_queue_detached,
     simulated_recipient,
 )
 from app.serialised_models import SerialisedTemplate
@@ -23,7 +25,8 @@ from notifications_utils.recipients import (
     validate_and_format_email_address,
     validate_and_format_phone_number,
 )
-from tests.app.db import create_service, create_template
+from tests.app.db import create_notification, create_service, create_template
+from tests.conftest import set_config
 
 
 def test_create_content_for_notification_passes(sample_email_template):
@@ -285,6 +288,91 @@ def test_send_notification_to_queue_throws_exception_deletes_notification(
     assert _get_notification_history_query_count() == 0
 
 
+def test_persist_notifications_saves_all_but_simulated_with_one_insert(
+    sample_template, sample_api_key, mocker
+):
+    spy_insert = mocker.spy(db.session, "bulk_save_objects")
+    notifications_kwargs = [
+        {
+            "template_id": sample_template.id,
+            "template_version": sample_template.version,
+            "recipient": recipient,
+            "service": sample_template.service,
+            "personalisation": {},
+            "notification_type": NotificationType.SMS,
+            "api_key_id": sample_api_key.id,
+            "key_type": sample_api_key.key_type,
+            "client_reference": f"ref-{index}",
+            "simulated": recipient == "+14254147755",
+        }
+        for index, recipient in enumerate(
+            ["+12028675309", "+14254147755", "+12028675300"]
+        )
+    ]
+
+    notifications = persist_notifications(notifications_kwargs)
+
+    assert [notification.client_reference for notification in notifications] == [
+        "ref-0",
+        "ref-1",
+        "ref-2",
+    ]
+    assert spy_insert.call_count == 1
+    saved = db.session.execute(select(Notification)).scalars().all()
+    assert {notification.client_reference for notification in saved} == {
+        "ref-0",
+        "ref-2",
+    }
+    assert {notification.to for notification in saved} == {"1"}
+
+
+def test_send_notifications_to_queue_detached_sends_in_chunks(notify_api, mocker):
+    mock_apply_async = mocker.patch(
+        "app.celery.provider_tasks.deliver_email.apply_async"
+    )
+    mock_producer = mocker.patch(
+        "app.notifications.process_notifications.notify_celery.producer_or_acquire"
+    )
+    notification_ids = [uuid.uuid4() for _ in range(5)]
+
+    with set_config(notify_api, "BULK_NOTIFICATIONS_QUEUE_CHUNK_SIZE", 2):
+        send_notifications_to_queue_detached(
+            KeyType.NORMAL, NotificationType.EMAIL, notification_ids
+        )
+
+    assert mock_producer.call_count == 3
+    assert [call.args[0] for call in mock_apply_async.call_args_list] == [
+        [str(notification_id)] for notification_id in notification_ids
+    ]
+    assert {call.kwargs["queue"] for call in mock_apply_async.call_args_list} == {
+        "send-email-tasks"
+    }
+
+
+def test_send_notifications_to_queue_detached_deletes_those_not_queued(
+    sample_template, mocker
+):
+    notifications = [create_notification(template=sample_template) for _ in range(3)]
+    mocker.patch(
+        "app.celery.provider_tasks.deliver_sms.apply_async",
+        side_effect=[None, Boto3Error("EXPECTED")],
+    )
+    mocker.patch(
+        "app.notifications.process_notifications.notify_celery.producer_or_acquire"
+    )
+
+    with pytest.raises(Boto3Error):
+        send_notifications_to_queue_detached(
+            KeyType.NORMAL,
+            NotificationType.SMS,
+            [notification.id for notification in notifications],
+        )
+
+    assert db.session.execute(select(Notification.id)).scalars().all() == [
+        notifications[0].id
+    ]
+
+
 @pytest.mark.parametrize(
     "to_address, notification_type, expected",
     [
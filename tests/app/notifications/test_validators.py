@@ -1,8 +1,9 @@
 import pytest
+from flask import g
 
 from app.dao import templates_dao
 from app.enums import KeyType, NotificationType, ServicePermissionType, TemplateType
-from app.errors import BadRequestError, TotalRequestsError
+from app.errors import BadRequestError, RateLimitError, TotalRequestsError
 from app.notifications.process_notifications import create_content_for_notification
 from app.notifications.sns_cert_validator import (
     VALID_SNS_TOPICS,
@@ -16,10 +17,12 @@ from app.notifications.validators import (
     check_notification_content_is_not_empty,
     check_reply_to,
     check_service_email_reply_to_id,
+    check_service_over_api_rate_limit,
     check_service_over_total_message_limit,
     check_service_sms_sender_id,
     check_template_is_active,
     check_template_is_for_notification_type,
+    release_total_message_limit,
     service_can_send_to_recipient,
     validate_and_format_recipient,
     validate_template,
@@ -28,6 +31,7 @@ from app.serialised_models import SerialisedService, SerialisedTemplate
 from app.service.utils import service_allowed_to_send_to
 from app.utils import get_template_instance
 from notifications_utils import SMS_CHAR_COUNT_LIMIT
+from notifications_utils.clients.redis.redis_client import RateLimit
 from tests.app.db import (
     create_reply_to_email,
     create_service,
@@ -51,8 +55,8 @@ def test_check_service_over_total_message_limit_fails(
 ):
     service = create_service()
     mocker.patch(
-        "app.redis_store.get",
-        return_value="100001",
+        "app.notifications.message_limits.redis_store.incr_within_limit",
+        return_value=0,
     )
 
     with pytest.raises(TotalRequestsError) as e:
@@ -79,6 +83,55 @@ def test_check_application_over_retention_limit_fails(
     assert e.value.fields == []
 
 
+def test_check_service_over_api_rate_limit_passes(notify_api, mocker, sample_service):
+    rate_limit = RateLimit(
+        exceeded=False, limit=3000, remaining=2999, retry_after=0, reset_after=0.02
+    )
+    mock_check_rate_limit = mocker.patch(
+        "app.redis_store.check_rate_limit", return_value=rate_limit
+    )
+
+    with notify_api.test_request_context():
+        check_service_over_api_rate_limit(sample_service, KeyType.NORMAL)
+        assert g.rate_limit == rate_limit
+
+    mock_check_rate_limit.assert_called_once_with(
+        f"{sample_service.id}-{KeyType.NORMAL}", 3000, 60
+    )
+
+
+@pytest.mark.parametrize(
+    "key_type, key_description", [(KeyType.NORMAL, "LIVE"), (KeyType.TEAM, "TEAM")]
+)
+def test_check_service_over_api_rate_limit_fails(
+    notify_api, mocker, sample_service, key_type, key_description
+):
+    mocker.patch(
+        "app.redis_store.check_rate_limit",
+        return_value=RateLimit(
+            exceeded=True, limit=3000, remaining=0, retry_after=0.02, reset_after=60
+        ),
+    )
+
+    with notify_api.test_request_context(), pytest.raises(RateLimitError) as e:
+        check_service_over_api_rate_limit(sample_service, key_type)
+    assert e.value.status_code == 429
+    assert e.value.message == (
+        f"Exceeded rate limit for key type {key_description} of 3000 requests per 60 seconds"
+    )
+
+
+def test_check_service_over_api_rate_limit_when_disabled(
+    notify_api, mocker, sample_service
+):
+    mock_check_rate_limit = mocker.patch("app.redis_store.check_rate_limit")
+
+    with set_config(notify_api, "API_RATE_LIMIT_ENABLED", False):
+        check_service_over_api_rate_limit(sample_service, KeyType.NORMAL)
+
+    assert not mock_check_rate_limit.called
+
+
 @pytest.mark.parametrize(
     "template_type, notification_type",
     [
@@ -700,13 +753,32 @@ def test_get_string_to_sign():
 
 
 def test_check_service_over_total_message_limit(mocker, sample_service):
-    get_redis_mock = mocker.patch("app.notifications.validators.redis_store.get")
-    get_redis_mock.return_value = None
-    service_stats = check_service_over_total_message_limit(
-        KeyType.NORMAL,
-        sample_service,
-    )
-    assert service_stats == 0
+    mock_reserve = mocker.patch("app.notifications.validators.message_limits.reserve")
+
+    check_service_over_total_message_limit(KeyType.NORMAL, sample_service, 300)
+
+    mock_reserve.assert_called_once_with(sample_service, 300)
+
+
+def test_check_service_over_total_message_limit_ignores_test_keys(
+    mocker, sample_service
+):
+    mock_reserve = mocker.patch("app.notifications.validators.message_limits.reserve")
+
+    check_service_over_total_message_limit(KeyType.TEST, sample_service)
+
+    assert not mock_reserve.called
+
+
+@pytest.mark.parametrize(
+    "key_type, released", [(KeyType.NORMAL, True), (KeyType.TEST, False)]
+)
+def test_release_total_message_limit(mocker, sample_service, key_type, released):
+    mock_release = mocker.patch("app.notifications.validators.message_limits.release")
+
+    release_total_message_limit(key_type, sample_service)
+
+    assert mock_release.called is released
 
 
 def test_service_allowed_to_send_to_simulated_numbers():
@@ -17,6 +17,7 @@ from app.errors import InvalidRequest
 from app.models import ApiKey, Notification, NotificationHistory, Template
 from notifications_python_client.authentication import create_jwt_token
 from notifications_utils import SMS_CHAR_COUNT_LIMIT
+from notifications_utils.clients.redis.redis_client import RateLimit
 from tests import create_service_authorization_header
 from tests.app.db import (
     create_api_key,
@@ -26,6 +27,7 @@ from tests.app.db import (
     create_service_guest_list,
     create_template,
 )
+from tests.conftest import set_config
 
 
 @pytest.mark.parametrize("template_type", [TemplateType.SMS, TemplateType.EMAIL])
@@ -431,6 +433,55 @@ def test_should_allow_valid_sms_notification(notify_api, sample_template, mocker
             assert response_data["template_version"] == sample_template.version
 
 
+@pytest.mark.parametrize(
+    "exceeded, expected_status, expected_retry_after",
+    [(False, 201, None), (True, 429, "1")],
+)
+def test_send_notification_returns_rate_limit_headers(
+    notify_api,
+    client,
+    sample_template,
+    mocker,
+    exceeded,
+    expected_status,
+    expected_retry_after,
+):
+    mocker.patch("app.celery.provider_tasks.deliver_sms.apply_async")
+    mock_check_rate_limit = mocker.patch(
+        "app.redis_store.check_rate_limit",
+        return_value=RateLimit(
+            exceeded=exceeded,
+            limit=3000,
+            remaining=0 if exceeded else 2999,
+            retry_after=0.02 if exceeded else 0,
+            reset_after=59.99,
+        ),
+    )
+
+    with set_config(notify_api, "REDIS_ENABLED", True):
+        response = client.post(
+            path="/notifications/sms",
+            data=json.dumps(
+                {"to": "202 867 5309", "template": str(sample_template.id)}
+            ),
+            headers=[
+                ("Content-Type", "application/json"),
+                create_service_authorization_header(
+                    service_id=sample_template.service_id
+                ),
+            ],
+        )
+
+    assert response.status_code == expected_status
+    assert response.headers["X-RateLimit-Limit"] == "3000"
+    assert response.headers["X-RateLimit-Remaining"] == ("0" if exceeded else "2999")
+    assert response.headers["X-RateLimit-Reset"] == "60"
+    assert response.headers.get("Retry-After") == expected_retry_after
+    mock_check_rate_limit.assert_called_once_with(
+        f"{sample_template.service_id}-{KeyType.NORMAL}", 3000, 60
+    )
+
+
 def test_should_reject_email_notification_with_bad_email(
     notify_api, sample_email_template, mocker
 ):
@@ -824,6 +875,9 @@ def test_should_delete_notification_and_return_error_if_redis_fails(
     mocker.patch(
         "app.notifications.process_notifications.uuid.uuid4", return_value=fake_uuid
     )
+    mock_release_limit = mocker.patch(
+        "app.notifications.rest.release_total_message_limit"
+    )
 
     template = (
         sample_template if template_type == TemplateType.SMS else sample_email_template
@@ -859,6 +913,8 @@ def test_should_delete_notification_and_return_error_if_redis_fails(
     mocked.assert_called_once_with([fake_uuid], queue=queue_name, countdown=60)
     assert not notifications_dao.get_notification_by_id(fake_uuid)
     assert not db.session.get(NotificationHistory, fake_uuid)
+    mock_release_limit.assert_called_once()
+    assert mock_release_limit.call_args.args[0] == KeyType.TEAM
 
 
 @pytest.mark.parametrize(
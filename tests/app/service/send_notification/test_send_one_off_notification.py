@@ -173,6 +173,53 @@ def test_send_one_off_notification_raises_if_invalid_recipient(notify_db_session
         send_one_off_notification(service.id, post_data)
 
 
+def test_send_one_off_notification_does_not_count_invalid_recipient_against_limit(
+    notify_db_session, mocker
+):
+    mock_check_limit = mocker.patch(
+        "app.service.send_notification.check_service_over_total_message_limit"
+    )
+    service = create_service()
+    template = create_template(service=service)
+
+    post_data = {
+        "template_id": str(template.id),
+        "to": "not a phone number",
+        "created_by": str(service.created_by_id),
+    }
+
+    with pytest.raises(InvalidPhoneError):
+        send_one_off_notification(service.id, post_data)
+
+    mock_check_limit.assert_not_called()
+
+
+def test_send_one_off_notification_releases_limit_if_not_sent(
+    persist_mock, celery_mock, notify_db_session, mocker
+):
+    mock_check_limit = mocker.patch(
+        "app.service.send_notification.check_service_over_total_message_limit"
+    )
+    mock_release_limit = mocker.patch(
+        "app.service.send_notification.release_total_message_limit"
+    )
+    celery_mock.side_effect = Exception("EXPECTED")
+    service = create_service()
+    template = create_template(service=service)
+
+    post_data = {
+        "template_id": str(template.id),
+        "to": "202-867-5309",
+        "created_by": str(service.created_by_id),
+    }
+
+    with pytest.raises(Exception, match="EXPECTED"):
+        send_one_off_notification(service.id, post_data)
+
+    mock_check_limit.assert_called_once_with(KeyType.NORMAL, service)
+    mock_release_limit.assert_called_once_with(KeyType.NORMAL, service)
+
+
 @pytest.mark.parametrize(
     "recipient",
     [
@@ -4,8 +4,9 @@ import uuid
 import pytest
 from jsonschema import ValidationError
 
-from app.schema_validation import validate
+from app.schema_validation import get_validator, validate
 from app.service.service_callback_api_schema import update_service_callback_api_schema
+from app.service.service_senders_schema import add_service_email_reply_to_request
 
 
 def test_service_callback_api_schema_validates():
@@ -46,3 +47,28 @@ def test_service_callback_api_schema_bearer_token_under_ten_char():
     errors = json.loads(str(e.value)).get("errors")
     assert len(errors) == 1
     assert errors[0]["message"] == "bearer_token shorty is too short"
+
+
+def test_get_validator_reuses_validator_for_the_same_schema():
+    validator = get_validator(add_service_email_reply_to_request)
+
+    assert get_validator(add_service_email_reply_to_request) is validator
+    # an equal schema that's a different object gets its own
+    assert get_validator(dict(add_service_email_reply_to_request)) is not validator
+
+
+def test_validate_with_cached_validator_still_checks_formats():
+    valid = {"email_address": "someone@example.com", "is_default": True}
+    assert validate(valid, add_service_email_reply_to_request) == valid
+
+    with pytest.raises(ValidationError) as e:
+        validate(
+            {"email_address": "not an email", "is_default": True},
+            add_service_email_reply_to_request,
+        )
+    assert json.loads(str(e.value))["errors"] == [
+        {
+            "error": "ValidationError",
+            "message": "email_address Not a valid email address",
+        }
+    ]
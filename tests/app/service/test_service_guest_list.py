@@ -7,6 +7,7 @@ from app import db
 from app.dao.service_guest_list_dao import dao_add_and_commit_guest_list_contacts
 from app.enums import RecipientType
 from app.models import ServiceGuestList
+from app.serialised_models import SerialisedServiceAllowlist
 from tests import create_admin_authorization_header
 
 
@@ -102,6 +103,27 @@ def test_update_guest_list_replaces_old_guest_list(client, sample_service_guest_
     assert guest_list[1].recipient == "foo@bar.com"
 
 
+def test_update_guest_list_updates_cached_allowlist(client, sample_service_guest_list):
+    service_id = sample_service_guest_list.service_id
+    assert SerialisedServiceAllowlist.from_service_id(service_id).allows(
+        sample_service_guest_list.recipient
+    )
+
+    response = client.put(
+        f"service/{service_id}/guest-list",
+        data=json.dumps({"email_addresses": [], "phone_numbers": []}),
+        headers=[
+            ("Content-Type", "application/json"),
+            create_admin_authorization_header(),
+        ],
+    )
+
+    assert response.status_code == 204
+    assert not SerialisedServiceAllowlist.from_service_id(service_id).allows(
+        sample_service_guest_list.recipient
+    )
+
+
 def test_update_guest_list_doesnt_remove_old_guest_list_if_error(
     client, sample_service_guest_list
 ):
@@ -80,3 +80,39 @@ def test_show_status_exception(admin_request):
     with patch("app.status.healthcheck.jsonify") as mock_jsonify:
         mock_jsonify.side_effect = ValueError("JSON serialization failed")
         admin_request.get("status.show_status", _expected_status=503)
+
+
+def test_db_pools(admin_request, notify_db_session):
+    response = admin_request.get("status_metrics.db_pools")
+    assert set(response["primary"]) == {
+        "size",
+        "checked_out",
+        "checked_in",
+        "overflow",
+    }
+
+
+def test_redis_invalidation_metrics(admin_request, mocker):
+    mocker.patch(
+        "app.status.healthcheck.redis_store.get_invalidation_metrics",
+        return_value={"delete_tagged": {"count": 1}},
+    )
+
+    response = admin_request.get("status_metrics.redis_invalidation_metrics")
+
+    assert response == {"delete_tagged": {"count": 1}}
+
+
+@pytest.mark.parametrize(
+    "path",
+    [
+        "/_status/db-pools",
+        "/_status/sql-metrics",
+        "/_status/serialised-model-cache",
+        "/_status/redis-invalidation",
+    ],
+)
+def test_status_metrics_need_admin_auth(client, path):
+    response = client.get(path)
+
+    assert response.status_code == 401
@@ -0,0 +1,368 @@
+import json
+import time
+
+import pytest
+from freezegun import freeze_time
+
+from app import db
+from app.dao.services_dao import (
+    dao_add_user_to_service,
+    dao_fetch_service_by_id,
+    dao_remove_user_from_service,
+)
+from app.dao.templates_dao import dao_update_template
+from app.dao.users_dao import save_model_user, save_user_attribute
+from app.enums import CallbackType
+from app.serialised_models import (
+    INVALIDATION_CHANNEL,
+    SerialisedService,
+    SerialisedServiceAllowlist,
+    SerialisedServiceCallbackApi,
+    SerialisedTemplate,
+    _entry_expires_at,
+    caches,
+    clear_memory_caches,
+    evict_service_from_memory_caches,
+    invalidation_listener,
+)
+from tests.app.db import (
+    create_service,
+    create_service_callback_api,
+    create_service_guest_list,
+    create_template,
+    create_user,
+)
+from tests.conftest import set_config
+
+
+@pytest.fixture(autouse=True)
+def empty_caches():
+    clear_memory_caches()
+    invalidation_listener.reset_metrics()
+    yield
+    clear_memory_caches()
+
+
+def _cached_service_ids():
+    return {
+        str(key[0]) for key in caches[SerialisedService.from_id.__qualname__].keys()
+    }
+
+
+def test_memory_cache_records_hits_and_misses(sample_service, mocker):
+    mock_get_dict = mocker.patch.object(
+        SerialisedService, "get_dict", wraps=SerialisedService.get_dict
+    )
+
+    for _ in range(3):
+        assert SerialisedService.from_id(sample_service.id).id == str(sample_service.id)
+
+    mock_get_dict.assert_called_once()
+    metrics = invalidation_listener.get_metrics()
+    assert metrics["hits"] == 2
+    assert metrics["misses"] == 1
+    assert metrics["hit_ratio"] == pytest.approx(2 / 3)
+
+
+@pytest.mark.parametrize("subscribed, expected_ttl", [(False, 2), (True, 300)])
+def test_memory_cache_only_keeps_entries_long_while_subscribed(
+    notify_api, mocker, subscribed, expected_ttl
+):
+    mocker.patch.object(invalidation_listener, "subscribed", subscribed)
+
+    with set_config(notify_api, "SERIALISED_MODEL_CACHE_TTL", 300):
+        assert _entry_expires_at("key", "value", 1000) == 1000 + expected_ttl
+
+
+def test_committing_a_write_evicts_only_that_service(sample_template, mocker):
+    other_service = create_service(service_name="other service")
+    # create_service leaves some changes unflushed
+    db.session.commit()
+    mock_delete_tagged = mocker.patch("app.serialised_models.redis_store.delete_tagged")
+    SerialisedService.from_id(sample_template.service_id)
+    SerialisedService.from_id(other_service.id)
+    SerialisedTemplate.from_id_and_service_id(
+        sample_template.id, sample_template.service_id
+    )
+
+    sample_template.content = "new content"
+    dao_update_template(sample_template)
+
+    assert _cached_service_ids() == {str(other_service.id)}
+    assert not caches[SerialisedTemplate.from_id_and_service_id.__qualname__]
+    mock_delete_tagged.assert_called_once_with(
+        f"service-{sample_template.service_id}-cache-keys",
+        keys=[
+            f"service-{sample_template.service_id}",
+            f"service-{sample_template.service_id}-allowlist",
+            f"service-{sample_template.service_id}-template-{sample_template.id}-version-None",
+        ],
+    )
+
+
+def test_committing_a_write_publishes_invalidation(sample_service, mocker):
+    mocker.patch("app.serialised_models.redis_store.active", True)
+    mocker.patch("app.serialised_models.redis_store.delete_tagged")
+    mock_redis = mocker.patch("app.serialised_models.redis_store.redis_store")
+    mocker.patch.object(invalidation_listener, "ensure_started")
+
+    with freeze_time("2025-01-01 12:00:00"):
+        create_template(sample_service)
+
+    mock_redis.publish.assert_called_once_with(
+        INVALIDATION_CHANNEL,
+        json.dumps(
+            {"service_id": str(sample_service.id), "published_at": 1735732800.0}
+        ),
+    )
+
+
+def test_rolled_back_writes_are_not_published(sample_service, mocker):
+    mock_delete_tagged = mocker.patch("app.serialised_models.redis_store.delete_tagged")
+
+    sample_service.name = "new name"
+    db.session.flush()
+    db.session.rollback()
+
+    assert not mock_delete_tagged.called
+
+
+def test_handle_message_evicts_service_and_records_lag(sample_service):
+    other_service = create_service(service_name="other service")
+    SerialisedService.from_id(sample_service.id)
+    SerialisedService.from_id(other_service.id)
+
+    invalidation_listener.handle_message(
+        json.dumps(
+            {"service_id": str(sample_service.id), "published_at": time.time() - 0.5}
+        )
+    )
+
+    assert _cached_service_ids() == {str(other_service.id)}
+    metrics = invalidation_listener.get_metrics()
+    assert metrics["invalidations"] == 1
+    assert 0.5 <= metrics["invalidation_max_lag_seconds"] < 5
+
+
+def test_memory_cache_does_not_keep_what_was_read_during_an_invalidation(
+    sample_service, mocker
+):
+    get_dict = SerialisedService.get_dict
+
+    def get_dict_then_invalidate(service_id):
+        service_dict = get_dict(service_id)
+        evict_service_from_memory_caches(service_id)
+        return service_dict
+
+    mocker.patch.object(
+        SerialisedService, "get_dict", side_effect=get_dict_then_invalidate
+    )
+
+    assert SerialisedService.from_id(sample_service.id).id == str(sample_service.id)
+    assert _cached_service_ids() == set()
+
+    mocker.patch.object(SerialisedService, "get_dict", wraps=get_dict)
+    SerialisedService.from_id(sample_service.id)
+    assert _cached_service_ids() == {str(sample_service.id)}
+
+
+def test_listener_clears_caches_when_connection_drops(
+    notify_api, sample_service, mocker
+):
+    class StopListening(Exception):
+        pass
+
+    def listen():
+        SerialisedService.from_id(sample_service.id)
+        assert invalidation_listener.subscribed is True
+        assert _cached_service_ids() == {str(sample_service.id)}
+        raise ConnectionError()
+        yield
+
+    mock_redis = mocker.patch("app.serialised_models.redis_store.redis_store")
+    mock_redis.pubsub.return_value.listen.side_effect = listen
+    mocker.patch("app.serialised_models.time.sleep", side_effect=StopListening)
+    mocker.patch.object(invalidation_listener, "subscribed", False)
+
+    with pytest.raises(StopListening):
+        invalidation_listener._listen(notify_api)
+
+    assert invalidation_listener.subscribed is False
+    assert _cached_service_ids() == set()
+
+
+def test_cache_metrics_endpoint(admin_request, sample_service):
+    SerialisedService.from_id(sample_service.id)
+
+    metrics = admin_request.get("status_metrics.serialised_model_cache_metrics")
+
+    assert metrics["misses"] == 1
+    assert metrics["subscribed"] is False
+
+
+def test_cached_models_are_tagged_with_their_service(sample_template, mocker):
+    mocker.patch("app.serialised_models.redis_store.get", return_value=None)
+    mock_set_tagged = mocker.patch("app.serialised_models.redis_store.set_tagged")
+
+    SerialisedService.from_id(sample_template.service_id)
+    SerialisedServiceAllowlist.from_service_id(sample_template.service_id)
+    SerialisedTemplate.from_id_and_service_id(
+        sample_template.id, sample_template.service_id
+    )
+    SerialisedServiceCallbackApi.from_service_id(
+        sample_template.service_id, CallbackType.COMPLAINT
+    )
+
+    assert [call.args[0] for call in mock_set_tagged.call_args_list] == [
+        f"service-{sample_template.service_id}",
+        f"service-{sample_template.service_id}-allowlist",
+        f"service-{sample_template.service_id}-template-{sample_template.id}-version-None",
+        f"service-{sample_template.service_id}-callback-api-complaint",
+    ]
+    assert {tuple(call.kwargs["tags"]) for call in mock_set_tagged.call_args_list} == {
+        (f"service-{sample_template.service_id}-cache-keys",)
+    }
+
+
+def test_allowlist_is_formatted_and_cached(notify_db_session, mocker):
+    user = create_user(email="Team.Member@Example.gov", mobile_number="2028675309")
+    service = create_service(user=user, restricted=True)
+    create_service_guest_list(service, email_address="guest@example.gov")
+    mock_fetch_service = mocker.patch(
+        "app.serialised_models.dao_fetch_service_by_id", wraps=dao_fetch_service_by_id
+    )
+
+    allowlist = SerialisedServiceAllowlist.from_service_id(service.id)
+    assert allowlist.team_members == {"team.member@example.gov", "+12028675309"}
+    assert allowlist.guest_list == {"guest@example.gov"}
+
+    assert SerialisedServiceAllowlist.from_service_id(service.id).allows(
+        "(202) 867-5309"
+    )
+    assert not allowlist.allows("guest@example.gov", allow_guest_list_recipients=False)
+    # simulated numbers are always allowed
+    assert allowlist.allows("+14254147755", allow_guest_list_recipients=False)
+    mock_fetch_service.assert_called_once()
+
+
+def _change_mobile_number_on_model(user):
+    user.mobile_number = "+12028675300"
+    save_model_user(user)
+
+
+@pytest.mark.parametrize(
+    "update_user",
+    [
+        lambda user: save_user_attribute(user, {"mobile_number": "+12028675300"}),
+        lambda user: save_model_user(user, {"mobile_number": "+12028675300"}),
+        _change_mobile_number_on_model,
+    ],
+)
+def test_allowlist_updated_when_team_member_changes_phone_number(
+    notify_db_session, update_user
+):
+    user = create_user(mobile_number="+12028675309")
+    service = create_service(user=user, restricted=True)
+    assert SerialisedServiceAllowlist.from_service_id(service.id).allows("2028675309")
+
+    update_user(user)
+
+    allowlist = SerialisedServiceAllowlist.from_service_id(service.id)
+    assert not allowlist.allows("2028675309")
+    assert allowlist.allows("2028675300")
+
+
+def test_allowlist_updated_when_team_member_removed(notify_db_session):
+    user = create_user(email="leaving@example.gov")
+    service = create_service(user=create_user(email="staying@example.gov"))
+    dao_add_user_to_service(service, user)
+    assert SerialisedServiceAllowlist.from_service_id(service.id).allows(
+        "leaving@example.gov"
+    )
+
+    dao_remove_user_from_service(service, user)
+
+    assert not SerialisedServiceAllowlist.from_service_id(service.id).allows(
+        "leaving@example.gov"
+    )
+
+
+def test_callback_api_is_cached_even_if_service_has_none(sample_service, mocker):
+    mock_get_dict = mocker.patch.object(
+        SerialisedServiceCallbackApi,
+        "get_dict",
+        wraps=SerialisedServiceCallbackApi.get_dict,
+    )
+
+    for _ in range(2):
+        assert (
+            SerialisedServiceCallbackApi.from_service_id(
+                sample_service.id, CallbackType.DELIVERY_STATUS
+            )
+            is None
+        )
+
+    mock_get_dict.assert_called_once()
+
+
+def test_callback_api_keeps_bearer_token_encrypted(sample_service, mocker):
+    mock_set = mocker.patch("app.serialised_models.redis_store.set_tagged")
+    create_service_callback_api(sample_service, bearer_token="some_super_secret")
+
+    callback_api = SerialisedServiceCallbackApi.from_service_id(
+        sample_service.id, CallbackType.DELIVERY_STATUS
+    )
+
+    assert callback_api.bearer_token == "some_super_secret"
+    assert "some_super_secret" not in callback_api.encrypted_bearer_token
+    assert "some_super_secret" not in mock_set.call_args.args[1]
+
+
+def test_callback_api_updated_through_callback_endpoints(admin_request, sample_service):
+    assert (
+        SerialisedServiceCallbackApi.from_service_id(
+            sample_service.id, CallbackType.DELIVERY_STATUS
+        )
+        is None
+    )
+
+    created = admin_request.post(
+        "service_callback.create_service_callback_api",
+        service_id=sample_service.id,
+        _data={
+            "url": "https://some_service/callback-endpoint",
+            "bearer_token": "some-unique-string",
+            "updated_by_id": str(sample_service.users[0].id),
+        },
+        _expected_status=201,
+    )["data"]
+    callback_api = SerialisedServiceCallbackApi.from_service_id(
+        sample_service.id, CallbackType.DELIVERY_STATUS
+    )
+    assert callback_api.url == "https://some_service/callback-endpoint"
+
+    admin_request.post(
+        "service_callback.update_service_callback_api",
+        service_id=sample_service.id,
+        callback_api_id=created["id"],
+        _data={
+            "bearer_token": "different-unique-string",
+            "updated_by_id": str(sample_service.users[0].id),
+        },
+    )
+    callback_api = SerialisedServiceCallbackApi.from_service_id(
+        sample_service.id, CallbackType.DELIVERY_STATUS
+    )
+    assert callback_api.bearer_token == "different-unique-string"
+
+    admin_request.delete(
+        "service_callback.remove_service_callback_api",
+        service_id=sample_service.id,
+        callback_api_id=created["id"],
+    )
+    assert (
+        SerialisedServiceCallbackApi.from_service_id(
+            sample_service.id, CallbackType.DELIVERY_STATUS
+        )
+        is None
+    )
@@ -0,0 +1,125 @@
+import pytest
+from sqlalchemy import text
+
+from app import db
+from app.sql_metrics import SqlMetrics, fingerprint_statement, sql_metrics
+from tests.conftest import set_config
+
+
+@pytest.mark.parametrize(
+    "statement, expected",
+    [
+        (
+            "SELECT * FROM notifications WHERE id = %(id_1)s",
+            "SELECT * FROM notifications WHERE id = ?",
+        ),
+        (
+            "SELECT * FROM notifications  WHERE to = 'a@b.com'\n  AND status IN ('sending', 'pending')",
+            "SELECT * FROM notifications WHERE to = ? AND status IN (...)",
+        ),
+        (
+            "SELECT id::text FROM jobs WHERE job_row_number = 12 LIMIT :qry_limit",
+            "SELECT id::text FROM jobs WHERE job_row_number = ? LIMIT ?",
+        ),
+        (
+            "DELETE FROM notifications WHERE id IN (%(id_1)s, %(id_2)s, %(id_3)s)",
+            "DELETE FROM notifications WHERE id IN (...)",
+        ),
+        ("DROP TABLE notifications_p20250101", "DROP TABLE notifications_p20250101"),
+    ],
+)
+def test_fingerprint_statement(statement, expected):
+    normalised, fingerprint = fingerprint_statement(statement)
+    assert normalised == expected
+    assert len(fingerprint) == 12
+
+
+def test_fingerprint_statement_ignores_values():
+    assert (
+        fingerprint_statement("SELECT 1 WHERE a = 'x' AND b IN (1, 2)")[1]
+        == fingerprint_statement("SELECT 2 WHERE a = 'y' AND b IN (3)")[1]
+    )
+
+
+def test_sql_metrics_record():
+    metrics = SqlMetrics()
+    metrics.record("GET /service", "statement", 0.5)
+    metrics.record("GET /service", "statement", 1.5)
+    metrics.record("celery process-job", "pool_wait", 0.25)
+
+    assert metrics.snapshot() == {
+        "GET /service": {
+            "statement_count": 2,
+            "statement_seconds": 2.0,
+            "statement_max_seconds": 1.5,
+        },
+        "celery process-job": {
+            "pool_wait_count": 1,
+            "pool_wait_seconds": 0.25,
+            "pool_wait_max_seconds": 0.25,
+        },
+    }
+
+    metrics.reset()
+    assert metrics.snapshot() == {}
+
+
+def test_statements_are_timed_and_slow_ones_logged(
+    notify_api, notify_db_session, mocker
+):
+    sql_metrics.reset()
+    mock_logger = mocker.patch.object(notify_api.logger, "warning")
+
+    with set_config(notify_api, "SQLALCHEMY_SLOW_QUERY_THRESHOLD_SECONDS", 0.05):
+        db.session.execute(text("SELECT 1"))
+        db.session.execute(text("SELECT pg_sleep(0.1), 'secret'"))
+
+    counters = sql_metrics.snapshot()["unknown"]
+    assert counters["statement_count"] >= 2
+    assert counters["slow_statement_count"] == 1
+    assert counters["slow_statement_max_seconds"] >= 0.1
+
+    (slow_query_log,) = [
+        call.args[0]
+        for call in mock_logger.call_args_list
+        if call.args[0].startswith("Slow query")
+    ]
+    assert "SELECT pg_sleep(...), ?" in slow_query_log
+    assert "secret" not in slow_query_log
+
+
+def test_connection_hold_and_pool_wait_are_attributed_to_endpoint(
+    client, notify_db_session
+):
+    sql_metrics.reset()
+    # releases the test session's connection, so the request has to check one out
+    db.session.close()
+
+    response = client.get("/_status?simple=1")
+    assert response.status_code == 200
+    response = client.get("/_status/live-service-and-organization-counts")
+    assert response.status_code == 200
+    # the test client doesn't tear down the app context, so give the connection back here
+    db.session.close()
+
+    counters = sql_metrics.snapshot()[
+        "GET /_status/live-service-and-organization-counts"
+    ]
+    assert counters["statement_count"] >= 2
+    assert counters["pool_wait_count"] >= 1
+    assert counters["connection_hold_count"] >= 1
+
+
+def test_sql_metrics_endpoint(admin_request):
+    sql_metrics.reset()
+    sql_metrics.record("celery process-job", "statement", 1)
+
+    response = admin_request.get("status_metrics.sql_metrics_by_source")
+
+    assert response == {
+        "celery process-job": {
+            "statement_count": 1,
+            "statement_seconds": 1,
+            "statement_max_seconds": 1,
+        }
+    }
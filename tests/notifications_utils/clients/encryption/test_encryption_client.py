@@ -1,3 +1,5 @@
+from base64 import urlsafe_b64decode, urlsafe_b64encode
+
 import pytest
 
 from notifications_utils.clients.encryption.encryption_client import (
@@ -86,3 +88,124 @@ def test_should_raise_encryption_error_on_bad_salt(encryption_client):
 def test_should_sign_and_serialize_json(encryption_client):
     signed = encryption_client.sign({"this": "that"})
     assert encryption_client.verify_signature(signed) == {"this": "that"}
+
+
+def test_should_only_derive_key_once_per_custom_salt(encryption_client, mocker):
+    mock_derive_key = mocker.spy(encryption_client, "_derive_key")
+    salt = "this-is-a-custom-salt"
+
+    encrypted = encryption_client.encrypt("this", salt=salt)
+    assert encryption_client.decrypt(encrypted, salt=salt) == "this"
+    encryption_client.encrypt("that", salt=salt)
+
+    mock_derive_key.assert_called_once_with(salt)
+
+
+def test_should_forget_least_recently_used_custom_salts(encryption_client, mocker):
+    mocker.patch.object(encryption_client, "derived_key_cache_size", 2)
+    mock_derive_key = mocker.spy(encryption_client, "_derive_key")
+    first_salt, second_salt, third_salt = (
+        f"this-is-custom-salt-{number}" for number in range(3)
+    )
+
+    for salt in (first_salt, second_salt, first_salt, third_salt, first_salt):
+        encryption_client.encrypt("this", salt=salt)
+    encryption_client.encrypt("this", salt=second_salt)
+
+    assert [call.args[0] for call in mock_derive_key.call_args_list] == [
+        first_salt,
+        second_salt,
+        third_salt,
+        second_salt,
+    ]
+
+
+def test_should_derive_keys_for_configured_salts_on_startup(app, mocker):
+    client = Encryption()
+    app.config["SECRET_KEY"] = "test-notify-secret-key"
+    app.config["DANGEROUS_SALT"] = "test-notify-salt"
+    app.config["ENCRYPTION_PREDERIVED_SALTS"] = ["this-is-a-custom-salt"]
+    client.init_app(app)
+    mock_derive_key = mocker.spy(client, "_derive_key")
+
+    client.encrypt("this", salt="this-is-a-custom-salt")
+
+    mock_derive_key.assert_not_called()
+
+
+@pytest.fixture()
+def aes_gcm_encryption_client(app, encryption_client):
+    client = Encryption()
+    app.config["ENCRYPTION_SCHEME"] = "aes-gcm"
+    client.init_app(app)
+    return client
+
+
+@pytest.mark.parametrize("salt", [None, "this-is-a-custom-salt"])
+def test_should_encrypt_and_decrypt_with_aes_gcm(aes_gcm_encryption_client, salt):
+    thing = {"to": "+12025550104", "personalisation": {"name": "Ünïcode"}}
+
+    encrypted = aes_gcm_encryption_client.encrypt(thing, salt=salt)
+
+    assert isinstance(encrypted, str)
+    assert aes_gcm_encryption_client.decrypt(encrypted, salt=salt) == thing
+    assert aes_gcm_encryption_client.decrypt(encrypted.encode(), salt=salt) == thing
+
+
+def test_aes_gcm_messages_are_shorter_than_fernet(
+    encryption_client, aes_gcm_encryption_client
+):
+    thing = {"to": "+12025550104", "personalisation": {"name": "Example"}}
+
+    assert len(aes_gcm_encryption_client.encrypt(thing)) < len(
+        encryption_client.encrypt(thing)
+    )
+
+
+def test_should_decrypt_messages_encrypted_with_either_scheme(
+    encryption_client, aes_gcm_encryption_client
+):
+    fernet_encrypted = encryption_client.encrypt("this")
+    aes_gcm_encrypted = aes_gcm_encryption_client.encrypt("that")
+
+    assert aes_gcm_encryption_client.decrypt(fernet_encrypted) == "this"
+    assert encryption_client.decrypt(aes_gcm_encrypted) == "that"
+
+
+def test_should_not_decrypt_aes_gcm_message_with_wrong_salt(aes_gcm_encryption_client):
+    encrypted = aes_gcm_encryption_client.encrypt("this", salt="this-is-a-custom-salt")
+
+    with pytest.raises(EncryptionError):
+        aes_gcm_encryption_client.decrypt(encrypted)
+
+
+@pytest.mark.parametrize(
+    "tamper",
+    [
+        # flip a bit in the ciphertext
+        lambda message: message[:-1] + bytes([message[-1] ^ 1]),
+        # change the version byte, which is authenticated too
+        lambda message: bytes([0x02]) + message[1:],
+        # cut the message short
+        lambda message: message[:10],
+    ],
+)
+def test_should_not_decrypt_tampered_aes_gcm_message(aes_gcm_encryption_client, tamper):
+    message = urlsafe_b64decode(aes_gcm_encryption_client.encrypt("this"))
+
+    with pytest.raises(EncryptionError):
+        aes_gcm_encryption_client.decrypt(urlsafe_b64encode(tamper(message)))
+
+
+def test_should_not_decrypt_invalid_base64(encryption_client):
+    with pytest.raises(EncryptionError):
+        encryption_client.decrypt("not base64!")
+
+
+def test_should_reject_unknown_encryption_scheme(app):
+    client = Encryption()
+    app.config["SECRET_KEY"] = "test-notify-secret-key"
+    app.config["DANGEROUS_SALT"] = "test-notify-salt"
+    app.config["ENCRYPTION_SCHEME"] = "rot13"
+    with pytest.raises(EncryptionError):
+        client.init_app(app)
@@ -1,11 +1,14 @@
 import uuid
-from unittest.mock import Mock
+from unittest.mock import Mock, call
 
 import pytest
-from freezegun import freeze_time
 
 from app.utils import utc_now
-from notifications_utils.clients.redis.redis_client import RedisClient, prepare_value
+from notifications_utils.clients.redis.redis_client import (
+    RateLimit,
+    RedisClient,
+    prepare_value,
+)
 
 
 @pytest.fixture()
@@ -19,7 +22,14 @@ def delete_mock():
 
 
 @pytest.fixture()
-def mocked_redis_client(app, mocked_redis_pipeline, delete_mock, mocker):
+def rate_limit_mock():
+    return Mock(return_value=[0, 99, "0", "1.000000"])
+
+
+@pytest.fixture()
+def mocked_redis_client(
+    app, mocked_redis_pipeline, delete_mock, rate_limit_mock, mocker
+):
     app.config["REDIS_ENABLED"] = True
 
     redis_client = RedisClient()
@@ -28,13 +38,19 @@ def mocked_redis_client(app, mocked_redis_pipeline, delete_mock, mocker):
     mocker.patch.object(redis_client.redis_store, "get", return_value=100)
     mocker.patch.object(redis_client.redis_store, "set")
     mocker.patch.object(redis_client.redis_store, "incr")
-    mocker.patch.object(redis_client.redis_store, "delete")
+    mocker.patch.object(redis_client.redis_store, "delete", return_value=1)
+    mocker.patch.object(redis_client.redis_store, "scan_iter")
+    mocker.patch.object(
+        redis_client.redis_store, "unlink", side_effect=lambda *keys: len(keys)
+    )
     mocker.patch.object(
         redis_client.redis_store, "pipeline", return_value=mocked_redis_pipeline
     )
 
     mocker.patch.object(
-        redis_client, "scripts", {"delete-keys-by-pattern": delete_mock}
+        redis_client,
+        "scripts",
+        {"delete-tagged": delete_mock, "rate-limit": rate_limit_mock},
     )
 
     mocker.patch.object(
@@ -47,7 +63,7 @@ def mocked_redis_client(app, mocked_redis_pipeline, delete_mock, mocker):
 
 
 @pytest.fixture()
-def failing_redis_client(mocked_redis_client, delete_mock):
+def failing_redis_client(mocked_redis_client, delete_mock, rate_limit_mock):
     # nota bene: using KeyError because flake8 thinks Exception
     # and BaseException are too broad
     mocked_redis_client.redis_store.get.side_effect = KeyError("get failed")
@@ -55,7 +71,11 @@ def failing_redis_client(mocked_redis_client, delete_mock):
     mocked_redis_client.redis_store.incr.side_effect = KeyError("incr failed")
     mocked_redis_client.redis_store.pipeline.side_effect = KeyError("pipeline failed")
     mocked_redis_client.redis_store.delete.side_effect = KeyError("delete failed")
-    delete_mock.side_effect = KeyError("delete by pattern failed")
+    mocked_redis_client.redis_store.scan_iter.side_effect = KeyError(
+        "delete by pattern failed"
+    )
+    delete_mock.side_effect = KeyError("delete tagged failed")
+    rate_limit_mock.side_effect = KeyError("rate limit failed")
     return mocked_redis_client
 
 
@@ -77,7 +97,7 @@ def test_should_raise_exception_if_raise_set_to_true(
 
     with pytest.raises(KeyError) as e:
         failing_redis_client.exceeded_rate_limit("test", 100, 200, raise_exception=True)
-    assert str(e.value) == "'pipeline failed'"
+    assert str(e.value) == "'rate limit failed'"
 
     with pytest.raises(KeyError) as e:
         failing_redis_client.delete("test", raise_exception=True)
@@ -87,8 +107,14 @@ def test_should_raise_exception_if_raise_set_to_true(
         failing_redis_client.delete_by_pattern("pattern", raise_exception=True)
     assert str(e.value) == "'delete by pattern failed'"
 
+    with pytest.raises(KeyError) as e:
+        failing_redis_client.delete_tagged("tag", raise_exception=True)
+    assert str(e.value) == "'delete tagged failed'"
+
 
-def test_should_not_call_if_not_enabled(mocked_redis_client, delete_mock):
+def test_should_not_call_if_not_enabled(
+    mocked_redis_client, delete_mock, rate_limit_mock
+):
     mocked_redis_client.active = False
 
     assert mocked_redis_client.get("get_key") is None
@@ -97,13 +123,16 @@ def test_should_not_call_if_not_enabled(mocked_redis_client, delete_mock):
     assert mocked_redis_client.exceeded_rate_limit("rate_limit_key", 100, 100) is False
     assert mocked_redis_client.delete("delete_key") is None
     assert mocked_redis_client.delete_by_pattern("pattern") == 0
+    assert mocked_redis_client.delete_tagged("tag") == 0
 
     mocked_redis_client.redis_store.get.assert_not_called()
     mocked_redis_client.redis_store.set.assert_not_called()
     mocked_redis_client.redis_store.incr.assert_not_called()
     mocked_redis_client.redis_store.delete.assert_not_called()
     mocked_redis_client.redis_store.pipeline.assert_not_called()
+    mocked_redis_client.redis_store.scan_iter.assert_not_called()
     delete_mock.assert_not_called()
+    rate_limit_mock.assert_not_called()
 
 
 def test_should_call_set_if_enabled(mocked_redis_client):
@@ -118,50 +147,88 @@ def test_should_call_get_if_enabled(mocked_redis_client):
     mocked_redis_client.redis_store.get.assert_called_with("key")
 
 
-@freeze_time("2001-01-01 12:00:00.000000")
-def test_exceeded_rate_limit_should_add_correct_calls_to_the_pipe(
-    mocked_redis_client, mocked_redis_pipeline
-):
-    mocked_redis_client.exceeded_rate_limit("key", 100, 100)
-    assert mocked_redis_client.redis_store.pipeline.called
-    mocked_redis_pipeline.zadd.assert_called_with("key", {978350400.0: 978350400.0})
-    mocked_redis_pipeline.zremrangebyscore.assert_called_with(
-        "key", "-inf", 978350300.0
+def test_check_rate_limit_runs_script_once(mocked_redis_client, rate_limit_mock):
+    assert mocked_redis_client.check_rate_limit("key", 100, 60) == RateLimit(
+        exceeded=False, limit=100, remaining=99, retry_after=0.0, reset_after=1.0
     )
-    mocked_redis_pipeline.zcard.assert_called_with("key")
-    mocked_redis_pipeline.expire.assert_called_with("key", 100)
-    assert mocked_redis_pipeline.execute.called
+    rate_limit_mock.assert_called_once_with(keys=["key"], args=[100, 60])
+    assert not mocked_redis_client.redis_store.pipeline.called
 
 
-@freeze_time("2001-01-01 12:00:00.000000")
-def test_exceeded_rate_limit_should_fail_request_if_over_limit(
-    mocked_redis_client, mocked_redis_pipeline
+def test_check_rate_limit_returns_retry_after_if_over_limit(
+    mocked_redis_client, rate_limit_mock
 ):
-    mocked_redis_pipeline.execute.return_value = [True, True, 100, True]
-    assert mocked_redis_client.exceeded_rate_limit("key", 99, 100)
+    rate_limit_mock.return_value = [1, 0, "0.600000", "59.400000"]
 
+    assert mocked_redis_client.check_rate_limit("key", 100, 60) == RateLimit(
+        exceeded=True, limit=100, remaining=0, retry_after=0.6, reset_after=59.4
+    )
+    assert mocked_redis_client.exceeded_rate_limit("key", 100, 60)
 
-@freeze_time("2001-01-01 12:00:00.000000")
-def test_exceeded_rate_limit_should_allow_request_if_not_over_limit(
-    mocked_redis_client, mocked_redis_pipeline
-):
-    mocked_redis_pipeline.execute.return_value = [True, True, 100, True]
-    assert not mocked_redis_client.exceeded_rate_limit("key", 101, 100)
+
+def test_exceeded_rate_limit_not_exceeded(mocked_redis_client):
+    assert not mocked_redis_client.exceeded_rate_limit("key", 100, 60)
 
 
-@freeze_time("2001-01-01 12:00:00.000000")
-def test_exceeded_rate_limit_not_exceeded(mocked_redis_client, mocked_redis_pipeline):
-    mocked_redis_pipeline.execute.return_value = [True, True, 80, True]
-    assert not mocked_redis_client.exceeded_rate_limit("key", 90, 100)
+def test_check_rate_limit_allows_request_if_redis_fails(
+    failing_redis_client, rate_limit_mock
+):
+    assert failing_redis_client.check_rate_limit("key", 100, 60) == RateLimit(
+        exceeded=False, limit=100, remaining=100, retry_after=0, reset_after=0
+    )
+    rate_limit_mock.assert_called_once()
 
 
 def test_exceeded_rate_limit_should_not_call_if_not_enabled(
-    mocked_redis_client, mocked_redis_pipeline
+    mocked_redis_client, rate_limit_mock
 ):
     mocked_redis_client.active = False
 
     assert not mocked_redis_client.exceeded_rate_limit("key", 100, 100)
-    assert not mocked_redis_client.redis_store.pipeline.called
+    assert not rate_limit_mock.called
+
+
+def test_incr_within_limit(mocked_redis_client):
+    mocked_redis_client.scripts["incr-within-limit"] = Mock(return_value=40)
+
+    assert mocked_redis_client.incr_within_limit("key", 100, 1000, ex=60) == 40
+    mocked_redis_client.scripts["incr-within-limit"].assert_called_once_with(
+        keys=["key"], args=[100, 1000, 1, 60]
+    )
+
+
+def test_incr_within_limit_returns_amount_if_not_enabled(mocked_redis_client):
+    mocked_redis_client.active = False
+    mocked_redis_client.scripts["incr-within-limit"] = Mock()
+
+    assert mocked_redis_client.incr_within_limit("key", 100, 1000, ex=60) == 100
+    assert not mocked_redis_client.scripts["incr-within-limit"].called
+
+
+def test_decr_if_exists(mocked_redis_client):
+    mocked_redis_client.scripts["decr-if-exists"] = Mock(return_value=60)
+
+    assert mocked_redis_client.decr_if_exists("key", 40) == 60
+    mocked_redis_client.scripts["decr-if-exists"].assert_called_once_with(
+        keys=["key"], args=[40]
+    )
+
+
+def test_mget(mocked_redis_client, mocker):
+    mocker.patch.object(
+        mocked_redis_client.redis_store, "mget", return_value=[b"1", None]
+    )
+
+    assert mocked_redis_client.mget(["a", uuid.UUID(int=1)]) == [b"1", None]
+    mocked_redis_client.redis_store.mget.assert_called_once_with(
+        ["a", "00000000-0000-0000-0000-000000000001"]
+    )
+
+
+def test_mget_returns_misses_if_not_enabled(mocked_redis_client):
+    mocked_redis_client.active = False
+
+    assert mocked_redis_client.mget(["a", "b"]) == [None, None]
 
 
 def test_delete(mocked_redis_client):
@@ -191,7 +258,57 @@ def test_prepare_value(input, output):
     assert prepare_value(input) == output
 
 
-def test_delete_by_pattern(mocked_redis_client, delete_mock):
-    ret = mocked_redis_client.delete_by_pattern("foo")
-    assert ret == 4
-    delete_mock.assert_called_once_with(args=["foo"])
+def test_delete_by_pattern_scans_and_deletes_in_batches(mocked_redis_client, mocker):
+    mocker.patch.object(mocked_redis_client, "SCAN_BATCH_SIZE", 2)
+    mocked_redis_client.redis_store.scan_iter.return_value = iter(["a", "b", "c"])
+
+    assert mocked_redis_client.delete_by_pattern("foo*") == 3
+
+    mocked_redis_client.redis_store.scan_iter.assert_called_once_with(
+        match="foo*", count=2
+    )
+    assert mocked_redis_client.redis_store.unlink.call_args_list == [
+        call("a", "b"),
+        call("c"),
+    ]
+
+
+def test_set_tagged(mocked_redis_client, mocked_redis_pipeline):
+    mocked_redis_client.set_tagged("key", "value", tags=["tag-1", "tag-2"], ex=60)
+
+    mocked_redis_pipeline.set.assert_called_once_with("key", "value", ex=60)
+    assert mocked_redis_pipeline.sadd.call_args_list == [
+        call("tag-1", "key"),
+        call("tag-2", "key"),
+    ]
+    assert mocked_redis_pipeline.expire.call_args_list == [
+        call("tag-1", 60),
+        call("tag-2", 60),
+    ]
+    mocked_redis_pipeline.execute.assert_called_once_with()
+
+
+def test_delete_tagged(mocked_redis_client, delete_mock):
+    assert mocked_redis_client.delete_tagged("tag-1", "tag-2", keys=["key"]) == 4
+
+    delete_mock.assert_called_once_with(keys=["tag-1", "tag-2", "key"], args=[2])
+
+
+def test_invalidation_metrics(mocked_redis_client, mocker):
+    mocker.patch(
+        "notifications_utils.clients.redis.redis_client.monotonic",
+        side_effect=[10, 10.5, 20, 20.25, 30, 31],
+    )
+    mocked_redis_client.delete("a")
+    mocked_redis_client.delete("b")
+    mocked_redis_client.delete_tagged("tag")
+
+    assert mocked_redis_client.get_invalidation_metrics() == {
+        "delete": {"count": 2, "seconds": 0.75, "max_seconds": 0.5, "keys_deleted": 2},
+        "delete_tagged": {
+            "count": 1,
+            "seconds": 1,
+            "max_seconds": 1,
+            "keys_deleted": 4,
+        },
+    }
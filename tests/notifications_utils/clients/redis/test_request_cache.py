@@ -1,3 +1,6 @@
+import json
+import zlib
+
 import pytest
 
 from notifications_utils.clients.redis import RequestCache
@@ -188,3 +191,113 @@ def test_delete_by_pattern_even_if_call_raises(mocker, mocked_redis_client, cach
         foo()
 
     mock_redis_delete.assert_called_once_with("bar-???")
+
+
+def test_set_with_tags(mocker, mocked_redis_client, cache):
+    mocker.patch.object(mocked_redis_client, "get", return_value=None)
+    mock_redis_set = mocker.patch.object(mocked_redis_client, "set")
+    mock_redis_set_tagged = mocker.patch.object(mocked_redis_client, "set_tagged")
+
+    @cache.set("{a}-{b}", tags=["{a}-tag", "all-tag"])
+    def foo(a, b):
+        return "bar"
+
+    assert foo(1, 2) == "bar"
+
+    mock_redis_set_tagged.assert_called_once_with(
+        "1-2", '"bar"', tags=["1-tag", "all-tag"], ex=604_800
+    )
+    assert not mock_redis_set.called
+
+
+def test_delete_by_tag(mocker, mocked_redis_client, cache):
+    mock_redis_delete_tagged = mocker.patch.object(
+        mocked_redis_client,
+        "delete_tagged",
+    )
+
+    @cache.delete_by_tag("{a}-tag")
+    def foo(a):
+        raise RuntimeError
+
+    with pytest.raises(RuntimeError):
+        foo(1)
+
+    mock_redis_delete_tagged.assert_called_once_with("1-tag")
+
+
+def test_key_is_built_without_inspecting_signature_on_each_call(
+    mocker, mocked_redis_client, cache
+):
+    mocker.patch.object(mocked_redis_client, "get", return_value=b'"bar"')
+
+    @cache.set("{a}-{b}-{c}")
+    def foo(a, b, c="default"):
+        raise RuntimeError
+
+    mock_signature = mocker.patch(
+        "notifications_utils.clients.redis.request_cache.signature"
+    )
+    foo(1, b=2)
+
+    assert not mock_signature.called
+    mocked_redis_client.get.assert_called_once_with("1-2-default")
+
+
+def test_get_many(mocker, mocked_redis_client, cache):
+    mock_redis_mget = mocker.patch.object(
+        mocked_redis_client, "mget", return_value=[b'"cached"', None]
+    )
+    mock_redis_get = mocker.patch.object(mocked_redis_client, "get")
+    mock_redis_set = mocker.patch.object(mocked_redis_client, "set")
+
+    @cache.set("{a}-{b}")
+    def foo(a, b=None):
+        return f"fetched {a}"
+
+    assert foo.get_many([(1, 2), (3,)]) == ["cached", "fetched 3"]
+
+    mock_redis_mget.assert_called_once_with(["1-2", "3-None"])
+    assert not mock_redis_get.called
+    mock_redis_set.assert_called_once_with("3-None", '"fetched 3"', ex=604_800)
+
+
+@pytest.mark.parametrize("length, expect_compressed", [(10, False), (2000, True)])
+def test_set_compressed(mocker, mocked_redis_client, cache, length, expect_compressed):
+    mocker.patch.object(mocked_redis_client, "get", return_value=None)
+    mock_redis_set = mocker.patch.object(mocked_redis_client, "set")
+
+    @cache.set("foo", compress=True)
+    def foo():
+        return "x" * length
+
+    foo()
+
+    stored = mock_redis_set.call_args.args[1]
+    if expect_compressed:
+        assert stored.startswith(b"zlib:")
+        assert len(stored) < 100
+    else:
+        assert stored == json.dumps("x" * length)
+    mocker.patch.object(
+        mocked_redis_client,
+        "get",
+        return_value=stored if expect_compressed else stored.encode(),
+    )
+    assert foo() == "x" * length
+
+
+def test_get_reads_compressed_values_even_if_not_compressing(
+    mocker, mocked_redis_client, cache
+):
+    mocker.patch.object(
+        mocked_redis_client,
+        "get",
+        return_value=b"zlib:" + zlib.compress(b'{"a": 1}'),
+    )
+
+    @cache.set("foo")
+    def foo():
+        raise RuntimeError
+
+    assert foo() == {"a": 1}
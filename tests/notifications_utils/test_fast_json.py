@@ -0,0 +1,107 @@
+import json
+import uuid
+from datetime import date, datetime, timezone
+from decimal import Decimal
+
+import pytest
+from flask import jsonify
+from flask.json.provider import DefaultJSONProvider
+
+from notifications_utils import fast_json
+
+VALUE = {
+    "id": uuid.UUID("0f7a7ac5-6e8c-4bd1-8f6d-4c7f5a9c3c51"),
+    "created_at": datetime(2025, 3, 1, 12, 30, 45, 123456),
+    "sent_at": datetime(2025, 3, 1, 12, 31, tzinfo=timezone.utc),
+    "day": date(2025, 3, 1),
+    "rate": Decimal("0.0081"),
+    "content": "café",
+    1: None,
+}
+
+EXPECTED = {
+    "id": "0f7a7ac5-6e8c-4bd1-8f6d-4c7f5a9c3c51",
+    "created_at": "2025-03-01T12:30:45.123456",
+    "sent_at": "2025-03-01T12:31:00+00:00",
+    "day": "2025-03-01",
+    "rate": "0.0081",
+    "content": "café",
+    "1": None,
+}
+
+
+@pytest.fixture(params=["orjson", "json"])
+def backend(request, mocker):
+    if request.param == "orjson":
+        pytest.importorskip("orjson")
+    else:
+        mocker.patch.object(fast_json, "orjson", None)
+    return request.param
+
+
+def test_dumps_encodes_uuids_datetimes_and_decimals(backend):
+    encoded = fast_json.dumps(VALUE)
+
+    assert json.loads(encoded) == EXPECTED
+    assert " " not in encoded.replace("café", "")
+    assert fast_json.loads(encoded) == EXPECTED
+    assert fast_json.loads(fast_json.dumpb(VALUE)) == EXPECTED
+
+
+def test_dumps_sorts_keys(backend):
+    assert fast_json.dumps({"b": 1, "a": 2}, sort_keys=True) == '{"a":2,"b":1}'
+
+
+def test_dumps_uses_given_default(backend):
+    assert fast_json.dumps(
+        {"at": datetime(2025, 3, 1)}, default=lambda obj: "a datetime"
+    ) == ('{"at":"a datetime"}')
+
+
+def test_dumps_raises_for_what_it_cannot_encode(backend):
+    with pytest.raises(TypeError):
+        fast_json.dumps({"set": {1, 2}})
+
+
+def test_provider_encodes_responses_as_flask_does(app, backend):
+    app.json = fast_json.FastJSONProvider(app)
+
+    with app.test_request_context():
+        response = jsonify(
+            id=uuid.UUID("0f7a7ac5-6e8c-4bd1-8f6d-4c7f5a9c3c51"),
+            created_at=datetime(2025, 3, 1, 12, 30, 45),
+            rate=Decimal("0.0081"),
+        )
+
+    assert json.loads(response.get_data()) == {
+        "created_at": "Sat, 01 Mar 2025 12:30:45 GMT",
+        "id": "0f7a7ac5-6e8c-4bd1-8f6d-4c7f5a9c3c51",
+        "rate": "0.0081",
+    }
+    assert app.json.loads('{"a": [1, 2]}') == {"a": [1, 2]}
+
+
+def test_provider_does_not_escape_non_ascii_characters_as_flask_does(app):
+    pytest.importorskip("orjson")
+    app.json = fast_json.FastJSONProvider(app)
+    value = {"content": "café 😀"}
+
+    with app.test_request_context():
+        response = jsonify(value)
+
+    # Flask escapes anything that isn't ASCII, as it has ensure_ascii set
+    assert DefaultJSONProvider(app).dumps(value) == (
+        '{"content": "caf\\u00e9 \\ud83d\\ude00"}'
+    )
+    assert response.get_data() == '{"content":"café 😀"}\n'.encode("utf-8")
+    assert json.loads(response.get_data()) == value
+
+
+def test_provider_escapes_non_ascii_characters_without_orjson(app, mocker):
+    mocker.patch.object(fast_json, "orjson", None)
+    app.json = fast_json.FastJSONProvider(app)
+
+    with app.test_request_context():
+        response = jsonify(content="café 😀")
+
+    assert b"caf\\u00e9 \\ud83d\\ude00" in response.get_data()
@@ -15,6 +15,7 @@ from notifications_utils.recipients import (
     RecipientCSV,
     Row,
     first_column_headings,
+    validate_phone_number,
 )
 from notifications_utils.template import EmailPreviewTemplate, SMSMessageTemplate
 
@@ -1152,3 +1153,26 @@ def test_recipient_csv_checks_should_validate_flag(should_validate):
 
     assert template.is_message_empty.called is should_validate
     assert recipients._get_error_for_field.called is should_validate
+
+
+def test_phone_numbers_are_validated_once_per_distinct_number(app, mocker):
+    mock_validate_phone_number = mocker.patch(
+        "notifications_utils.recipients.validate_phone_number",
+        wraps=validate_phone_number,
+    )
+    recipients = RecipientCSV(
+        "phone number,name\n"
+        + ("2348675309,example\n" * 50)
+        + ("12345,example\n" * 50)
+        + "2028675300 ,example\n",
+        template=_sample_template("sms", content="hello ((name))"),
+    )
+
+    assert {row.index for row in recipients.rows_with_bad_recipients} == set(
+        range(50, 100)
+    )
+    assert mock_validate_phone_number.call_args_list == [
+        mocker.call("2348675309", international=False),
+        mocker.call("12345", international=False),
+        mocker.call("2028675300", international=False),
+    ]
@@ -1,8 +1,13 @@
+from unittest import mock
+
+import phonenumbers
 import pytest
 
 from notifications_utils.recipients import (
     InvalidEmailError,
     InvalidPhoneError,
+    _parse_phone_number,
+    _validate_phone_number_and_remember,
     allowed_to_send_to,
     format_phone_number_human_readable,
     format_recipient,
@@ -14,6 +19,7 @@ from notifications_utils.recipients import (
     validate_and_format_phone_number,
     validate_email_address,
     validate_phone_number,
+    validate_phone_numbers,
 )
 
 valid_us_phone_numbers = [
@@ -428,3 +434,64 @@ def test_try_format_recipient_doesnt_throw():
 
 def test_format_phone_number_human_readable_doenst_throw():
     assert format_phone_number_human_readable("ALPHANUM3R1C") == "ALPHANUM3R1C"
+
+
+@pytest.mark.parametrize(
+    "phone_number",
+    [
+        "2025550104",
+        "12025550104",
+        "+12025550104",
+        "+1 202 555 0104",
+        "1-202-555-0104",
+        "(202) 555-0104",
+        "202.555.0104",
+        "+1 (876) 555-0104",  # Jamaica, which shares the US country code
+    ],
+)
+@pytest.mark.parametrize("region", ["US", None])
+def test_parse_phone_number_fast_path_matches_phonenumbers(phone_number, region):
+    try:
+        expected = phonenumbers.parse(phone_number, region)
+    except phonenumbers.NumberParseException:
+        with pytest.raises(phonenumbers.NumberParseException):
+            _parse_phone_number(phone_number, region)
+        return
+
+    parsed = _parse_phone_number(phone_number, region)
+    assert (parsed.country_code, parsed.national_number) == (
+        expected.country_code,
+        expected.national_number,
+    )
+
+
+def test_validate_phone_number_only_parses_each_number_once(mocker):
+    _validate_phone_number_and_remember.cache_clear()
+    mock_parse = mocker.patch(
+        "notifications_utils.recipients.phonenumbers.parse",
+        wraps=phonenumbers.parse,
+    )
+
+    for _ in range(3):
+        assert validate_phone_number("2025550104") == "+12025550104"
+        assert validate_phone_number("+447123456789", international=True) == (
+            "+447123456789"
+        )
+        with pytest.raises(InvalidPhoneError, match="Not a US number"):
+            validate_phone_number("+447123456789")
+
+    # the US number doesn't need parsing at all, the UK one is parsed once for each of the two
+    # ways it's validated, and as a UK number
+    assert mock_parse.call_count == 3
+
+
+def test_validate_phone_numbers():
+    assert validate_phone_numbers(
+        ["2025550104", "+447123456789", "2025550104", "12345", None],
+        international=True,
+    ) == {
+        "2025550104": "+12025550104",
+        "+447123456789": "+447123456789",
+        "12345": mock.ANY,
+    }
+    assert isinstance(validate_phone_numbers(["12345"])["12345"], InvalidPhoneError)